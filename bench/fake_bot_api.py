@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""Local Telegram Bot API stand-in for testing the bot offline.
+
+Run it, then point the bot at it:
+
+    python bench/fake_bot_api.py --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 TELEGRAM_BOT_TOKEN=123456:TEST python main.py
+
+In polling mode the bot long-polls getUpdates; updates queued with queue_update()
+are handed out there. Documents registered with register_file() can be fetched with
+getFile + the file download URL, and sendDocument/sendMediaGroup accept uploads.
+bench/load_generator.py drives the real handlers through this server.
+
+In webhook mode (TELEGRAM_WEBHOOK_URL=http://127.0.0.1:8443/telegram/webhook) the
+stand-in remembers the URL/secret from setWebhook. With --push N it then delivers N
+synthetic /start messages and reports update -> first reply latency.
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+import urllib.request
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def parse_params(content_type, body, query=""):
+    """Decode Bot API parameters from a query string, urlencoded, JSON or multipart body.
+
+    Returns (params, files) where files maps field name -> (filename, bytes).
+    """
+    params = {k: v[-1] for k, v in parse_qs(query).items()}
+    files = {}
+    content_type = content_type or ""
+
+    if not body:
+        return params, files
+    if content_type.startswith("application/json"):
+        params.update(json.loads(body.decode("utf-8")))
+    elif content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+        )
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            filename = part.get_filename()
+            payload = part.get_payload(decode=True) or b""
+            if filename:
+                files[name] = (filename, payload)
+            else:
+                params[name] = payload.decode("utf-8")
+    else:
+        params.update({k: v[-1] for k, v in parse_qs(body.decode("utf-8")).items()})
+    return params, files
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+class FakeBotAPI:
+    """In-memory Bot API: records every call and answers like Telegram would."""
+
+    def __init__(self, host="127.0.0.1", port=8081, latency=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency  # Seconds added to every API call
+
+        self._lock = threading.Lock()
+        self._next_message_id = 1000
+        self._next_update_id = 1
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.calls = Counter()          # method -> count
+        self.calls_by_chat = {}         # chat_id -> Counter(method)
+        self.messages = []              # (timestamp, method, chat_id, params)
+        self._pushed_at = {}            # chat_id -> time the last update was delivered
+        self.reply_latencies = []       # seconds from update delivery to first reply
+        self._updates = []              # pending updates for getUpdates
+        self._updates_ready = threading.Condition(self._lock)
+        self.files = {}                 # file_id -> (file_path, bytes)
+        self.file_paths = {}            # file_path -> file_id
+        self.uploaded_bytes = 0
+        self._httpd = None
+
+        self.methods = {
+            'getMe': self._get_me,
+            'setWebhook': self._set_webhook,
+            'deleteWebhook': self._delete_webhook,
+            'getWebhookInfo': self._get_webhook_info,
+            'sendMessage': self._send_message,
+            'editMessageText': self._edit_message,
+            'editMessageReplyMarkup': self._edit_message,
+            'deleteMessage': lambda params, files: True,
+            'deleteMessages': lambda params, files: True,
+            'answerCallbackQuery': lambda params, files: True,
+            'getUpdates': self._get_updates,
+            'getFile': self._get_file,
+            'sendDocument': self._send_document,
+            'sendMediaGroup': self._send_media_group,
+        }
+
+    # ---- Bot API methods -------------------------------------------------
+
+    def _get_me(self, params, files):
+        return {'id': 1, 'is_bot': True, 'first_name': 'Fake Bot', 'username': 'fake_bot'}
+
+    def _set_webhook(self, params, files):
+        self.webhook_url = params.get('url') or None
+        self.webhook_secret = params.get('secret_token') or None
+        return True
+
+    def _delete_webhook(self, params, files):
+        self.webhook_url = None
+        self.webhook_secret = None
+        return True
+
+    def _get_webhook_info(self, params, files):
+        return {'url': self.webhook_url or "", 'has_custom_certificate': False, 'pending_update_count': 0}
+
+    def _message(self, chat_id, **fields):
+        """Build a Message object for a sent message"""
+        with self._lock:
+            self._next_message_id += 1
+            message_id = self._next_message_id
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'from': self._get_me(None, None),
+        }
+        message.update(fields)
+        return message
+
+    def _send_message(self, params, files):
+        return self._message(params['chat_id'], text=params.get('text', ''))
+
+    def _edit_message(self, params, files):
+        message = self._message(params['chat_id'], text=params.get('text', ''))
+        message['message_id'] = int(params.get('message_id', message['message_id']))
+        return message
+
+    def _get_updates(self, params, files):
+        """Long-poll: return queued updates with update_id >= offset"""
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = min(float(params.get('timeout') or 0), 30.0)
+        deadline = time.time() + timeout
+        with self._updates_ready:
+            # Updates below the offset have been confirmed by the bot
+            self._updates = [u for u in self._updates if u['update_id'] >= offset]
+            while not self._updates and time.time() < deadline:
+                self._updates_ready.wait(deadline - time.time())
+            batch = self._updates[:limit]
+            now = time.time()
+            for update in batch:
+                chat_id = self._update_chat_id(update)
+                if chat_id is not None and chat_id not in self._pushed_at:
+                    self._pushed_at[chat_id] = now
+        return batch
+
+    def _get_file(self, params, files):
+        file_id = params['file_id']
+        if file_id not in self.files:
+            raise KeyError('file_id')
+        file_path, data = self.files[file_id]
+        return {'file_id': file_id, 'file_unique_id': file_id, 'file_size': len(data), 'file_path': file_path}
+
+    def _document_message(self, chat_id, filename, size):
+        with self._lock:
+            self.uploaded_bytes += size
+        return self._message(chat_id, document={
+            'file_id': f"sent_{self._next_message_id}",
+            'file_unique_id': f"sent_{self._next_message_id}",
+            'file_name': filename,
+            'file_size': size,
+        })
+
+    def _send_document(self, params, files):
+        filename, data = files.get('document', (params.get('document', 'document'), b""))
+        message = self._document_message(params['chat_id'], filename, len(data))
+        if params.get('caption'):
+            message['caption'] = params['caption']
+        return message
+
+    def _send_media_group(self, params, files):
+        media = params['media']
+        if isinstance(media, str):
+            media = json.loads(media)
+        if not 2 <= len(media) <= 10:
+            raise KeyError('media (2-10 items)')
+        messages = []
+        for item in media:
+            attach = str(item.get('media', ''))
+            filename, data = files.get(attach.replace('attach://', ''), (attach, b""))
+            message = self._document_message(params['chat_id'], filename, len(data))
+            if item.get('caption'):
+                message['caption'] = item['caption']
+            messages.append(message)
+        return messages
+
+    # ---- Dispatch ----------------------------------------------------------
+
+    def call(self, method, params, files):
+        """Record and answer one Bot API call. Returns the response dict."""
+        if self.latency:
+            time.sleep(self.latency)
+
+        chat_id = params.get('chat_id')
+        now = time.time()
+        with self._lock:
+            self.calls[method] += 1
+            if chat_id is not None:
+                chat_id = int(chat_id)
+                self.calls_by_chat.setdefault(chat_id, Counter())[method] += 1
+                pushed_at = self._pushed_at.pop(chat_id, None)
+                if pushed_at is not None:
+                    self.reply_latencies.append(now - pushed_at)
+            self.messages.append((now, method, chat_id, params))
+
+        handler = self.methods.get(method)
+        if handler is None:
+            return {'ok': True, 'result': True}
+        try:
+            return {'ok': True, 'result': handler(params, files)}
+        except KeyError as e:
+            return {'ok': False, 'error_code': 400, 'description': f"Bad Request: {e} is required"}
+
+    def _make_handler(self):
+        api = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                url = urlparse(self.path)
+                parts = url.path.strip('/').split('/')
+                length = int(self.headers.get('Content-Length', 0) or 0)
+                body = self.rfile.read(length) if length else b""
+                if len(parts) > 2 and parts[0] == 'file' and parts[1].startswith('bot'):
+                    # File download: /file/bot<token>/<file_path>
+                    api._serve_file(self, '/'.join(parts[2:]))
+                    return
+                if len(parts) != 2 or not parts[0].startswith('bot'):
+                    status, response = 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+                else:
+                    params, files = parse_params(self.headers.get('Content-Type'), body, url.query)
+                    response = api.call(parts[1], params, files)
+                    status = 200 if response.get('ok') else response.get('error_code', 400)
+                payload = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return _Handler
+
+    def _serve_file(self, handler, file_path):
+        """Stream a registered file for /file/bot<token>/<file_path>"""
+        file_id = self.file_paths.get(file_path)
+        data = self.files[file_id][1] if file_id else None
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls['fileDownload'] += 1
+        if data is None:
+            handler.send_response(404)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/octet-stream")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    # ---- Update delivery ---------------------------------------------------
+
+    def _next_ids(self):
+        """Allocate (update_id, message_id) for a synthetic incoming update"""
+        with self._lock:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            self._next_message_id += 1
+            return update_id, self._next_message_id
+
+    @staticmethod
+    def _update_chat_id(update):
+        if 'message' in update:
+            return update['message']['chat']['id']
+        if 'callback_query' in update:
+            return update['callback_query']['message']['chat']['id']
+        return None
+
+    def _incoming_message(self, chat_id, message_id, **fields):
+        user = {'id': int(chat_id), 'is_bot': False, 'first_name': f"User{chat_id}", 'username': f"user{chat_id}"}
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private', 'first_name': user['first_name']},
+            'from': user,
+        }
+        message.update(fields)
+        return message
+
+    def make_text_update(self, chat_id, text):
+        """Build an Update carrying a private text message from chat_id"""
+        update_id, message_id = self._next_ids()
+        message = self._incoming_message(chat_id, message_id, text=text)
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'update_id': update_id, 'message': message}
+
+    def register_file(self, data, file_name):
+        """Make bytes downloadable through getFile. Returns the file_id."""
+        with self._lock:
+            file_id = f"file_{len(self.files) + 1}"
+            file_path = f"documents/{file_id}_{file_name}"
+            self.files[file_id] = (file_path, data)
+            self.file_paths[file_path] = file_id
+        return file_id
+
+    def make_document_update(self, chat_id, file_name, data):
+        """Build an Update carrying an uploaded document (bytes served via getFile)"""
+        file_id = self.register_file(data, file_name)
+        update_id, message_id = self._next_ids()
+        message = self._incoming_message(chat_id, message_id, document={
+            'file_id': file_id,
+            'file_unique_id': file_id,
+            'file_name': file_name,
+            'mime_type': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            'file_size': len(data),
+        })
+        return {'update_id': update_id, 'message': message}
+
+    def make_callback_update(self, chat_id, data):
+        """Build an Update for an inline button press on a bot message"""
+        update_id, message_id = self._next_ids()
+        user = {'id': int(chat_id), 'is_bot': False, 'first_name': f"User{chat_id}", 'username': f"user{chat_id}"}
+        bot_message = self._message(chat_id, text="📋 Menu")
+        return {'update_id': update_id, 'callback_query': {
+            'id': str(update_id),
+            'from': user,
+            'message': bot_message,
+            'chat_instance': str(chat_id),
+            'data': data,
+        }}
+
+    def queue_update(self, update):
+        """Queue an update for the bot's next getUpdates call"""
+        with self._updates_ready:
+            self._updates.append(update)
+            self._updates_ready.notify_all()
+
+    def pending_updates(self):
+        with self._lock:
+            return len(self._updates)
+
+    def reset_stats(self):
+        """Clear call counters and latencies (e.g. between load phases)"""
+        with self._lock:
+            self.calls = Counter()
+            self.calls_by_chat = {}
+            self.messages = []
+            self._pushed_at = {}
+            self.reply_latencies = []
+            self.uploaded_bytes = 0
+
+    def push_update(self, update, timeout=10):
+        """POST an update to the registered webhook like Telegram does. Returns the HTTP status."""
+        if not self.webhook_url:
+            raise RuntimeError("No webhook registered (setWebhook has not been called)")
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=json.dumps(update).encode("utf-8"),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        if self.webhook_secret:
+            request.add_header('X-Telegram-Bot-Api-Secret-Token', self.webhook_secret)
+        chat_id = update.get('message', {}).get('chat', {}).get('id')
+        with self._lock:
+            if chat_id is not None:
+                self._pushed_at[chat_id] = time.time()
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    # ---- Lifecycle ---------------------------------------------------------
+
+    def start(self):
+        """Serve in a background thread"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="fake-bot-api", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def summary(self):
+        """Call counts and reply latency percentiles"""
+        with self._lock:
+            latencies = list(self.reply_latencies)
+            calls = dict(self.calls)
+        return {
+            'calls': calls,
+            'replies': len(latencies),
+            'reply_p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            'reply_p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+            'reply_max_ms': round(max(latencies) * 1000, 1) if latencies else None,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Telegram Bot API stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every API call")
+    parser.add_argument('--push', type=int, default=0, help="deliver N /start updates to the webhook, then exit")
+    parser.add_argument('--chats', type=int, default=50, help="distinct chats used by --push")
+    parser.add_argument('--wait', type=float, default=60.0, help="seconds to wait for a webhook / replies")
+    args = parser.parse_args()
+
+    api = FakeBotAPI(args.host, args.port, args.latency).start()
+    print(f"Fake Bot API on http://{args.host}:{args.port} (TELEGRAM_API_URL)")
+
+    if not args.push:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        print(json.dumps(api.summary(), indent=2))
+        return
+
+    deadline = time.time() + args.wait
+    while not api.webhook_url and time.time() < deadline:
+        time.sleep(0.2)
+    if not api.webhook_url:
+        raise SystemExit("No webhook registered - start the bot with TELEGRAM_WEBHOOK_URL set")
+
+    statuses = Counter()
+    started = time.time()
+    for i in range(args.push):
+        chat_id = 100000 + (i % args.chats)
+        statuses[api.push_update(api.make_text_update(chat_id, "/start"))] += 1
+    push_seconds = time.time() - started
+
+    # Wait until the bot has gone quiet (no API calls for 2 seconds)
+    last_total = -1
+    while time.time() < deadline + args.wait:
+        total = sum(api.summary()['calls'].values())
+        if total == last_total:
+            break
+        last_total = total
+        time.sleep(2)
+
+    print(f"Delivered {args.push} updates in {push_seconds:.2f}s, webhook statuses: {dict(statuses)}")
+    print(json.dumps(api.summary(), indent=2))
+    api.stop()
+
+if __name__ == "__main__":
+    main()
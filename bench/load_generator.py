@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Load generator for the Telegram handlers, running against the local Bot API stand-in.
+
+Imports main.py with TELEGRAM_API_URL pointed at bench/fake_bot_api.py, seeds a
+throw-away working directory (subscriptions.json, keys.json) and replays phases of
+user actions through getUpdates: /start, /check, /key redemption, menu button
+callbacks and document uploads. Queued documents are drained without touching
+Turnitin, so only the bot/handler side is measured.
+
+Reports, per phase:
+  - handler latency percentiles (time spent inside each registered handler)
+  - first reply latency (update handed out by getUpdates -> first API call for that chat)
+  - Telegram API calls per user action, by method
+
+Usage:
+    python bench/load_generator.py --users 2000
+    python bench/load_generator.py --users 500 --phases start,upload --latency 0.05
+"""
+
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from fake_bot_api import FakeBotAPI, percentile
+
+ADMIN_ID = 1
+FIRST_USER_ID = 100000
+PHASES = ['start', 'check', 'redeem', 'menu', 'upload']
+MENU_BUTTONS = ['my_subscription', 'help', 'monthly_plans', 'document_plans', 'check_id']
+
+class HandlerTimer:
+    """Wraps registered telebot handlers and records how long each call takes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = {}   # handler name -> [seconds]
+        self.errors = 0
+        self.in_flight = 0
+
+    def wrap(self, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with self._lock:
+                self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.in_flight -= 1
+                    self.timings.setdefault(func.__name__, []).append(elapsed)
+        return timed
+
+    def install(self, telebot_instance):
+        for handlers in (telebot_instance.message_handlers, telebot_instance.callback_query_handlers):
+            for handler in handlers:
+                handler['function'] = self.wrap(handler['function'])
+
+    def take(self):
+        """Return and reset the collected timings"""
+        with self._lock:
+            timings, self.timings = self.timings, {}
+            errors, self.errors = self.errors, 0
+        return timings, errors
+
+def seed_workdir(workdir, users):
+    """Create the JSON stores main.py reads, with one document plan and one key per user"""
+    now = datetime.now().isoformat()
+    subscriptions = {
+        str(FIRST_USER_ID + i): {
+            'type': 'document',
+            'plan_name': 'Load Test',
+            'documents_total': 5,
+            'documents_remaining': 5,
+            'start_date': now,
+        }
+        for i in range(users)
+    }
+    keys = {
+        f"LOAD{i}": {'uses': 2, 'redeemed': False, 'created_at': now, 'created_by': ADMIN_ID}
+        for i in range(users)
+    }
+    for name, data in (('subscriptions.json', subscriptions), ('keys.json', keys),
+                       ('pending_requests.json', {}), ('submission_history.json', {})):
+        with open(os.path.join(workdir, name), 'w') as f:
+            json.dump(data, f, indent=2)
+
+def start_drain_worker(main_module, stop_event):
+    """Consume queued documents like the worker would, without running Turnitin"""
+    def drain():
+        while not stop_event.is_set():
+            try:
+                item = main_module.processing_queue.get(timeout=0.5)
+            except Exception:
+                continue
+            if item is None:
+                break
+            try:
+                progress = item.get('progress')
+                if progress:
+                    progress.set_stage('starting')
+                    progress.finish("✅ (load test) document drained")
+                if os.path.exists(item['file_path']):
+                    os.remove(item['file_path'])
+            finally:
+                main_module.processing_queue.task_done()
+
+    thread = threading.Thread(target=drain, name="load-drain", daemon=True)
+    thread.start()
+    return thread
+
+def build_updates(api, phase, users, file_bytes):
+    """One update per user for the given phase"""
+    updates = []
+    for i in range(users):
+        chat_id = FIRST_USER_ID + i
+        if phase == 'start':
+            updates.append(api.make_text_update(chat_id, "/start"))
+        elif phase == 'check':
+            updates.append(api.make_text_update(chat_id, "/check"))
+        elif phase == 'redeem':
+            updates.append(api.make_text_update(chat_id, f"/key LOAD{i}"))
+        elif phase == 'menu':
+            updates.append(api.make_callback_update(chat_id, MENU_BUTTONS[i % len(MENU_BUTTONS)]))
+        elif phase == 'upload':
+            updates.append(api.make_document_update(chat_id, f"load_{i}.docx", file_bytes))
+    return updates
+
+def wait_until_idle(api, timer, bot, quiet_seconds=1.0, timeout=600):
+    """Wait for all updates to be consumed, handlers to finish and the outbound queue to drain"""
+    deadline = time.time() + timeout
+    last_total = -1
+    while time.time() < deadline:
+        busy = api.pending_updates() > 0 or timer.in_flight > 0 or bot.outbound.pending_count() > 0
+        total = sum(api.calls.values())
+        if not busy and total == last_total:
+            return True
+        last_total = total
+        time.sleep(quiet_seconds)
+    return False
+
+def run_phase(api, timer, bot, phase, users, file_bytes):
+    """Queue one action per user and collect latency / call statistics"""
+    api.reset_stats()
+    timer.take()
+    updates = build_updates(api, phase, users, file_bytes)
+
+    started = time.time()
+    for update in updates:
+        api.queue_update(update)
+    finished = wait_until_idle(api, timer, bot)
+    elapsed = time.time() - started
+
+    timings, errors = timer.take()
+    with api._lock:
+        calls = dict(api.calls)
+        replies = list(api.reply_latencies)
+    calls.pop('getUpdates', None)
+
+    return {
+        'phase': phase,
+        'actions': users,
+        'completed': finished,
+        'elapsed_s': round(elapsed, 2),
+        'actions_per_s': round(users / elapsed, 1) if elapsed else None,
+        'handler_errors': errors,
+        'handlers': {
+            name: {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 50) * 1000, 2),
+                'p95_ms': round(percentile(values, 95) * 1000, 2),
+                'p99_ms': round(percentile(values, 99) * 1000, 2),
+                'max_ms': round(max(values) * 1000, 2),
+            }
+            for name, values in sorted(timings.items())
+        },
+        'first_reply_p50_ms': round(percentile(replies, 50) * 1000, 1) if replies else None,
+        'first_reply_p95_ms': round(percentile(replies, 95) * 1000, 1) if replies else None,
+        'calls_per_action': round(sum(calls.values()) / users, 2) if users else None,
+        'calls': calls,
+    }
+
+def print_report(results):
+    for result in results:
+        print(f"\n=== {result['phase']}: {result['actions']} actions in {result['elapsed_s']}s "
+              f"({result['actions_per_s']}/s){'' if result['completed'] else ' [TIMED OUT]'}")
+        for name, stats in result['handlers'].items():
+            print(f"  {name:<28} n={stats['count']:<6} p50={stats['p50_ms']:>8}ms "
+                  f"p95={stats['p95_ms']:>8}ms p99={stats['p99_ms']:>8}ms max={stats['max_ms']:>8}ms")
+        print(f"  first reply: p50={result['first_reply_p50_ms']}ms p95={result['first_reply_p95_ms']}ms")
+        calls = ", ".join(f"{method}={count}" for method, count in sorted(result['calls'].items()))
+        print(f"  Telegram calls per action: {result['calls_per_action']} ({calls})")
+        if result['handler_errors']:
+            print(f"  handler errors: {result['handler_errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Handler load test against the fake Bot API")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--phases', default=",".join(PHASES), help=f"comma-separated subset of {PHASES}")
+    parser.add_argument('--port', type=int, default=18081)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every fake API call")
+    parser.add_argument('--file-kb', type=int, default=64, help="size of each uploaded document")
+    parser.add_argument('--unthrottled', action='store_true',
+                        help="lift the bot's Telegram rate budgets to measure raw handler cost")
+    parser.add_argument('--json', dest='json_path', help="also write the results to this file")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary working directory")
+    args = parser.parse_args()
+
+    phases = [p.strip() for p in args.phases.split(',') if p.strip()]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        raise SystemExit(f"Unknown phase(s): {', '.join(sorted(unknown))}")
+
+    api = FakeBotAPI(port=args.port, latency=args.latency).start()
+
+    original_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="turni_load_")
+    seed_workdir(workdir, args.users)
+    os.chdir(workdir)
+
+    os.environ['TELEGRAM_BOT_TOKEN'] = "123456:LOADTEST"
+    os.environ['TELEGRAM_API_URL'] = f"http://127.0.0.1:{args.port}"
+    os.environ['ADMIN_TELEGRAM_ID'] = str(ADMIN_ID)
+    os.environ.pop('TELEGRAM_WEBHOOK_URL', None)
+
+    import main as bot_main
+    from bot_callbacks import register_callback_handlers
+    register_callback_handlers(
+        bot_main.bot, bot_main.ADMIN_TELEGRAM_ID, bot_main.MONTHLY_PLANS, bot_main.DOCUMENT_PLANS,
+        bot_main.BANK_DETAILS, bot_main.load_pending_requests, bot_main.save_pending_requests,
+        bot_main.load_subscriptions, bot_main.save_subscriptions, bot_main.is_user_subscribed,
+        bot_main.get_user_subscription_info, bot_main.create_main_menu,
+        bot_main.create_monthly_plans_menu, bot_main.create_document_plans_menu,
+        bot_main.create_admin_menu, bot_main.processing_queue, bot_main.log,
+        bot_main.get_user_submission_history
+    )
+
+    bot = bot_main.bot
+    if args.unthrottled:
+        from telegram_handler_optimized import TelegramRateLimiter
+        bot.rate_limiter = TelegramRateLimiter(per_chat_rate=1e6, global_rate=1e6)
+
+    timer = HandlerTimer()
+    timer.install(bot.bot)
+
+    stop_event = threading.Event()
+    start_drain_worker(bot_main, stop_event)
+    threading.Thread(
+        target=bot.infinity_polling,
+        kwargs={'timeout': 5, 'long_polling_timeout': 5},
+        name="load-polling",
+        daemon=True
+    ).start()
+
+    file_bytes = os.urandom(args.file_kb * 1024)
+    results = []
+    try:
+        for phase in phases:
+            print(f"Running phase '{phase}' with {args.users} users...")
+            results.append(run_phase(api, timer, bot, phase, args.users, file_bytes))
+    finally:
+        stop_event.set()
+        bot.stop_polling()
+        bot.stop_sending()
+        api.stop()
+        os.chdir(original_cwd)
+        if args.keep:
+            print(f"Working directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
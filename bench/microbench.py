@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Microbenchmarks for the browser-side parsing and selector helpers.
+
+Runs headless Chromium against local fixture pages (set_content, no network) and
+times the helpers exactly as the pipeline calls them:
+
+  inbox_scan[N]        get_inbox_rows + read_inbox_row per row, the way
+                       _find_submission_with_retry_impl walks the inbox, on an
+                       N-row table with the wanted title first (after the sort) or last
+  badge_read           get_badge_percentage for the Similarity and AI tabs
+  selector_resolution  click_first_selector over SUBMIT_BUTTON_SELECTORS /
+                       UPLOAD_BUTTON_SELECTORS when the k-th candidate is the one present
+  open_download_menu   open_download_menu on the viewer
+
+Every Playwright call that crosses to the browser is counted, so each result shows
+round trips per call next to wall time. inbox_scan_eval is a one-round-trip
+reference (a single page.evaluate) to compare rewrites against.
+
+Fixtures come from bench/mock_turnitin.py; --captures uses pages recorded with
+TURNITIN_RECORD_DIR instead (see bench/replay_server.py).
+
+Usage:
+    python bench/microbench.py
+    python bench/microbench.py --only inbox --rows 10,100,1000,5000 --rounds 5
+    python bench/microbench.py --captures captures --json micro.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from mock_turnitin import MockTurnitin, VIEWER_PAGE
+
+# Playwright methods that make a round trip to the browser
+ROUND_TRIP_METHODS = {
+    'query_selector', 'query_selector_all', 'inner_text', 'inner_html', 'text_content',
+    'get_attribute', 'click', 'dblclick', 'fill', 'check', 'uncheck', 'hover', 'press',
+    'wait_for_selector', 'wait_for_function', 'wait_for_load_state', 'evaluate',
+    'eval_on_selector', 'eval_on_selector_all', 'is_visible', 'is_enabled', 'is_checked',
+    'select_option', 'set_input_files', 'scroll_into_view_if_needed', 'content', 'title',
+}
+
+MISSING_TITLE = "__not_in_inbox__"
+GROUPS = ['inbox', 'badge', 'selectors', 'menu']
+
+class RoundTripCounter:
+    def __init__(self):
+        self.count = 0
+
+class CountingProxy:
+    """Wraps a Page/ElementHandle and counts browser round trips; returned handles are wrapped too"""
+
+    def __init__(self, target, counter):
+        self._target = target
+        self._counter = counter
+
+    def _wrap(self, value):
+        if isinstance(value, list):
+            return [self._wrap(item) for item in value]
+        if value is not None and hasattr(value, 'query_selector'):
+            return CountingProxy(value, self._counter)
+        return value
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name not in ROUND_TRIP_METHODS or not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter.count += 1
+            return self._wrap(attr(*args, **kwargs))
+        return counted
+
+# ---- Fixtures ----------------------------------------------------------------
+
+def inbox_fixture(rows, position):
+    """Inbox page with rows entries; returns (html, title to look for)"""
+    site = MockTurnitin(inbox_rows=rows, seed=rows, similarity_delay=0)
+    # The newest submission is the one being looked for: first after the PAPER ID sort, last unsorted
+    query = {'sort': 'oid', 'dir': 'desc'} if position == 'first' else {}
+    return site._inbox_page(query), site.submissions[-1]['title']
+
+def viewer_fixture():
+    submission = MockTurnitin(inbox_rows=1, seed=1).submissions[0]
+    return VIEWER_PAGE.format(
+        title=submission['title'], similarity=f"{submission['similarity']}%",
+        ai=f"{submission['ai']}%", oid=submission['oid'], render_ms=0,
+    )
+
+# Elements matching exactly one candidate of each selector list, by index
+SUBMIT_CANDIDATE_MARKUP = [
+    '<a class="matte_button submit_paper_button" href="#" onclick="return false">Submit</a>',
+    '<a class="submit_paper_button" href="#" onclick="return false">Send</a>',
+    '<a href="#" onclick="return false">Submit</a>',
+    '<a href="/t_custom_search.asp" onclick="return false">Go</a>',
+    '<span class="matte_button" onclick="return false">Submit</span>',
+]
+UPLOAD_CANDIDATE_MARKUP = [
+    '<button type="submit" id="upload-btn">Upload</button>',
+    '<button type="button" name="submit_button">Send</button>',
+    '<button type="button">Upload</button>',
+    '<span class="btn-primary" onclick="return false">Upload</span>',
+    '<button type="submit" onclick="return false">Send</button>',
+]
+
+def selector_fixture(markup):
+    return f"<!DOCTYPE html><html><body><form onsubmit='return false'>{markup}</form></body></html>"
+
+# ---- Benchmarked operations ---------------------------------------------------
+
+def scan_inbox_like_today(page, submission_title):
+    """Row walk of _find_submission_with_retry_impl (debug reads + title/paper id per row)"""
+    from turnitin_reports import get_inbox_rows, read_inbox_row, normalize_title
+
+    rows = get_inbox_rows(page)
+    if rows:
+        rows[0].query_selector_all("td")  # "Table structure" debug read on the first attempt
+    wanted = normalize_title(submission_title).lower()
+    for row_idx, row in enumerate(rows):
+        cells = row.query_selector_all("td")
+        if not cells:
+            continue
+        if row_idx < 3:
+            for cell_idx in [10, 11, 2]:
+                if cell_idx < len(cells):
+                    cell_link = cells[cell_idx].query_selector("a")
+                    (cell_link or cells[cell_idx]).inner_text()
+        title_text, _ = read_inbox_row(row, cells)
+        if normalize_title(title_text).lower() == wanted:
+            return row_idx
+    return None
+
+def scan_inbox_eval(page, submission_title):
+    """Reference: read every row's title in one evaluate call"""
+    titles = page.evaluate("""() => Array.from(
+        document.querySelectorAll("table[class*='inbox'] tbody tr")).map(tr => {
+            const cell = tr.querySelector("td[class*='ibox_title']");
+            return cell ? cell.innerText.trim() : null;
+        })""")
+    wanted = " ".join(submission_title.split()).lower()
+    for index, title in enumerate(titles):
+        if title is not None and " ".join(title.split()).lower() == wanted:
+            return index
+    return None
+
+def run_benchmark(name, func, rounds, setup=None, warmup=1):
+    """Time func over rounds (after warmup), counting round trips of the last round"""
+    times = []
+    trips = 0
+    result = None
+    for attempt in range(warmup + rounds):
+        if setup:
+            setup()
+        counter = RoundTripCounter()
+        sink = io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sink):
+            result = func(counter)
+        elapsed = time.perf_counter() - started
+        if attempt >= warmup:
+            times.append(elapsed)
+            trips = counter.count
+    return {
+        'name': name,
+        'rounds': len(times),
+        'min_ms': round(min(times) * 1000, 2),
+        'max_ms': round(max(times) * 1000, 2),
+        'mean_ms': round(statistics.mean(times) * 1000, 2),
+        'stddev_ms': round(statistics.stdev(times) * 1000, 2) if len(times) > 1 else 0.0,
+        'median_ms': round(statistics.median(times) * 1000, 2),
+        'round_trips': trips,
+        'ms_per_round_trip': round(statistics.median(times) * 1000 / trips, 3) if trips else None,
+        'result': result if isinstance(result, (int, str, bool, type(None))) else str(result),
+    }
+
+def bench_inbox(page, args, results):
+    fixtures = []
+    if args.captures:
+        from replay_server import find_capture_dir, load_step_html
+        capture_dir = find_capture_dir(args.captures)
+        fixtures.append(("captured", load_step_html(capture_dir, 'inbox'), MISSING_TITLE))
+    else:
+        for rows in args.rows:
+            for position in ('first', 'last'):
+                markup, target = inbox_fixture(rows, position)
+                fixtures.append((f"{rows}-{position}", markup, target))
+
+    for label, markup, target in fixtures:
+        page.set_content(markup)
+        rounds = args.rounds if len(markup) < 2_000_000 else max(1, args.rounds // 2)
+        results.append(run_benchmark(
+            f"inbox_scan[{label}]",
+            lambda counter: scan_inbox_like_today(CountingProxy(page, counter), target),
+            rounds,
+        ))
+        results.append(run_benchmark(
+            f"inbox_scan_eval[{label}]",
+            lambda counter: scan_inbox_eval(CountingProxy(page, counter), target),
+            rounds,
+        ))
+
+def bench_badges(page, args, results):
+    from turnitin_reports import get_badge_percentage
+
+    if args.captures:
+        from replay_server import find_capture_dir, load_step_html
+        page.set_content(load_step_html(find_capture_dir(args.captures), 'viewer'))
+    else:
+        page.set_content(viewer_fixture())
+    for tab_index, label in ((1, "similarity"), (3, "ai"), (7, "missing")):
+        results.append(run_benchmark(
+            f"badge_read[{label}]",
+            lambda counter, tab=tab_index: get_badge_percentage(CountingProxy(page, counter), tab),
+            args.rounds * 10,
+        ))
+
+def bench_selectors(page, args, results):
+    from turnitin_submission import click_first_selector, SUBMIT_BUTTON_SELECTORS, UPLOAD_BUTTON_SELECTORS
+
+    for list_name, selectors, candidates in (
+        ("submit", SUBMIT_BUTTON_SELECTORS, SUBMIT_CANDIDATE_MARKUP),
+        ("upload", UPLOAD_BUTTON_SELECTORS, UPLOAD_CANDIDATE_MARKUP),
+    ):
+        for index, markup in enumerate(candidates):
+            fixture = selector_fixture(markup)
+            results.append(run_benchmark(
+                f"selector_resolution[{list_name}#{index + 1}]",
+                lambda counter: click_first_selector(
+                    CountingProxy(page, counter), selectors, args.selector_timeout, "bench", list_name
+                ),
+                args.rounds,
+                setup=lambda markup=fixture: page.set_content(markup),
+            ))
+
+def bench_menu(page, args, results):
+    from turnitin_reports import open_download_menu
+
+    page.set_content(viewer_fixture())
+    page.wait_for_selector("button[aria-label*='Download' i]")
+
+    def close_menu():
+        page.evaluate("() => { const m = document.querySelector('ul.download-menu'); if (m) m.style.display = 'none'; }")
+
+    results.append(run_benchmark(
+        "open_download_menu",
+        lambda counter: open_download_menu(CountingProxy(page, counter), "bench"),
+        args.rounds * 5,
+        setup=close_menu,
+    ))
+
+def print_report(results, selector_timeout):
+    print(f"\n{'Name (time in ms)':<40}{'Min':>10}{'Max':>10}{'Mean':>10}{'StdDev':>10}"
+          f"{'Median':>10}{'Rounds':>8}{'RoundTrips':>12}{'ms/RT':>8}")
+    print("-" * 118)
+    for r in results:
+        per_trip = r['ms_per_round_trip'] if r['ms_per_round_trip'] is not None else '-'
+        print(f"{r['name']:<40}{r['min_ms']:>10}{r['max_ms']:>10}{r['mean_ms']:>10}{r['stddev_ms']:>10}"
+              f"{r['median_ms']:>10}{r['rounds']:>8}{r['round_trips']:>12}{per_trip:>8}")
+    print(f"\nselector_resolution uses a {selector_timeout} ms miss timeout; "
+          "submit_document waits up to 15000 ms for every candidate that is not on the page.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Browser-side parsing/selector microbenchmarks")
+    parser.add_argument('--only', help=f"comma-separated subset of {GROUPS}")
+    parser.add_argument('--rows', default="10,100,1000,5000", help="inbox sizes")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--selector-timeout', type=int, default=500,
+                        help="ms to wait for each selector candidate that is not present")
+    parser.add_argument('--captures', help="use recorded pages (TURNITIN_RECORD_DIR) instead of mock fixtures")
+    parser.add_argument('--json', dest='json_path', help="also write the results to this file")
+    args = parser.parse_args()
+    args.rows = [int(value) for value in args.rows.split(',') if value.strip()]
+    groups = [g.strip() for g in (args.only or ",".join(GROUPS)).split(',') if g.strip()]
+
+    from playwright.sync_api import sync_playwright
+
+    results = []
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=True)
+        page = browser.new_page()
+        try:
+            if 'inbox' in groups:
+                bench_inbox(page, args, results)
+            if 'badge' in groups:
+                bench_badges(page, args, results)
+            if 'selectors' in groups:
+                bench_selectors(page, args, results)
+            if 'menu' in groups:
+                bench_menu(page, args, results)
+        finally:
+            browser.close()
+
+    print_report(results, args.selector_timeout)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+"""Local Turnitin stand-in for running the browser pipeline offline.
+
+Serves trimmed copies of the pages turnitin_auth.py, turnitin_submission.py and
+turnitin_reports.py drive, keeping the ids/classes/attributes their selectors use:
+
+  login_page.asp            email / password form, sets the session-id cookie
+  s_class_portfolio.asp     "Now viewing:" breadcrumb + Quick Submit link
+  t_inbox.asp               Quick Submit inbox (submit button, sortable table)
+  t_custom_search.asp       search targets / repository settings
+  t_submit.asp              author/title form + file upload
+  t_submit_confirm.asp      processing -> confirm states with submission metadata
+  t_submit_complete.asp     "Congratulations - your submission is complete!"
+  app/carta/...             viewer: tab badges + download menu serving PDF fixtures
+
+Point the bot at it with TURNITIN_BASE_URL=http://127.0.0.1:8090 (any email and
+password are accepted unless --email/--password are given). Timing is controlled by
+the latency model (per-request delay, jitter, per-route overrides) and the
+processing / similarity / report delays. bench/pipeline_benchmark.py drives
+process_turnitin against this server.
+
+Usage:
+    python bench/mock_turnitin.py --port 8090 --inbox-rows 200 --latency 0.15
+"""
+
+import argparse
+import html
+import json
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import parse_params, percentile
+
+SESSION_COOKIE = "session-id"
+QUICK_SUBMIT_INBOX = "/t_inbox.asp?lang=en_us&aid=quicksubmit"
+INBOX_COLUMNS = ['', 'AUTHOR', 'TITLE', 'SIMILARITY', 'GRADE', 'RESPONSE', 'FILE',
+                 'VIEWED', 'STUDENT VIEW', 'PORTFOLIO', 'PAPER ID', 'DATE']
+
+class LatencyModel:
+    """Server-side delay added to every request: base + uniform jitter.
+
+    routes maps a path prefix to a fixed delay that replaces the base one, e.g.
+    {'/app/carta/download': 2.0} to model slow report generation.
+    """
+
+    def __init__(self, base=0.0, jitter=0.0, routes=None, seed=None):
+        self.base = base
+        self.jitter = jitter
+        self.routes = dict(routes or {})
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay_for(self, path):
+        """Seconds to wait before answering a request for path"""
+        delay = self.base
+        for prefix, seconds in self.routes.items():
+            if path.startswith(prefix):
+                delay = seconds
+                break
+        if self.jitter:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter)
+        return max(0.0, delay)
+
+def make_pdf(title, lines, size_kb=0):
+    """Build a one-page PDF report fixture, padded with comments to about size_kb"""
+    def escape(text):
+        return str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    content = ["BT", "/F1 18 Tf", "72 760 Td", f"({escape(title)}) Tj", "/F1 11 Tf"]
+    for line in lines:
+        content += ["0 -20 Td", f"({escape(line)}) Tj"]
+    content.append("ET")
+    stream = "\n".join(content).encode("latin-1", "replace")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    if size_kb:
+        # Comment lines are ignored by readers; they only give the fixture a realistic size
+        padding_line = b"%" + b"x" * 78 + b"\n"
+        pdf += padding_line * max(0, (size_kb * 1024) // len(padding_line))
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_at = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        pdf += f"{offset:010d} 00000 n \n".encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    return bytes(pdf)
+
+def format_file_size(size):
+    """Turnitin-style file size ('24.5K', '1.2M')"""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f}M"
+    return f"{size / 1024:.1f}K"
+
+# ---- Page templates ---------------------------------------------------------
+
+PAGE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+{nav}
+{body}
+</body></html>
+"""
+
+NAV = """<div id="top_nav">
+  <a class="sn_quick_submit" href="{inbox}">Quick Submit</a>
+  <a class="sn_logout" href="/logout.asp">Log out</a>
+</div>
+<div id="bread_crumbs"><h2>Now viewing: <a href="/s_class_portfolio.asp">HOME</a> &gt; {crumb}</h2></div>"""
+
+LOGIN_BODY = """<form id="login_form" method="post" action="/login_page.asp?lang=en_us">
+  {error}
+  <label for="email">Email address</label>
+  <input type="email" id="email" name="email" placeholder="Email address">
+  <label for="password">Password</label>
+  <input type="password" id="password" name="user_password" placeholder="Password">
+  <input type="submit" name="submit" class="submit" value="Log in">
+</form>"""
+
+SETTINGS_BODY = """<form id="quick_submit_settings" method="post" action="/t_custom_search.asp?aid=quicksubmit">
+  <fieldset><legend>Search</legend>
+    <label><input type="checkbox" name="compare_to_database" value="0"> internet</label>
+    <label><input type="checkbox" name="compare_to_database" value="1"> student papers</label>
+    <label><input type="checkbox" name="compare_to_database" value="14,32,36,917"> periodicals, journals, &amp; publications</label>
+    <label><input type="checkbox" name="compare_to_database" value="100" checked> Army Institute</label>
+  </fieldset>
+  <label>Submit papers to:
+    <select name="submit_papers_to">
+      <option value="1" selected>standard paper repository</option>
+      <option value="0">no repository</option>
+    </select>
+  </label>
+  <input type="submit" name="submit" class="submit" value="Submit">
+</form>"""
+
+UPLOAD_BODY = """<form id="submission_form" method="post" action="/t_submit.asp?aid=quicksubmit" enctype="multipart/form-data">
+  <input type="text" id="author_first" name="author_first" placeholder="First name">
+  <input type="text" id="author_last" name="author_last" placeholder="Last name">
+  <input type="text" id="title" name="title" placeholder="Submission title">
+  <button type="button" id="choose-file-btn" class="btn"
+          onclick="document.getElementById('selected-file').style.display='inline'">Choose from this computer</button>
+  <input type="file" id="selected-file" name="userfile" style="display:none">
+  <button type="submit" id="upload-btn" name="submit_button" class="btn btn-primary">Upload</button>
+</form>"""
+
+CONFIRM_BODY = """<div id="submission-preview">
+  <div id="submission-preview-processing" class="state-processing">Processing your file...</div>
+  <div class="state-still-processing" style="display:none">
+    This is taking longer than usual. You can confirm now; the file keeps processing in the background.
+  </div>
+  <div class="state-confirm" style="display:none">
+    <p>Please confirm that this is the file you would like to submit...</p>
+    <dl class="submission-metadata">
+      <dt>Submission title</dt><dd id="submission-metadata-title"></dd>
+      <dt>Page count</dt><dd id="submission-metadata-pagecount"></dd>
+      <dt>Word count</dt><dd id="submission-metadata-wordcount"></dd>
+      <dt>Character count</dt><dd id="submission-metadata-charactercount"></dd>
+      <dt>File size</dt><dd id="submission-metadata-filesize"></dd>
+      <dt>Submission date</dt><dd id="submission-metadata-date"></dd>
+      <dt>Submission ID</dt><dd id="submission-metadata-oid"></dd>
+    </dl>
+  </div>
+  <form method="post" action="/t_submit_confirm.asp?upload={upload_id}">
+    <button type="submit" id="confirm-btn" class="btn btn-primary" data-loading-text="Confirming..." disabled>Confirm</button>
+  </form>
+</div>
+<script>
+(function poll() {{
+  fetch('/t_submit_status.asp?upload={upload_id}').then(r => r.json()).then(state => {{
+    if (state.still_processing) {{
+      document.querySelector('.state-still-processing').style.display = 'block';
+    }}
+    if (!state.ready) {{ setTimeout(poll, 1000); return; }}
+    for (const [key, value] of Object.entries(state.metadata)) {{
+      document.getElementById('submission-metadata-' + key).textContent = value;
+    }}
+    document.getElementById('submission-preview-processing').style.display = 'none';
+    document.querySelector('.state-still-processing').style.display = 'none';
+    document.querySelector('.state-confirm').style.display = 'block';
+    document.getElementById('confirm-btn').removeAttribute('disabled');
+  }}).catch(() => setTimeout(poll, 1000));
+}})();
+</script>"""
+
+COMPLETE_BODY = """<div class="submission-complete">
+  <span class="text-default-color">Congratulations - your submission is complete!</span>
+  <p>Paper ID: {oid}</p>
+</div>"""
+
+VIEWER_PAGE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Feedback Studio - {title}</title></head>
+<body>
+<tii-sws-submission-workspace>
+  <tii-sws-header>
+    <span class="submission-title">{title}</span>
+    <tii-sws-download-btn-mfe class="tii-sws-download-btn-mfe"></tii-sws-download-btn-mfe>
+  </tii-sws-header>
+  <tii-sws-tab-navigator>
+    <tii-sws-tab-button><tdl-badge class="badge"><span class="label">{similarity}</span></tdl-badge> Similarity</tii-sws-tab-button>
+    <tii-sws-tab-button><tdl-badge class="badge"><span class="label">0</span></tdl-badge> Flags</tii-sws-tab-button>
+    <tii-sws-tab-button><tdl-badge class="badge"><span class="label">{ai}</span></tdl-badge> AI Writing</tii-sws-tab-button>
+  </tii-sws-tab-navigator>
+</tii-sws-submission-workspace>
+<script>
+// The download control is a micro-frontend that renders after the workspace
+setTimeout(() => {{
+  const host = document.querySelector('tii-sws-download-btn-mfe');
+  host.innerHTML = `
+    <button aria-label="Download" class="download-btn">Download</button>
+    <ul class="download-menu" style="display:none">
+      <li class="download-menu-item"><button data-px="SimReportDownloadClicked" data-type="similarity">Similarity Report</button></li>
+      <li class="download-menu-item"><button data-px="AIWritingReportDownload" data-type="ai">AI Writing Report</button></li>
+      <li class="download-menu-item"><button data-px="DigitalReceiptDownload" data-type="receipt">Digital Receipt</button></li>
+    </ul>`;
+  const menu = host.querySelector('ul.download-menu');
+  host.querySelector('.download-btn').addEventListener('click', (event) => {{
+    event.stopPropagation();
+    menu.style.display = 'block';
+  }});
+  menu.querySelectorAll('button').forEach((item) => item.addEventListener('click', (event) => {{
+    event.stopPropagation();
+    menu.style.display = 'none';
+    const link = document.createElement('a');
+    link.href = '/app/carta/download?o={oid}&type=' + item.dataset.type;
+    link.download = '';
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+  }}));
+}}, {render_ms});
+</script>
+</body></html>
+"""
+
+class MockTurnitin:
+    """In-memory Turnitin: accounts, Quick Submit uploads, inbox and report viewer."""
+
+    def __init__(self, host="127.0.0.1", port=8090, latency=None, inbox_rows=50,
+                 processing_seconds=3.0, still_processing_after=20.0, similarity_delay=0.0,
+                 viewer_render_seconds=1.0, ai_available=True, report_kb=200,
+                 email=None, password=None, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency or LatencyModel()
+        self.processing_seconds = processing_seconds          # upload -> confirm enabled
+        self.still_processing_after = still_processing_after  # shows .state-still-processing
+        self.similarity_delay = similarity_delay              # inbox shows '--' this long after confirm
+        self.viewer_render_seconds = viewer_render_seconds    # download control appears after this
+        self.ai_available = ai_available
+        self.report_kb = report_kb
+        self.email = email
+        self.password = password
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.sessions = set()
+        self.uploads = {}          # upload_id -> pending upload
+        self.submissions = []      # inbox rows, oldest first
+        self._next_oid = 2400000000
+
+        # Statistics (read by summary)
+        self.requests = Counter()  # route -> count
+        self.server_delay = 0.0    # seconds of injected latency
+        self.upload_bytes = 0
+        self.downloads = Counter() # report type -> count
+        self.request_times = []    # (route, seconds) including injected latency
+
+        self._pdf_cache = {}
+        self._httpd = None
+        self._seed_inbox(inbox_rows)
+
+    # ---- State -------------------------------------------------------------
+
+    def _seed_inbox(self, rows):
+        """Fill the inbox with older submissions so the row scan has realistic work"""
+        started = datetime.now() - timedelta(days=30)
+        for i in range(rows):
+            self._add_submission(
+                title=f"{(started + timedelta(minutes=7 * i)).strftime('%d%H%M')}{100 + i % 900}",
+                author="Bot Checker",
+                filename=f"archived_{i}.docx",
+                size=20000 + (i * 7919) % 400000,
+                submitted_at=time.time() - 86400,
+                created=started + timedelta(minutes=7 * i),
+            )
+
+    def _allocate_oid(self):
+        """Next paper ID (increasing, like Turnitin's)"""
+        with self._lock:
+            self._next_oid += self._random.randint(1, 50)
+            return self._next_oid
+
+    def _add_submission(self, title, author, filename, size, submitted_at, created=None, oid=None):
+        oid = oid or self._allocate_oid()
+        with self._lock:
+            submission = {
+                'oid': oid,
+                'title': title,
+                'author': author,
+                'filename': filename,
+                'size': size,
+                'similarity': self._random.randint(0, 60),
+                'ai': self._random.randint(0, 100) if self.ai_available else None,
+                'submitted_at': submitted_at,
+                'created': created or datetime.now(),
+            }
+            self.submissions.append(submission)
+        return submission
+
+    def _find_submission(self, oid):
+        with self._lock:
+            for submission in self.submissions:
+                if str(submission['oid']) == str(oid):
+                    return submission
+        return None
+
+    def expire_sessions(self):
+        """Drop every login (the next page load lands on the login form)"""
+        with self._lock:
+            self.sessions.clear()
+
+    def _similarity_text(self, submission):
+        if time.time() - submission['submitted_at'] < self.similarity_delay:
+            return "--"
+        return f"{submission['similarity']}%"
+
+    def _report_pdf(self, submission, report_type):
+        key = (submission['oid'], report_type)
+        if key not in self._pdf_cache:
+            titles = {'similarity': "Similarity Report", 'ai': "AI Writing Report", 'receipt': "Digital Receipt"}
+            lines = [
+                f"Submission title: {submission['title']}",
+                f"Submission ID: {submission['oid']}",
+                f"File name: {submission['filename']}",
+                f"Similarity: {submission['similarity']}%",
+                f"AI writing: {submission['ai'] if submission['ai'] is not None else '--'}%",
+            ]
+            size_kb = self.report_kb if report_type != 'receipt' else 0
+            self._pdf_cache[key] = make_pdf(titles.get(report_type, "Report"), lines, size_kb)
+        return self._pdf_cache[key]
+
+    # ---- Pages -------------------------------------------------------------
+
+    def _page(self, title, body, crumb="Quick Submit"):
+        nav = NAV.format(inbox=QUICK_SUBMIT_INBOX, crumb=html.escape(crumb))
+        return PAGE.format(title=html.escape(title), nav=nav, body=body)
+
+    def _login_page(self, error=None):
+        error_html = f'<div class="error-message">{html.escape(error)}</div>' if error else ""
+        body = LOGIN_BODY.format(error=error_html)
+        return PAGE.format(title="Turnitin - Log in", nav="", body=body)
+
+    def _inbox_page(self, query):
+        sort = query.get('sort')
+        direction = query.get('dir', 'asc')
+        with self._lock:
+            rows = list(self.submissions)
+        if sort == 'oid':
+            rows.sort(key=lambda s: s['oid'], reverse=(direction == 'desc'))
+
+        # Each click on the PAPER ID header flips the order (first ascending, then descending)
+        next_dir = 'desc' if (sort == 'oid' and direction == 'asc') else 'asc'
+        header_cells = []
+        for index, label in enumerate(INBOX_COLUMNS):
+            if label == 'PAPER ID':
+                href = "/t_inbox.asp?" + urlencode({'lang': 'en_us', 'aid': 'quicksubmit', 'sort': 'oid', 'dir': next_dir})
+                css = ' class="sorted_b"' if sort == 'oid' else ""
+                header_cells.append(f'<th{css}><a href="{href}">{label}</a></th>')
+            else:
+                header_cells.append(f"<th>{label}</th>")
+
+        body_rows = []
+        for s in rows:
+            viewer = f"/app/carta/en_us/?lang=en_us&amp;o={s['oid']}"
+            title = html.escape(s['title'])
+            body_rows.append(
+                "<tr>"
+                f'<td class="ibox_checkbox"><input type="checkbox" name="object_checkbox" value="{s["oid"]}" title="{title}"></td>'
+                f'<td class="ibox_author">{html.escape(s["author"])}</td>'
+                f'<td class="ibox_title"><a href="{viewer}" target="_blank">{title}</a></td>'
+                f'<td class="or_report_cell"><span class="or_full_version"><a class="or-link" href="{viewer}" target="_blank">{self._similarity_text(s)}</a></span></td>'
+                "<td>--</td><td>--</td>"
+                f'<td><a href="#">{html.escape(s["filename"])}</a></td>'
+                "<td>--</td><td>--</td><td>--</td>"
+                f'<td class="ibox_paper_id"><a href="{viewer}" target="_blank">{s["oid"]}</a></td>'
+                f"<td>{s['created'].strftime('%d-%b-%Y')}</td>"
+                "</tr>"
+            )
+
+        body = (
+            '<a class="matte_button submit_paper_button" href="/t_custom_search.asp?aid=quicksubmit&amp;lang=en_us">Submit</a>\n'
+            '<div id="assign_inbox"><div class="ibox_body_wrapper yui-skin-sam">'
+            '<table class="inbox_table"><tbody>'
+            f'<tr class="inbox_header">{"".join(header_cells)}</tr>'
+            f'{"".join(body_rows)}'
+            '</tbody></table></div></div>'
+        )
+        return self._page("Turnitin - Quick Submit", body)
+
+    def _confirm_state(self, upload_id):
+        """Processing state of a pending upload (polled by the confirm page)"""
+        with self._lock:
+            upload = self.uploads.get(upload_id)
+        if not upload:
+            return {'ready': False, 'still_processing': False, 'metadata': {}}
+        elapsed = time.time() - upload['uploaded_at']
+        words = max(1, upload['size'] // 6)
+        return {
+            'ready': elapsed >= self.processing_seconds,
+            'still_processing': elapsed >= self.still_processing_after,
+            'metadata': {
+                'title': upload['title'],
+                'pagecount': str(max(1, words // 500)),
+                'wordcount': str(words),
+                'charactercount': str(upload['size']),
+                'filesize': format_file_size(upload['size']),
+                'date': datetime.fromtimestamp(upload['uploaded_at']).strftime('%b %d, %Y %I:%M %p'),
+                'oid': f"trn:oid:::1:{upload['oid']}",
+            },
+        }
+
+    # ---- Routing -----------------------------------------------------------
+
+    def handle(self, method, path, query, headers, body):
+        """Answer one request. Returns (status, headers, body bytes)."""
+        cookie = headers.get('Cookie', '')
+        session = None
+        for part in cookie.split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == SESSION_COOKIE:
+                session = value
+        with self._lock:
+            logged_in = session in self.sessions
+
+        if path == '/login_page.asp':
+            if method == 'POST':
+                params, _ = parse_params(headers.get('Content-Type'), body)
+                if (self.email and params.get('email') != self.email) or \
+                   (self.password and params.get('user_password') != self.password):
+                    return self._html(self._login_page("Your email or password is incorrect."))
+                token = secrets.token_hex(16)
+                with self._lock:
+                    self.sessions.add(token)
+                return self._redirect('/s_class_portfolio.asp',
+                                      cookie=f"{SESSION_COOKIE}={token}; Path=/; Max-Age=86400")
+            if logged_in:
+                return self._redirect('/s_class_portfolio.asp')
+            return self._html(self._login_page())
+
+        if not logged_in:
+            return self._redirect('/login_page.asp?lang=en_us')
+
+        if path == '/logout.asp':
+            with self._lock:
+                self.sessions.discard(session)
+            return self._redirect('/login_page.asp?lang=en_us')
+        if path == '/s_class_portfolio.asp':
+            return self._html(self._page("Turnitin - Home", "<p>Welcome back.</p>", crumb="Classes"))
+        if path == '/t_assignments.asp':
+            return self._redirect(QUICK_SUBMIT_INBOX)
+        if path == '/t_inbox.asp':
+            return self._html(self._inbox_page(query))
+        if path == '/t_custom_search.asp':
+            if method == 'POST':
+                return self._redirect('/t_submit.asp?aid=quicksubmit&lang=en_us')
+            return self._html(self._page("Turnitin - Quick Submit settings", SETTINGS_BODY))
+        if path == '/t_submit.asp':
+            if method == 'POST':
+                return self._accept_upload(headers, body)
+            return self._html(self._page("Turnitin - Submit a paper", UPLOAD_BODY))
+        if path == '/t_submit_status.asp':
+            return self._json(self._confirm_state(query.get('upload')))
+        if path == '/t_submit_confirm.asp':
+            if method == 'POST':
+                return self._confirm_upload(query.get('upload'))
+            body_html = CONFIRM_BODY.format(upload_id=html.escape(query.get('upload', '')))
+            return self._html(self._page("Turnitin - Confirm submission", body_html))
+        if path == '/t_submit_complete.asp':
+            body_html = COMPLETE_BODY.format(oid=html.escape(query.get('oid', '')))
+            return self._html(self._page("Turnitin - Digital Receipt", body_html))
+        if path.startswith('/app/carta/download'):
+            return self._download(query)
+        if path.startswith('/app/carta'):
+            return self._viewer(query.get('o'))
+        return 404, {'Content-Type': 'text/plain'}, b"Not Found"
+
+    def _accept_upload(self, headers, body):
+        params, files = parse_params(headers.get('Content-Type'), body)
+        filename, data = files.get('userfile', (None, b""))
+        if not filename:
+            return self._html(self._page("Turnitin - Submit a paper",
+                                         '<div class="error-message">Please choose a file.</div>' + UPLOAD_BODY))
+        upload_id = secrets.token_hex(8)
+        oid = self._allocate_oid()
+        with self._lock:
+            self.upload_bytes += len(data)
+            self.uploads[upload_id] = {
+                'title': params.get('title') or filename,
+                'author': f"{params.get('author_first', '')} {params.get('author_last', '')}".strip(),
+                'filename': filename,
+                'size': len(data),
+                'uploaded_at': time.time(),
+                'oid': oid,
+            }
+        return self._redirect(f'/t_submit_confirm.asp?upload={upload_id}')
+
+    def _confirm_upload(self, upload_id):
+        with self._lock:
+            upload = self.uploads.pop(upload_id, None)
+        if not upload:
+            return self._redirect(QUICK_SUBMIT_INBOX)
+        submission = self._add_submission(
+            title=upload['title'],
+            author=upload['author'] or "Bot Checker",
+            filename=upload['filename'],
+            size=upload['size'],
+            submitted_at=time.time(),
+            oid=upload['oid'],
+        )
+        return self._redirect(f"/t_submit_complete.asp?oid={submission['oid']}")
+
+    def _viewer(self, oid):
+        submission = self._find_submission(oid)
+        if not submission:
+            return 404, {'Content-Type': 'text/plain'}, b"Submission not found"
+        ai = f"{submission['ai']}%" if submission['ai'] is not None else "--%"
+        page = VIEWER_PAGE.format(
+            title=html.escape(submission['title']),
+            similarity=self._similarity_text(submission),
+            ai=ai,
+            oid=submission['oid'],
+            render_ms=int(self.viewer_render_seconds * 1000),
+        )
+        return self._html(page)
+
+    def _download(self, query):
+        submission = self._find_submission(query.get('o'))
+        report_type = query.get('type', 'similarity')
+        if not submission or (report_type == 'ai' and submission['ai'] is None):
+            return 404, {'Content-Type': 'text/plain'}, b"Report not available"
+        data = self._report_pdf(submission, report_type)
+        with self._lock:
+            self.downloads[report_type] += 1
+        filename = f"{report_type}_{submission['oid']}.pdf"
+        return 200, {
+            'Content-Type': 'application/pdf',
+            'Content-Disposition': f'attachment; filename="{filename}"',
+        }, data
+
+    @staticmethod
+    def _html(text):
+        return 200, {'Content-Type': 'text/html; charset=utf-8'}, text.encode('utf-8')
+
+    @staticmethod
+    def _json(data):
+        return 200, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'}, json.dumps(data).encode('utf-8')
+
+    @staticmethod
+    def _redirect(location, cookie=None):
+        headers = {'Location': location}
+        if cookie:
+            headers['Set-Cookie'] = cookie
+        return 303, headers, b""
+
+    # ---- HTTP --------------------------------------------------------------
+
+    def _make_handler(self):
+        site = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                started = time.time()
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get('Content-Length', 0) or 0)
+                body = self.rfile.read(length) if length else b""
+
+                delay = site.latency.delay_for(url.path)
+                if delay:
+                    time.sleep(delay)
+                try:
+                    status, headers, payload = site.handle(self.command, url.path, query, self.headers, body)
+                except Exception as e:
+                    status, headers, payload = 500, {'Content-Type': 'text/plain'}, str(e).encode('utf-8')
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(payload)
+
+                route = url.path if not url.path.startswith('/app/carta/en_us') else '/app/carta/en_us/'
+                with site._lock:
+                    site.requests[f"{self.command} {route}"] += 1
+                    site.server_delay += delay
+                    site.request_times.append((route, time.time() - started))
+
+            do_GET = _handle
+            do_POST = _handle
+            do_HEAD = _handle
+
+        return _Handler
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Serve in a background thread"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="mock-turnitin", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = Counter()
+            self.server_delay = 0.0
+            self.upload_bytes = 0
+            self.downloads = Counter()
+            self.request_times = []
+
+    def summary(self):
+        """Request counts and server-side timing"""
+        with self._lock:
+            times = [seconds for _, seconds in self.request_times]
+            return {
+                'requests': sum(self.requests.values()),
+                'by_route': dict(sorted(self.requests.items())),
+                'injected_latency_s': round(self.server_delay, 2),
+                'request_p50_ms': round(percentile(times, 50) * 1000, 1) if times else None,
+                'request_p95_ms': round(percentile(times, 95) * 1000, 1) if times else None,
+                'upload_bytes': self.upload_bytes,
+                'downloads': dict(self.downloads),
+                'inbox_rows': len(self.submissions),
+            }
+
+def parse_route_latency(values):
+    """['/app/carta/download=2.5', ...] -> {'/app/carta/download': 2.5}"""
+    routes = {}
+    for value in values or []:
+        prefix, _, seconds = value.partition('=')
+        routes[prefix] = float(seconds)
+    return routes
+
+def add_site_arguments(parser):
+    """Mock site options shared with bench/pipeline_benchmark.py"""
+    parser.add_argument('--inbox-rows', type=int, default=50, help="older submissions already in the inbox")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random 0..N seconds per request")
+    parser.add_argument('--route-latency', action='append', metavar='PREFIX=SECONDS',
+                        help="fixed delay for paths starting with PREFIX (repeatable)")
+    parser.add_argument('--processing-seconds', type=float, default=3.0, help="upload -> confirm button enabled")
+    parser.add_argument('--still-processing-after', type=float, default=20.0,
+                        help="show the long-processing notice after this many seconds")
+    parser.add_argument('--similarity-delay', type=float, default=0.0, help="inbox shows '--' this long after confirm")
+    parser.add_argument('--viewer-render-seconds', type=float, default=1.0, help="download control render delay")
+    parser.add_argument('--no-ai', action='store_true', help="AI Writing badge shows '--' (report unavailable)")
+    parser.add_argument('--report-kb', type=int, default=200, help="size of the report PDF fixtures")
+    parser.add_argument('--seed', type=int, default=None)
+
+def site_from_args(args, port, email=None, password=None):
+    latency = LatencyModel(args.latency, args.jitter, parse_route_latency(args.route_latency), seed=args.seed)
+    return MockTurnitin(
+        port=port,
+        latency=latency,
+        inbox_rows=args.inbox_rows,
+        processing_seconds=args.processing_seconds,
+        still_processing_after=args.still_processing_after,
+        similarity_delay=args.similarity_delay,
+        viewer_render_seconds=args.viewer_render_seconds,
+        ai_available=not args.no_ai,
+        report_kb=args.report_kb,
+        email=email,
+        password=password,
+        seed=args.seed,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Turnitin stand-in")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--email', help="only accept this login email")
+    parser.add_argument('--password', help="only accept this login password")
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    site = site_from_args(args, args.port, args.email, args.password)
+    site.host = args.host
+    site.start()
+    print(f"Mock Turnitin listening on {site.base_url} ({len(site.submissions)} inbox rows)")
+    print(f"  TURNITIN_BASE_URL={site.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.stop()
+        print(json.dumps(site.summary(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of the Turnitin browser pipeline against the local stand-ins.
+
+Starts bench/mock_turnitin.py and bench/fake_bot_api.py, points the bot at them
+(TURNITIN_BASE_URL / TELEGRAM_API_URL) and runs process_turnitin for --jobs documents
+one after another on a single worker thread, like the production worker: the first
+job pays for browser launch + login, later jobs reuse the session.
+
+Each pipeline step is timed by wrapping the functions process_turnitin calls:
+
+  session   get_session_page (includes login on a cold start)
+  login     check_and_perform_login
+  submit    submit_document (Quick Submit form, upload, processing, confirm)
+  find      find_submission_with_retry (inbox sort + row scan, opening the viewer)
+  download  download_reports_with_retry (viewer badges, menu downloads, delivery)
+  deliver   send_reports_to_user (Telegram upload, part of download)
+  total     process_turnitin
+
+Requires Playwright with Chromium installed; nothing leaves the machine.
+
+Usage:
+    python bench/pipeline_benchmark.py --jobs 3
+    python bench/pipeline_benchmark.py --jobs 5 --inbox-rows 1000 --latency 0.2 --processing-seconds 10
+    python bench/pipeline_benchmark.py --jobs 3 --no-human-delay --json pipeline.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from fake_bot_api import FakeBotAPI, percentile
+from mock_turnitin import add_site_arguments, site_from_args
+
+STAGES = ['session', 'login', 'submit', 'find', 'download', 'deliver', 'total']
+FIRST_CHAT_ID = 200000
+
+class StageTimer:
+    """Records how long each wrapped pipeline function takes, per job"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current_job = None
+        self.jobs = []    # one dict per job: stage -> seconds
+
+    def begin_job(self, index):
+        with self._lock:
+            self.current_job = {'job': index}
+            self.jobs.append(self.current_job)
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    if self.current_job is not None:
+                        self.current_job[stage] = self.current_job.get(stage, 0.0) + elapsed
+        return timed
+
+def install_timers(timer):
+    """Wrap the pipeline steps where process_turnitin looks them up"""
+    import turnitin_auth
+    import turnitin_processor
+    import turnitin_reports
+
+    turnitin_auth.check_and_perform_login = timer.wrap('login', turnitin_auth.check_and_perform_login)
+    turnitin_processor.get_session_page = timer.wrap('session', turnitin_processor.get_session_page)
+    turnitin_processor.submit_document = timer.wrap('submit', turnitin_processor.submit_document)
+    turnitin_processor.find_submission_with_retry = timer.wrap('find', turnitin_processor.find_submission_with_retry)
+    turnitin_processor.download_reports_with_retry = timer.wrap('download', turnitin_processor.download_reports_with_retry)
+    turnitin_reports.send_reports_to_user = timer.wrap('deliver', turnitin_reports.send_reports_to_user)
+    return timer.wrap('total', turnitin_processor.process_turnitin)
+
+def disable_human_delays():
+    """Turn the random_wait pauses into no-ops to measure round trips only (fixed sleeps remain)"""
+    import turnitin_auth
+    import turnitin_reports
+    import turnitin_submission
+
+    def no_wait(*args, **kwargs):
+        return None
+
+    for module in (turnitin_auth, turnitin_submission, turnitin_reports):
+        module.random_wait = no_wait
+
+def run_jobs(process, bot, jobs, file_kb, results):
+    """Worker thread body: process the documents sequentially, then close the browser"""
+    from turnitin_auth import cleanup_browser_session
+
+    os.makedirs("uploads", exist_ok=True)
+    try:
+        for index in range(jobs):
+            file_path = os.path.join("uploads", f"bench_{index + 1}.docx")
+            with open(file_path, 'wb') as f:
+                f.write(os.urandom(file_kb * 1024))
+            results['timer'].begin_job(index + 1)
+            try:
+                outcome = process(file_path, FIRST_CHAT_ID + index, bot)
+                results['timer'].current_job['ok'] = bool(outcome)
+            except Exception as e:
+                results['timer'].current_job['ok'] = False
+                results['timer'].current_job['error'] = str(e)
+            finally:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+    finally:
+        cleanup_browser_session()
+
+def summarize(jobs):
+    """Per-stage p50 / max over all jobs, and over warm jobs (session already open)"""
+    def stats(rows):
+        out = {}
+        for stage in STAGES:
+            values = [row[stage] for row in rows if stage in row]
+            if values:
+                out[stage] = {
+                    'n': len(values),
+                    'p50_s': round(percentile(values, 50), 2),
+                    'max_s': round(max(values), 2),
+                }
+        return out
+
+    warm = [row for row in jobs if 'login' not in row]
+    return {'all': stats(jobs), 'warm': stats(warm)}
+
+def print_report(result):
+    print("\n=== Per job (seconds)")
+    print("  " + f"{'job':<5}" + "".join(f"{stage:>10}" for stage in STAGES) + "  ok")
+    for row in result['jobs']:
+        cells = "".join(f"{row[stage]:>10.2f}" if stage in row else f"{'-':>10}" for stage in STAGES)
+        print(f"  {row['job']:<5}{cells}  {'yes' if row.get('ok') else 'NO ' + row.get('error', '')}")
+
+    for label, stats in (('all jobs', result['summary']['all']), ('warm jobs', result['summary']['warm'])):
+        if not stats:
+            continue
+        print(f"\n=== Stages, {label}")
+        for stage, values in stats.items():
+            print(f"  {stage:<10} n={values['n']:<4} p50={values['p50_s']:>8}s max={values['max_s']:>8}s")
+
+    site = result['site']
+    print(f"\n=== Mock Turnitin: {site['requests']} requests, p50={site['request_p50_ms']}ms "
+          f"p95={site['request_p95_ms']}ms, injected latency {site['injected_latency_s']}s")
+    for route, count in site['by_route'].items():
+        print(f"  {route:<40} {count}")
+    calls = ", ".join(f"{method}={count}" for method, count in sorted(result['telegram_calls'].items()))
+    print(f"\n=== Telegram calls: {calls}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Turnitin pipeline benchmark against the offline stand-ins")
+    parser.add_argument('--jobs', type=int, default=3)
+    parser.add_argument('--file-kb', type=int, default=64, help="size of each submitted document")
+    parser.add_argument('--site-port', type=int, default=18090)
+    parser.add_argument('--api-port', type=int, default=18082)
+    parser.add_argument('--no-human-delay', action='store_true',
+                        help="skip random_wait pauses (fixed sleeps in the pipeline still apply)")
+    parser.add_argument('--json', dest='json_path', help="also write the results to this file")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary working directory")
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    site = site_from_args(args, args.site_port).start()
+    api = FakeBotAPI(port=args.api_port).start()
+
+    original_cwd = os.getcwd()
+    json_path = os.path.join(original_cwd, args.json_path) if args.json_path else None
+    workdir = tempfile.mkdtemp(prefix="turni_pipeline_")
+    os.chdir(workdir)
+
+    # Set before the bot modules load (load_dotenv does not override existing values)
+    os.environ['TURNITIN_BASE_URL'] = site.base_url
+    os.environ['TURNITIN_EMAIL'] = "bench@example.com"
+    os.environ['TURNITIN_PASSWORD'] = "bench"
+    os.environ['WEBSHARE_API_TOKEN'] = ""
+    os.environ['MANUAL_PROXY'] = ""
+    os.environ['TELEGRAM_BOT_TOKEN'] = "123456:PIPELINE"
+    os.environ['TELEGRAM_API_URL'] = f"http://127.0.0.1:{args.api_port}"
+    os.environ['ADMIN_TELEGRAM_ID'] = "1"
+    os.environ.pop('TELEGRAM_WEBHOOK_URL', None)
+
+    import main as bot_main
+    bot = bot_main.bot
+
+    timer = StageTimer()
+    process = install_timers(timer)
+    if args.no_human_delay:
+        disable_human_delays()
+
+    results = {'timer': timer}
+    started = time.time()
+    try:
+        worker = threading.Thread(
+            target=run_jobs,
+            args=(process, bot, args.jobs, args.file_kb, results),
+            name="Worker-1",
+            daemon=True
+        )
+        worker.start()
+        worker.join()
+        bot.flush_outbound(timeout=60)
+    finally:
+        api.stop()
+        site.stop()
+        os.chdir(original_cwd)
+        if args.keep:
+            print(f"Working directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with api._lock:
+        telegram_calls = dict(api.calls)
+    result = {
+        'jobs': [{k: (round(v, 3) if isinstance(v, float) else v) for k, v in row.items()} for row in timer.jobs],
+        'summary': summarize(timer.jobs),
+        'wall_s': round(time.time() - started, 2),
+        'site': site.summary(),
+        'telegram_calls': telegram_calls,
+        'settings': {k: v for k, v in vars(args).items() if k != 'json_path'},
+    }
+    print_report(result)
+    print(f"\nWall time: {result['wall_s']}s for {args.jobs} job(s)")
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Serve page captures recorded with TURNITIN_RECORD_DIR, with no network access.
+
+Recording (see page_recorder.py) writes one folder per job: a scrubbed DOM snapshot
+per pipeline step plus the XHR/fetch bodies seen before it, described by
+manifest.json. This server replays such a folder:
+
+  GET <path>            the snapshot(s) recorded at that path; repeated requests walk
+                        through them in recorded order (processing -> confirm, ...)
+                        and then stay on the last one
+  GET <xhr path>        the recorded XHR/fetch body with its status and content type
+  GET /__steps          the manifest steps as JSON
+  GET /__step/<n>       snapshot n (1-based) directly
+
+Absolute turnitin.com links are rewritten to stay on the replay server. Parser and
+flow benchmarks can also read snapshots directly with load_step_html().
+
+Usage:
+    TURNITIN_RECORD_DIR=captures python main.py        # record while the bot runs
+    python bench/replay_server.py captures              # replay the newest job
+    python bench/replay_server.py captures/20261019_101500_Worker-1 --port 8091
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+TURNITIN_HOST_RE = re.compile(r'https?://[A-Za-z0-9.-]*turnitin\.com')
+
+def find_capture_dir(path, job=None):
+    """Resolve a job folder: path itself if it has a manifest, else the named/newest job inside it"""
+    if os.path.exists(os.path.join(path, "manifest.json")):
+        return path
+    jobs = sorted(
+        name for name in os.listdir(path)
+        if os.path.exists(os.path.join(path, name, "manifest.json"))
+    )
+    if job:
+        if job not in jobs:
+            raise SystemExit(f"No capture '{job}' in {path}")
+        return os.path.join(path, job)
+    if not jobs:
+        raise SystemExit(f"No captures (manifest.json) found under {path}")
+    return os.path.join(path, jobs[-1])
+
+def load_manifest(capture_dir):
+    with open(os.path.join(capture_dir, "manifest.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_step_html(capture_dir, step):
+    """Snapshot HTML of the last recorded step with this name (e.g. 'inbox', 'viewer')"""
+    for entry in reversed(load_manifest(capture_dir)['steps']):
+        if entry['step'] == step:
+            with open(os.path.join(capture_dir, entry['file']), 'r', encoding='utf-8') as f:
+                return f.read()
+    raise KeyError(f"step '{step}' not recorded in {capture_dir}")
+
+class ReplayServer:
+    """Serves one recorded job folder"""
+
+    def __init__(self, capture_dir, host="127.0.0.1", port=8091):
+        self.capture_dir = capture_dir
+        self.host = host
+        self.port = port
+        self.manifest = load_manifest(capture_dir)
+
+        self._lock = threading.Lock()
+        self.pages = {}       # path -> [step entries in recorded order]
+        self.xhr = {}         # path -> [xhr entries in recorded order]
+        self._position = {}   # path -> index of the next page/xhr to serve
+        for step in self.manifest['steps']:
+            self.pages.setdefault(step['path'], []).append(step)
+            for entry in step.get('xhr', []):
+                self.xhr.setdefault(entry['path'], []).append(entry)
+
+        self.requests = Counter()
+        self.misses = Counter()
+        self._httpd = None
+
+    def _next(self, table, path):
+        """Walk through the recordings for path, staying on the last one"""
+        entries = table[path]
+        with self._lock:
+            index = self._position.get((id(table), path), 0)
+            self._position[(id(table), path)] = min(index + 1, len(entries) - 1)
+        return entries[index]
+
+    def reset(self):
+        """Start every path from its first recording again"""
+        with self._lock:
+            self._position = {}
+
+    def _read(self, name):
+        with open(os.path.join(self.capture_dir, name), 'rb') as f:
+            return f.read()
+
+    def resolve(self, path):
+        """Return (status, content_type, body) for a request path"""
+        if path == '/__steps':
+            return 200, 'application/json', json.dumps(self.manifest['steps'], indent=2).encode('utf-8')
+        if path.startswith('/__step/'):
+            try:
+                entry = self.manifest['steps'][int(path.rsplit('/', 1)[1]) - 1]
+            except (ValueError, IndexError):
+                return 404, 'text/plain', b"No such step"
+            return 200, 'text/html; charset=utf-8', self._page_body(entry)
+        if path in self.pages:
+            return 200, 'text/html; charset=utf-8', self._page_body(self._next(self.pages, path))
+        if path in self.xhr:
+            entry = self._next(self.xhr, path)
+            return entry.get('status', 200), entry.get('content_type', 'application/json'), self._read(entry['file'])
+        return 404, 'text/plain', b"Not recorded"
+
+    def _page_body(self, entry):
+        markup = self._read(entry['file']).decode('utf-8')
+        return TURNITIN_HOST_RE.sub("", markup).encode('utf-8')
+
+    def _make_handler(self):
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length', 0) or 0)
+                if length:
+                    self.rfile.read(length)
+                path = urlparse(self.path).path
+                status, content_type, body = server.resolve(path)
+                with server._lock:
+                    server.requests[path] += 1
+                    if status == 404:
+                        server.misses[path] += 1
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return _Handler
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Serve in a background thread"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="replay-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Turnitin page captures")
+    parser.add_argument('captures', help="a job folder, or a folder of job folders (newest is used)")
+    parser.add_argument('--job', help="job folder name inside captures")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8091)
+    args = parser.parse_args()
+
+    capture_dir = find_capture_dir(args.captures, args.job)
+    server = ReplayServer(capture_dir, host=args.host, port=args.port)
+    print(f"Replaying {capture_dir} on {server.base_url}")
+    for index, step in enumerate(server.manifest['steps'], start=1):
+        print(f"  {index:>2}. {step['step']:<24} {step['path']}  ({len(step.get('xhr', []))} XHR)")
+    server._httpd = ThreadingHTTPServer((server.host, server.port), server._make_handler())
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        if server.misses:
+            print("Requests for paths that were not recorded:")
+            for path, count in server.misses.most_common(20):
+                print(f"  {path}  x{count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Replay job arrival traces against the processing-queue scheduling policies.
+
+Each trace line is one finished job, as written by the bot with
+JOB_TRACE_FILE=job_trace.jsonl:
+
+  {"arrival": 1760000000.0, "user": "3fa1c0de22", "admin": false,
+   "file_size": 1048576, "service": 142.5, "ok": true}
+
+The simulator feeds the arrivals into job_scheduler.JobScheduler with N workers.
+Every job takes its recorded service time. It then reports the queue wait
+(arrival -> a worker picks it up) for each policy: mean, p50, p95, p99 and max
+overall, p95 for admin jobs, and the mean wait per user: the median user
+(what a typical user sees) and the worst-off one.
+
+sjf predicts durations the way the bot does: the mean service time of the
+job's file-size bucket, taken from the trace. It is never the job's own
+service time.
+
+Without --trace a synthetic trace is generated. It has steady single-document
+users, plus one user who drops a batch of documents at once.
+
+Usage:
+    python bench/schedule_sim.py
+    python bench/schedule_sim.py --trace job_trace.jsonl --workers 1
+    python bench/schedule_sim.py --policies fifo,fair --aging 0.5 --json sim.json
+"""
+
+import argparse
+import contextlib
+import heapq
+import io
+import json
+import os
+import random
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from job_metrics import percentile
+from job_scheduler import POLICIES, JobScheduler, make_policy
+from queue_eta import size_bucket
+
+def load_trace(path):
+    jobs = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                jobs.append(json.loads(line))
+    jobs.sort(key=lambda job: job['arrival'])
+    return jobs
+
+def synthetic_trace(hours=4, users=8, batch_size=10, seed=7):
+    """Single documents from regular users, one batch user, a few admin jobs"""
+    rng = random.Random(seed)
+    jobs = []
+    span = hours * 3600
+    for index in range(users):
+        at = rng.uniform(0, 1800)
+        while at < span:
+            size = int(rng.lognormvariate(13.8, 1.0))     # ~1 MB median
+            jobs.append({'arrival': at, 'user': f"user{index}", 'admin': False,
+                         'file_size': size, 'service': 90 + size / 1048576 * 25 + rng.uniform(0, 60)})
+            at += rng.expovariate(1 / 3600)
+    for burst in range(hours):
+        at = burst * 3600 + rng.uniform(0, 1800)
+        for offset in range(batch_size):
+            size = int(rng.lognormvariate(14.5, 0.8))
+            jobs.append({'arrival': at + offset * 2, 'user': "batch", 'admin': False,
+                         'file_size': size, 'service': 90 + size / 1048576 * 25 + rng.uniform(0, 60)})
+    for _ in range(hours * 2):
+        jobs.append({'arrival': rng.uniform(0, span), 'user': "admin", 'admin': True,
+                     'file_size': 500000, 'service': 120})
+    jobs.sort(key=lambda job: job['arrival'])
+    return jobs
+
+def bucket_predictor(jobs):
+    """Mean service per size bucket (what queue_eta learns), falling back to the overall mean"""
+    totals = {}
+    for job in jobs:
+        bucket = totals.setdefault(size_bucket(job['file_size']), [0.0, 0])
+        bucket[0] += job['service']
+        bucket[1] += 1
+    overall = sum(job['service'] for job in jobs) / max(1, len(jobs))
+    means = {name: total / count for name, (total, count) in totals.items()}
+    return lambda item: means.get(size_bucket(item.get('file_size')), overall)
+
+def simulate(jobs, policy_name, workers=1, aging=1.0, admin_lane=True):
+    """Wait (seconds) per job under a policy: discrete-event replay, no threads"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        policy = make_policy(policy_name, bucket_predictor(jobs), aging)
+    scheduler = JobScheduler(policy, admin_lane)
+    free_at = [0.0] * workers          # heap of times workers become free
+    heapq.heapify(free_at)
+    pending = list(jobs)
+    next_arrival = 0
+    waits = []
+
+    while next_arrival < len(pending) or scheduler.qsize():
+        worker_free = heapq.heappop(free_at)
+        # The worker idles until something is queued
+        if not scheduler.qsize():
+            worker_free = max(worker_free, pending[next_arrival]['arrival'])
+        # Everything that has arrived by then is visible to the scheduler
+        while next_arrival < len(pending) and pending[next_arrival]['arrival'] <= worker_free:
+            job = pending[next_arrival]
+            scheduler.put({
+                'user_id': job['user'], 'admin': job.get('admin', False), 'file_size': job['file_size'],
+                'queued_at': job['arrival'], 'service': job['service'],
+            })
+            next_arrival += 1
+        item = scheduler.get_nowait()
+        waits.append((item, worker_free - item['queued_at']))
+        heapq.heappush(free_at, worker_free + item['service'])
+    return waits
+
+def summarize(waits):
+    def stats(values):
+        if not values:
+            return None
+        return {
+            'jobs': len(values),
+            'mean': round(sum(values) / len(values), 1),
+            'p50': round(percentile(values, 50), 1),
+            'p95': round(percentile(values, 95), 1),
+            'p99': round(percentile(values, 99), 1),
+            'max': round(max(values), 1),
+        }
+
+    per_user = {}
+    for item, wait in waits:
+        per_user.setdefault(item['user_id'], []).append(wait)
+    user_means = {user: sum(values) / len(values) for user, values in per_user.items()}
+    worst_user = max(user_means, key=user_means.get) if user_means else None
+    return {
+        'all': stats([wait for _, wait in waits]),
+        'admin': stats([wait for item, wait in waits if item.get('admin')]),
+        'median_user_mean': round(percentile(list(user_means.values()), 50), 1) if user_means else None,
+        'worst_user': {'user': worst_user, 'mean': round(user_means[worst_user], 1)} if worst_user else None,
+    }
+
+def print_report(results, workers, jobs):
+    print(f"\n{len(jobs)} jobs, {workers} worker(s), waits in seconds\n")
+    header = (f"{'policy':<10}{'mean':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'admin p95':>11}"
+              f"{'median user':>13}  worst user (mean)")
+    print(header)
+    print("-" * len(header))
+    for name, summary in results.items():
+        overall = summary['all']
+        admin = summary['admin']
+        worst = summary['worst_user']
+        print(f"{name:<10}{overall['mean']:>8}{overall['p50']:>8}{overall['p95']:>8}{overall['p99']:>8}"
+              f"{overall['max']:>8}{(admin['p95'] if admin else '-'):>11}{summary['median_user_mean']:>13}  "
+              f"{worst['user']} ({worst['mean']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay arrival traces against job scheduling policies")
+    parser.add_argument('--trace', help="JSON-lines trace (JOB_TRACE_FILE); synthetic when omitted")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--policies', default=",".join(POLICIES), help=f"comma-separated subset of {POLICIES}")
+    parser.add_argument('--aging', type=float, default=1.0, help="shortest-first aging (seconds forgiven per second waited)")
+    parser.add_argument('--no-admin-lane', action='store_true')
+    parser.add_argument('--seed', type=int, default=7, help="synthetic trace seed")
+    parser.add_argument('--json', help="write results to this file")
+    args = parser.parse_args()
+
+    jobs = load_trace(args.trace) if args.trace else synthetic_trace(seed=args.seed)
+    if not jobs:
+        sys.exit("Trace is empty")
+
+    results = {}
+    for name in [p.strip() for p in args.policies.split(",") if p.strip()]:
+        waits = simulate(jobs, name, args.workers, args.aging, not args.no_admin_lane)
+        results[name] = summarize(waits)
+    print_report(results, args.workers, jobs)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'workers': args.workers, 'jobs': len(jobs), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,8 @@ def register_callback_handlers(bot, ADMIN_TELEGRAM_ID, MONTHLY_PLANS, DOCUMENT_P
                               load_pending_requests, save_pending_requests, load_subscriptions, 
                               save_subscriptions, is_user_subscribed, get_user_subscription_info,
                               create_main_menu, create_monthly_plans_menu, create_document_plans_menu,
-                              create_admin_menu, processing_queue, log, get_user_submission_history):
+                              create_admin_menu, processing_queue, log, get_user_submission_history,
+                              cancel_job=None, active_jobs=None):
     """Register all callback query handlers"""
     
     @bot.callback_query_handler(func=lambda call: True)
@@ -17,7 +18,8 @@ def register_callback_handlers(bot, ADMIN_TELEGRAM_ID, MONTHLY_PLANS, DOCUMENT_P
         # Admin callbacks
         if user_id == ADMIN_TELEGRAM_ID:
             handle_admin_callbacks(call, bot, ADMIN_TELEGRAM_ID, load_subscriptions, 
-                                 load_pending_requests, processing_queue, create_admin_menu, log, get_user_submission_history)
+                                 load_pending_requests, processing_queue, create_admin_menu, log, get_user_submission_history,
+                                 cancel_job, active_jobs)
             return
         
         # User callbacks
@@ -328,7 +330,8 @@ Use /approve {request_id} to approve this request."""
     bot.send_message(ADMIN_TELEGRAM_ID, admin_message)
 
 def handle_admin_callbacks(call, bot, ADMIN_TELEGRAM_ID, load_subscriptions, 
-                          load_pending_requests, processing_queue, create_admin_menu, log, get_user_submission_history):
+                          load_pending_requests, processing_queue, create_admin_menu, log, get_user_submission_history,
+                          cancel_job=None, active_jobs=None):
     """Handle admin callback queries"""
     if call.data == "admin_view_subs":
         show_all_subscriptions(call, bot, load_subscriptions, create_admin_menu)
@@ -342,7 +345,16 @@ def handle_admin_callbacks(call, bot, ADMIN_TELEGRAM_ID, load_subscriptions,
         show_admin_stats(call, bot, load_subscriptions, load_pending_requests, 
                         processing_queue, create_admin_menu)
     elif call.data == "admin_queue":
-        show_processing_queue(call, bot, processing_queue, create_admin_menu)
+        show_processing_queue(call, bot, processing_queue, create_admin_menu, active_jobs)
+    elif call.data.startswith("admin_cancel_job_") and cancel_job:
+        job_id = call.data[len("admin_cancel_job_"):]
+        ok, result = cancel_job(job_id, call.from_user.id)
+        log(f"Admin cancel of job {job_id}: {result}")
+        try:
+            bot.answer_callback_query(call.id, "Cancelled" if ok else "Job not found")
+        except Exception:
+            pass
+        show_processing_queue(call, bot, processing_queue, create_admin_menu, active_jobs)
     elif call.data == "admin_bot_stats":
         show_bot_stats(call, bot, create_admin_menu)
     elif call.data == "back_to_admin":
@@ -518,15 +530,16 @@ def show_admin_stats(call, bot, load_subscriptions, load_pending_requests,
         reply_markup=markup
     )
 
-def show_processing_queue(call, bot, processing_queue, create_admin_menu):
-    """Show current processing queue to admin"""
+def show_processing_queue(call, bot, processing_queue, create_admin_menu, active_jobs=None):
+    """Show current processing queue to admin (with a cancel button per job)"""
     import os
     queue_list = list(processing_queue.queue)
+    running = active_jobs() if active_jobs else []
     
     markup = types.InlineKeyboardMarkup()
-    markup.add(types.InlineKeyboardButton("⬅️ Back", callback_data="back_to_admin"))
     
-    if not queue_list:
+    if not queue_list and not running:
+        markup.add(types.InlineKeyboardButton("⬅️ Back", callback_data="back_to_admin"))
         bot.edit_message_text(
             "📄 <b>Processing Queue</b>\n\nQueue is empty.",
             call.message.chat.id,
@@ -537,16 +550,32 @@ def show_processing_queue(call, bot, processing_queue, create_admin_menu):
     
     queue_text = f"📄 <b>Processing Queue ({len(queue_list)} items)</b>\n\n"
     
+    for item in running:
+        queue_text += f"▶️ User ID: {item['user_id']} (job {item.get('job_id')})\n"
+        queue_text += f"   File: {os.path.basename(item['file_path'])}\n"
+        queue_text += f"   Status: processing since {item.get('started_time', 'Unknown')}\n\n"
+        if item.get('job_id'):
+            markup.add(types.InlineKeyboardButton(
+                f"🚫 Cancel running {item['job_id']}", callback_data=f"admin_cancel_job_{item['job_id']}"
+            ))
+    
     for i, item in enumerate(queue_list[:10]):  # Show first 10 items
         status = item.get('status', 'pending')
-        queue_text += f"{i+1}. User ID: {item['user_id']}\n"
+        queue_text += f"{i+1}. User ID: {item['user_id']} (job {item.get('job_id')})\n"
         queue_text += f"   File: {os.path.basename(item['file_path'])}\n"
         queue_text += f"   Status: {status}\n"
         queue_text += f"   Added: {item.get('added_time', 'Unknown')}\n\n"
+        if item.get('job_id'):
+            markup.add(types.InlineKeyboardButton(
+                f"🚫 Cancel #{i+1} ({item['job_id']})", callback_data=f"admin_cancel_job_{item['job_id']}"
+            ))
     
     if len(queue_list) > 10:
         queue_text += f"... and {len(queue_list) - 10} more items"
     
+    markup.add(types.InlineKeyboardButton("🔄 Refresh", callback_data="admin_queue"))
+    markup.add(types.InlineKeyboardButton("⬅️ Back", callback_data="back_to_admin"))
+    
     bot.edit_message_text(
         queue_text,
         call.message.chat.id,
@@ -559,13 +588,20 @@ def show_bot_stats(call, bot, create_admin_menu):
     try:
         bot_stats = bot.get_stats()
         
+        top_calls = sorted(bot_stats.get('api_calls', {}).items(), key=lambda kv: kv[1], reverse=True)[:5]
+        calls_text = "\n".join(f"   • {name}: {count}" for name, count in top_calls) or "   • none yet"
+        
         stats_text = f"""🔧 <b>Bot Connection Statistics</b>
 
 🌐 <b>Session Active:</b> {bot_stats['session_active']}
 📈 <b>Total Requests:</b> {bot_stats['total_requests']}
+{calls_text}
+⏱️ <b>Throttle Waits:</b> {bot_stats.get('throttle_waits', 0)} ({bot_stats.get('throttle_wait_seconds', 0)}s)
+🚦 <b>429 Retries:</b> {bot_stats.get('retries_429', 0)}
+❌ <b>API Errors:</b> {bot_stats.get('api_errors', 0)}
 📊 <b>Connection Pool:</b> Active
 🔄 <b>Retry Strategy:</b> Enabled
-⚡ <b>Rate Limiting:</b> Active
+⚡ <b>Rate Limiting:</b> 1 msg/s per chat, 30 msg/s global
 
 📈 <b>Generated:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
         
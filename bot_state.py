@@ -0,0 +1,30 @@
+import threading
+import time
+
+# Runtime state shared by the bot layer (main.py, handlers) and the browser layer
+# (turnitin_*). Lives here rather than in main.py: main runs as __main__, so
+# `from main import ...` would load and start a second copy of the bot.
+
+# Set while a Turnitin login runs (uploads are still accepted; they wait in the queue)
+bot_is_logging_in = threading.Event()
+
+# Set on SIGTERM/SIGINT: no new documents, running jobs drain, the queue is saved for the next start
+shutdown_requested = threading.Event()
+
+# Set once the worker has imported the Playwright/turnitin_* stack (the startup git pull waits for it)
+browser_stack_loaded = threading.Event()
+
+# Lock-free views for the metrics endpoint and /status (each entry is replaced, never mutated)
+worker_status = {}   # worker_id -> {'state', 'since', 'user_id', 'job', 'file_size', 'job_id'}
+queued_since = {}    # id(queue_item) -> time it was queued
+
+def set_worker_status(worker_id, state, user_id=None, job=None, file_size=None, job_id=None):
+    worker_status[worker_id] = {
+        'state': state, 'since': time.time(), 'user_id': user_id, 'job': job, 'file_size': file_size, 'job_id': job_id
+    }
+
+def login_started():
+    bot_is_logging_in.set()
+
+def login_finished():
+    bot_is_logging_in.clear()
@@ -0,0 +1,301 @@
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+from metrics_server import BROWSERS_REAPED, descendants, is_browser_process, list_processes, read_proc_status
+
+# Every Playwright driver / Chromium PID this bot launches, across runs
+REGISTRY_FILE = "browser_pids.json"
+# Seconds between reaper passes
+REAPER_INTERVAL = int(os.getenv("BROWSER_REAPER_INTERVAL", "60") or 60)
+# A released browser still alive after this long is killed
+RELEASE_GRACE_SECONDS = 15
+# Seconds between SIGTERM and SIGKILL
+KILL_GRACE_SECONDS = 3
+# Marker in the command line of Playwright-launched Chromium (its temporary profile)
+PLAYWRIGHT_PROFILE_MARKER = "playwright_chromiumdev_profile"
+
+_lock = threading.Lock()
+_entries = None          # list of registry entries (loaded once)
+_reaper_started = False
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def is_supported():
+    """The registry walks /proc; elsewhere (Windows) every function is a no-op"""
+    return os.path.isdir("/proc")
+
+def _start_ticks(pid):
+    """Process start time in clock ticks since boot (tells a PID apart from a later reuse)"""
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            # The command name may contain spaces; the fields after it are fixed
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _cmdline(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode('utf-8', 'replace')
+    except OSError:
+        return ""
+
+def _alive(entry):
+    """Still running and still the process that was registered"""
+    return _start_ticks(entry['pid']) == entry['start_ticks']
+
+def _load():
+    global _entries
+    if _entries is None:
+        try:
+            with open(REGISTRY_FILE, 'r') as f:
+                _entries = json.load(f)
+        except (OSError, ValueError):
+            _entries = []
+    return _entries
+
+def _save():
+    tmp_path = REGISTRY_FILE + ".tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(_entries, f, indent=2)
+        os.replace(tmp_path, REGISTRY_FILE)
+    except OSError as e:
+        log(f"Browser registry: could not save {REGISTRY_FILE}: {e}")
+
+# ---- Launch bookkeeping ----------------------------------------------------
+
+def snapshot_children():
+    """Direct children of this process (call before launching the driver or a browser)"""
+    if not is_supported():
+        return set()
+    processes = list_processes() or {}
+    return {pid for pid, (_, ppid, _) in processes.items() if ppid == os.getpid()}
+
+def _browsers_below(processes, drivers=None):
+    """Browser processes below the given driver PIDs (below this process when there are none)"""
+    found = set()
+    for root in drivers or [os.getpid()]:
+        found.update(pid for pid in descendants(root, processes) if is_browser_process(processes[pid][0]))
+    return found
+
+def snapshot_browsers(drivers=None):
+    """Browser processes below these drivers (call before launching a browser)"""
+    if not is_supported():
+        return set()
+    return _browsers_below(list_processes() or {}, drivers)
+
+def register_new(before, kind, browser_only=False, drivers=None, role='active'):
+    """Record the processes that appeared since `before` (snapshot_children/snapshot_browsers).
+
+    kind is 'driver' or 'browser'. Only top-level processes are recorded; their
+    helpers (renderers, GPU process) are found again from the tree when needed.
+    Browsers are looked for below `drivers` (the launching thread's own Playwright
+    driver), so a browser another worker starts at the same moment is not picked up.
+    role is 'active' or 'standby' (a warm standby browser, see set_role()).
+    Returns the registered PIDs, which the session keeps for release().
+    """
+    if not is_supported():
+        return []
+    processes = list_processes() or {}
+    if browser_only:
+        current = _browsers_below(processes, drivers)
+    else:
+        current = {pid for pid, (_, ppid, _) in processes.items() if ppid == os.getpid()}
+    new = current - set(before)
+    # Keep the roots: a new browser whose parent is also new is one of its helpers
+    roots = sorted(pid for pid in new if processes[pid][1] not in new)
+    thread = threading.current_thread()
+    with _lock:
+        entries = _load()
+        for pid in roots:
+            entries.append({
+                'pid': pid,
+                'start_ticks': _start_ticks(pid),
+                'kind': kind,
+                'role': role,
+                'name': processes[pid][0],
+                'owner_pid': os.getpid(),
+                'owner_start_ticks': _start_ticks(os.getpid()),
+                'owner_thread': thread.name,
+                'owner_ident': thread.ident,
+                'launched_at': datetime.now().isoformat(timespec='seconds'),
+                'released_at': None,
+            })
+        _save()
+    if roots:
+        log(f"[{thread.name}] 🗂️ Registered {kind} PID(s): {', '.join(map(str, roots))}")
+    return roots
+
+def set_role(pids, role):
+    """A registered browser changed role (the warm standby was swapped in as the active one)"""
+    if not pids or not is_supported():
+        return
+    with _lock:
+        for entry in _load():
+            if entry['pid'] in pids and entry['owner_pid'] == os.getpid():
+                entry['role'] = role
+        _save()
+
+def release(pids):
+    """A session closed these processes; the reaper kills any that are still alive after a grace period"""
+    if not pids or not is_supported():
+        return
+    with _lock:
+        for entry in _load():
+            if entry['pid'] in pids and entry['owner_pid'] == os.getpid() and not entry['released_at']:
+                entry['released_at'] = time.time()
+        _save()
+
+def tree_rss(pids):
+    """Resident memory of these processes and everything below them"""
+    processes = list_processes()
+    if not processes:
+        return 0
+    # The browser is registered too but runs below the driver: count each process once
+    tree = set()
+    for pid in pids or []:
+        if pid in processes:
+            tree.add(pid)
+            tree.update(descendants(pid, processes))
+    return sum(processes[pid][2] for pid in tree if pid in processes)
+
+# ---- Killing ---------------------------------------------------------------
+
+def _kill_tree(pid, reason):
+    """SIGTERM a process and its descendants, SIGKILL whatever is left"""
+    processes = list_processes() or {}
+    targets = [pid] + descendants(pid, processes)
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        remaining = [target for target in targets if read_proc_status(target) is not None]
+        if not remaining:
+            break
+        for target in remaining:
+            try:
+                os.kill(target, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+        if sig == signal.SIGTERM:
+            deadline = time.time() + KILL_GRACE_SECONDS
+            while time.time() < deadline and any(read_proc_status(t) is not None for t in remaining):
+                time.sleep(0.1)
+    BROWSERS_REAPED.inc(reason=reason)
+    log(f"🧹 Killed {processes.get(pid, ('process',))[0]} PID {pid} and {len(targets) - 1} helper(s) ({reason})")
+
+def sweep_stale():
+    """At startup: kill processes registered by earlier runs, and orphaned Playwright Chromium"""
+    if not is_supported():
+        return 0
+    killed = 0
+    with _lock:
+        entries = _load()
+        keep = []
+        for entry in entries:
+            if entry['owner_pid'] == os.getpid() or _owner_alive(entry):
+                keep.append(entry)   # Ours, or another bot process that is still running
+            elif _alive(entry):
+                _kill_tree(entry['pid'], 'stale_run')
+                killed += 1
+        _entries[:] = keep
+        _save()
+
+    # Chromium whose driver died is re-parented to init (or a subreaper) and never cleaned up
+    processes = list_processes() or {}
+    for pid, (name, ppid, _) in processes.items():
+        # Only the top-level browser is re-parented; its helpers still hang below it
+        if (is_browser_process(name) and _orphaned(ppid, processes)
+                and PLAYWRIGHT_PROFILE_MARKER in _cmdline(pid) and _owned_by_us(pid)):
+            _kill_tree(pid, 'orphan')
+            killed += 1
+    if killed:
+        log(f"🧹 Startup sweep killed {killed} stale browser process tree(s)")
+    return killed
+
+def _owner_alive(entry):
+    """The bot process that registered the entry still runs (not a later process reusing its PID)"""
+    if 'owner_start_ticks' not in entry:
+        # Entries written before start ticks were recorded
+        return read_proc_status(entry['owner_pid']) is not None
+    return _start_ticks(entry['owner_pid']) == entry['owner_start_ticks']
+
+def _owned_by_us(pid):
+    try:
+        return os.stat(f"/proc/{pid}").st_uid == os.getuid()
+    except OSError:
+        return False
+
+def _orphaned(ppid, processes):
+    """Parent is init/a subreaper rather than a live Playwright driver"""
+    if ppid == 1:
+        return True
+    name = processes.get(ppid, ('',))[0] or ''
+    return name in ('systemd', 'init', 'tini', 'dumb-init')
+
+def reap_once():
+    """One reaper pass over this run's entries: released-but-alive and dead-owner processes"""
+    if not is_supported():
+        return 0
+    live_threads = {thread.ident for thread in threading.enumerate()}
+    now = time.time()
+    to_kill = []
+    with _lock:
+        keep = []
+        for entry in _load():
+            if entry['owner_pid'] != os.getpid():
+                keep.append(entry)
+                continue
+            if not _alive(entry):
+                continue   # Exited - forget it
+            if entry['released_at'] and now - entry['released_at'] > RELEASE_GRACE_SECONDS:
+                to_kill.append((entry, 'not_closed'))
+            elif entry['owner_ident'] not in live_threads:
+                to_kill.append((entry, 'owner_thread_gone'))
+            else:
+                keep.append(entry)
+        _entries[:] = keep
+        _save()
+    for entry, reason in to_kill:
+        _kill_tree(entry['pid'], reason)
+    return len(to_kill)
+
+def _reaper_loop():
+    while True:
+        time.sleep(REAPER_INTERVAL)
+        try:
+            reap_once()
+        except Exception as e:
+            log(f"Browser reaper error: {e}")
+
+def start_reaper():
+    global _reaper_started
+    if _reaper_started or not is_supported():
+        return
+    _reaper_started = True
+    threading.Thread(target=_reaper_loop, name="browser-reaper", daemon=True).start()
+    log(f"🧹 Browser reaper running every {REAPER_INTERVAL}s")
+
+def collect_metrics():
+    """Registered browsers and their memory for the /metrics endpoint"""
+    with _lock:
+        entries = [dict(entry) for entry in _load() if entry['owner_pid'] == os.getpid()]
+    processes = list_processes() or {}
+    # Labelled by worker and role, not PID: recycles and standby swaps must not add series
+    rss_by_label = {}
+    for entry in entries:
+        if entry['kind'] != 'browser' or entry['released_at'] or entry['pid'] not in processes:
+            continue
+        rss = processes[entry['pid']][2] + sum(processes[child][2] for child in descendants(entry['pid'], processes))
+        label = (entry['owner_thread'], entry.get('role', 'active'))
+        rss_by_label[label] = rss_by_label.get(label, 0) + rss
+    samples = [({'owner': owner, 'role': role}, rss) for (owner, role), rss in sorted(rss_by_label.items())]
+    return [
+        ("turni_browser_registered", "gauge", "Browser and driver processes registered by this run",
+         [({'kind': kind}, sum(1 for entry in entries if entry['kind'] == kind)) for kind in ('driver', 'browser')]),
+        ("turni_browser_tree_rss_bytes", "gauge", "Resident memory of each worker's active/standby browser and its helpers", samples),
+    ]
@@ -151,6 +151,10 @@ Environment=PATH=/root/turnitin_bot/venv/bin
 ExecStart=/root/turnitin_bot/venv/bin/python /root/turnitin_bot/main.py
 Restart=always
 RestartSec=10
+# SIGTERM only the bot: it drains (SHUTDOWN_DRAIN_SECONDS + SHUTDOWN_CHECKPOINT_SECONDS)
+# and closes Chromium itself; whatever is left is killed after TimeoutStopSec
+KillMode=mixed
+TimeoutStopSec=150
 StandardOutput=journal
 StandardError=journal
 SyslogIdentifier=turnitin_bot
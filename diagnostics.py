@@ -0,0 +1,222 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from job_metrics import current_job
+from page_recorder import scrub_html, scrub_text
+
+# Failure bundles are on by default; set TURNITIN_DIAGNOSTICS_DIR= (empty) to disable
+DIAGNOSTICS_DIR = os.getenv("TURNITIN_DIAGNOSTICS_DIR", "diagnostics").strip()
+# Ring directory bound: oldest bundles are deleted beyond these
+DIAGNOSTICS_MAX_MB = float(os.getenv("TURNITIN_DIAGNOSTICS_MAX_MB", "50") or 50)
+DIAGNOSTICS_MAX_BUNDLES = 100
+# Bundles written per job at most (a failing cascade can hit several capture points)
+MAX_BUNDLES_PER_JOB = 3
+# Largest DOM snapshot kept per bundle
+MAX_DOM_BYTES = 2 * 1024 * 1024
+# Optional Playwright trace of the failing window (costs some speed on every job)
+DIAGNOSTICS_TRACE = os.getenv("TURNITIN_DIAGNOSTICS_TRACE", "").strip().lower() in ("1", "true", "yes", "on")
+
+# Recent requests kept per browser context (cheap: no round trips to the browser)
+RECENT_REQUESTS = 60
+# Requests tracked as in flight at most (long-polls that never finish must not pile up)
+MAX_IN_FLIGHT = 500
+
+# Per-worker state (each worker thread owns its own browser context)
+thread_local = threading.local()
+
+_ring_lock = threading.Lock()
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def is_enabled():
+    return bool(DIAGNOSTICS_DIR)
+
+def _state():
+    if not hasattr(thread_local, 'diagnostics'):
+        thread_local.diagnostics = {
+            'label': None,
+            'scrub_values': [],
+            'bundles': 0,
+            'context': None,
+            'tracing': False,
+            'recent': deque(maxlen=RECENT_REQUESTS),
+            'in_flight': {},
+        }
+    return thread_local.diagnostics
+
+# ---- Browser hooks ---------------------------------------------------------
+
+def attach_diagnostics(context):
+    """Keep a ring of recent requests for a new browser context, and start tracing if enabled"""
+    if not is_enabled() or context is None:
+        return
+    state = _state()
+    state['context'] = context
+    state['recent'].clear()
+    state['in_flight'] = {}
+
+    def on_request(request):
+        if len(state['in_flight']) < MAX_IN_FLIGHT:
+            state['in_flight'][id(request)] = (time.time(), request)
+
+    def on_done(request, failure=None):
+        started, _ = state['in_flight'].pop(id(request), (None, None))
+        state['recent'].append({
+            'at': datetime.now().strftime("%H:%M:%S.%f")[:-3],
+            'method': request.method,
+            'url': request.url,
+            'type': request.resource_type,
+            'elapsed_ms': round((time.time() - started) * 1000) if started else None,
+            'failure': failure,
+        })
+
+    context.on("request", on_request)
+    context.on("requestfinished", lambda request: on_done(request))
+    context.on("requestfailed", lambda request: on_done(request, request.failure or "failed"))
+
+    state['tracing'] = False
+    if DIAGNOSTICS_TRACE:
+        try:
+            context.tracing.start(screenshots=True, snapshots=True)
+            state['tracing'] = True
+        except Exception as e:
+            log(f"[{threading.current_thread().name}] Diagnostics: tracing not started: {e}")
+
+def _restart_trace_window(state, path=None):
+    """Close the current trace chunk (saving it to path if given) and open a new one"""
+    if not state['tracing']:
+        return False
+    saved = False
+    try:
+        if path:
+            state['context'].tracing.stop_chunk(path=path)
+            saved = True
+        else:
+            state['context'].tracing.stop_chunk()
+    except Exception:
+        pass
+    try:
+        state['context'].tracing.start_chunk()
+    except Exception:
+        state['tracing'] = False
+    return saved
+
+def begin_job(label, scrub_values=None):
+    """Reset the per-job bundle count and start a fresh trace window"""
+    if not is_enabled():
+        return
+    state = _state()
+    state['label'] = label
+    state['scrub_values'] = [v for v in (scrub_values or []) if v]
+    state['bundles'] = 0
+    _restart_trace_window(state)
+
+def mark_window():
+    """Drop the trace recorded so far so a failure bundle only holds the current phase"""
+    if is_enabled():
+        _restart_trace_window(_state())
+
+def capture_failure(page, reason, error=None, stage=None):
+    """Write a bundle (DOM, URL, recent requests, optional trace) for a failure.
+
+    Only runs on failure paths and never raises.
+    """
+    if not is_enabled():
+        return None
+    state = _state()
+    worker_name = threading.current_thread().name
+    if state['bundles'] >= MAX_BUNDLES_PER_JOB:
+        log(f"[{worker_name}] Diagnostics: bundle cap reached for this job, not capturing '{reason}'")
+        return None
+    state['bundles'] += 1
+
+    try:
+        if stage is None:
+            job = current_job()
+            stage = job.current if job else None
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        bundle_dir = os.path.join(DIAGNOSTICS_DIR, f"{stamp}_{worker_name}_{reason}".replace(os.sep, "_"))
+        os.makedirs(bundle_dir, exist_ok=True)
+        extra = state['scrub_values']
+
+        url = None
+        dom_bytes = 0
+        if page is not None:
+            try:
+                url = page.url
+                markup = scrub_html(page.content(), extra).encode('utf-8')[:MAX_DOM_BYTES]
+                dom_bytes = len(markup)
+                with open(os.path.join(bundle_dir, "dom.html"), 'wb') as f:
+                    f.write(markup)
+            except Exception as dom_err:
+                log(f"[{worker_name}] Diagnostics: no DOM snapshot: {dom_err}")
+
+        now = time.time()
+        in_flight = [
+            {'method': request.method, 'url': scrub_text(request.url, extra), 'type': request.resource_type,
+             'pending_ms': round((now - started) * 1000)}
+            for started, request in list(state['in_flight'].values())
+        ]
+        recent = [dict(entry, url=scrub_text(entry['url'], extra)) for entry in list(state['recent'])]
+
+        trace_saved = _restart_trace_window(state, os.path.join(bundle_dir, "trace.zip"))
+
+        meta = {
+            'reason': reason,
+            'stage': stage,
+            'error': scrub_text(str(error), extra) if error else None,
+            'url': scrub_text(url, extra) if url else None,
+            'job': scrub_text(str(state['label']), extra) if state['label'] else None,
+            'worker': worker_name,
+            'captured_at': datetime.now().isoformat(),
+            'dom_bytes': dom_bytes,
+            'trace': trace_saved,
+            'in_flight_requests': sorted(in_flight, key=lambda r: r['pending_ms'], reverse=True),
+            'recent_requests': recent,
+        }
+        with open(os.path.join(bundle_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+        log(f"[{worker_name}] 🧰 Diagnostics bundle saved: {bundle_dir} ({reason}, stage={stage})")
+        _enforce_ring()
+        return bundle_dir
+    except Exception as e:
+        log(f"[{worker_name}] Diagnostics: could not capture '{reason}': {e}")
+        return None
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _enforce_ring():
+    """Delete the oldest bundles until the directory is within its size and count bounds"""
+    with _ring_lock:
+        try:
+            bundles = sorted(
+                name for name in os.listdir(DIAGNOSTICS_DIR)
+                if os.path.isdir(os.path.join(DIAGNOSTICS_DIR, name))
+            )
+        except OSError:
+            return
+        sizes = {name: _dir_size(os.path.join(DIAGNOSTICS_DIR, name)) for name in bundles}
+        total = sum(sizes.values())
+        limit = DIAGNOSTICS_MAX_MB * 1024 * 1024
+        # Always keep the newest bundle, even if it alone is over the limit
+        while len(bundles) > 1 and (total > limit or len(bundles) > DIAGNOSTICS_MAX_BUNDLES):
+            oldest = bundles.pop(0)
+            shutil.rmtree(os.path.join(DIAGNOSTICS_DIR, oldest), ignore_errors=True)
+            total -= sizes[oldest]
@@ -1,16 +1,15 @@
 import os
 import pickle
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+# The Google API client stack is slow to import: it is loaded on first use
 
 # Scopes required for Google Drive
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
 def get_drive_service():
     """Get authenticated Google Drive service"""
+    from google.auth.transport.requests import Request
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
     creds = None
     
     # Token file stores user's access and refresh tokens
@@ -54,6 +53,7 @@ def upload_file_to_drive(file_path, file_name=None):
         Shareable link or None if failed
     """
     try:
+        from googleapiclient.http import MediaFileUpload
         service = get_drive_service()
         
         if file_name is None:
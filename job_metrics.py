@@ -0,0 +1,278 @@
+import html
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from metrics_server import JOB_OUTCOMES, JOB_STAGE_SECONDS
+
+# Pipeline stages in display order: key -> label
+METRIC_STAGES = [
+    ('queue_wait', "Queue wait"),
+    ('telegram_download', "Telegram download"),
+    ('session', "Session / login"),
+    ('navigate_quick_submit', "Navigate to Quick Submit"),
+    ('form_fill', "Form fill"),
+    ('file_upload', "File upload"),
+    ('processing_confirm', "Processing + confirm"),
+    ('inbox_search', "Inbox search"),
+    ('similarity_wait', "Similarity pending wait"),
+    ('viewer_open', "Viewer open"),
+    ('report_download_ai', "AI report download"),
+    ('report_download_similarity', "Similarity report download"),
+    ('telegram_delivery', "Telegram delivery"),
+    ('return_to_inbox', "Return to inbox"),
+    ('total', "Total (start to finish)"),
+]
+METRIC_STAGE_LABELS = dict(METRIC_STAGES)
+
+# Samples kept per stage for the percentiles (most recent jobs)
+MAX_SAMPLES_PER_STAGE = 500
+# Slowest finished jobs kept with their full breakdown
+MAX_WORST_JOBS = 10
+
+# Per-worker current job (each worker thread runs one job at a time)
+thread_local = threading.local()
+
+_lock = threading.Lock()
+_samples = {}        # stage -> deque of seconds
+_stage_counts = {}   # stage -> number of spans ever recorded
+_worst_jobs = []     # slowest jobs first
+_jobs_finished = {'ok': 0, 'failed': 0}
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+class JobCancelled(BaseException):
+    """Raised at a stage boundary once the job was cancelled.
+
+    A BaseException so the pipeline's broad `except Exception` retry/fallback
+    blocks let it through to process_turnitin and the worker.
+    """
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class JobTimer:
+    """Stage spans of one document job.
+
+    Stages are sequential: start_stage() closes whatever stage is open and opens the
+    next one, so the pipeline only marks where each stage begins. A stage entered
+    more than once (retries) accumulates.
+    """
+
+    def __init__(self, label=None, user_id=None, cancel_event=None, interrupt_event=None):
+        self.label = label
+        self.user_id = user_id
+        self.cancel_event = cancel_event
+        self.interrupt_event = interrupt_event   # Shutdown: stop at a point the job can resume from
+        self.interrupts_deferred = False
+        self.submission_title = None            # Set once Turnitin holds the document
+        self.pending_title = None               # Form title of an upload Turnitin may not have confirmed yet
+        self.started = time.time()
+        self.started_at = datetime.now()
+        self.spans = {}           # stage -> seconds
+        self.current = None
+        self.current_started = None
+
+    def add(self, stage, seconds):
+        if seconds is None or seconds < 0:
+            return
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def interrupted(self):
+        """Stopped by a shutdown (not by the user)"""
+        cancelled = self.cancel_event is not None and self.cancel_event.is_set()
+        return not cancelled and self.interrupt_event is not None and self.interrupt_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise JobCancelled(self.current)
+        if self.interrupt_event is not None and self.interrupt_event.is_set() and not self.interrupts_deferred:
+            raise JobCancelled(self.current)
+
+    def start_stage(self, stage, check_cancel=True):
+        if check_cancel:
+            self.check_cancelled()
+        now = time.time()
+        if self.current is not None:
+            self.add(self.current, now - self.current_started)
+        self.current = stage
+        self.current_started = now
+
+    def end_stage(self):
+        if self.current is not None:
+            self.add(self.current, time.time() - self.current_started)
+        self.current = None
+        self.current_started = None
+
+def current_job():
+    return getattr(thread_local, 'job', None)
+
+def begin_job(label=None, user_id=None, queue_wait=None, telegram_download=None, cancel_event=None, interrupt_event=None):
+    """Start timing a job on this worker thread (spans measured before the worker picked it up can be passed in)"""
+    job = JobTimer(label, user_id, cancel_event, interrupt_event)
+    job.add('queue_wait', queue_wait)
+    job.add('telegram_download', telegram_download)
+    thread_local.job = job
+    return job
+
+def start_stage(stage, check_cancel=True):
+    """Mark the start of a pipeline stage on this thread's job (no-op outside a job).
+
+    Raises JobCancelled if the job was cancelled since the last stage boundary
+    (check_cancel=False for stages after the reports were delivered).
+    """
+    job = current_job()
+    if job is not None:
+        job.start_stage(stage, check_cancel)
+
+def sleep_unless_cancelled(seconds):
+    """time.sleep() for long waits inside a job; raises JobCancelled as soon as the job is cancelled or interrupted"""
+    job = current_job()
+    if job is None or job.cancel_event is None:
+        time.sleep(seconds)
+        return
+    deadline = time.time() + seconds
+    while True:
+        job.check_cancelled()
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return
+        # Short slices so a shutdown interrupt (a separate event) is noticed too
+        job.cancel_event.wait(min(remaining, 1.0))
+
+def defer_interrupts(pending_title=None):
+    """The upload was sent: a shutdown must not stop the job until Turnitin confirmed it (see record_submission).
+
+    pending_title (the title typed into the form) is saved if the job is stopped before
+    that anyway, so the restarted job looks for it in the inbox before uploading again.
+    """
+    job = current_job()
+    if job is not None:
+        job.interrupts_deferred = True
+        job.pending_title = pending_title
+
+def job_interrupted():
+    """This thread's job is being stopped by a shutdown"""
+    job = current_job()
+    return job is not None and job.interrupted()
+
+def record_submission(title):
+    """Turnitin holds the document under this title; an interrupted job resumes from the inbox search"""
+    job = current_job()
+    if job is not None:
+        job.submission_title = title
+        job.interrupts_deferred = False
+
+def end_stage():
+    job = current_job()
+    if job is not None:
+        job.end_stage()
+
+def end_job(ok=True, error=None):
+    """Close this thread's job and add its spans to the histograms"""
+    job = current_job()
+    if job is None:
+        return None
+    thread_local.job = None
+    job.end_stage()
+    job.spans['total'] = time.time() - job.started
+
+    record = {
+        'label': job.label,
+        'user_id': job.user_id,
+        'started_at': job.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+        'ok': ok,
+        'error': error,
+        'spans': {name: round(seconds, 2) for name, seconds in job.spans.items()},
+    }
+    # The slowest jobs are ranked by time the user waited, including the queue
+    record['user_wait'] = round(job.spans['total'] + job.spans.get('queue_wait', 0.0) + job.spans.get('telegram_download', 0.0), 2)
+
+    with _lock:
+        for name, seconds in job.spans.items():
+            if name not in _samples:
+                _samples[name] = deque(maxlen=MAX_SAMPLES_PER_STAGE)
+            _samples[name].append(seconds)
+            _stage_counts[name] = _stage_counts.get(name, 0) + 1
+        _jobs_finished['ok' if ok else 'failed'] += 1
+        _worst_jobs.append(record)
+        _worst_jobs.sort(key=lambda r: r['user_wait'], reverse=True)
+        del _worst_jobs[MAX_WORST_JOBS:]
+    JOB_OUTCOMES.inc(outcome='ok' if ok else 'failed')
+    for name, seconds in job.spans.items():
+        JOB_STAGE_SECONDS.observe(seconds, stage=name)
+
+    breakdown = ", ".join(f"{name}={seconds:.1f}s" for name, seconds in record['spans'].items() if name != 'total')
+    log(f"[{threading.current_thread().name}] ⏱️ Job timings: total={job.spans['total']:.1f}s ({breakdown})")
+    return record
+
+def stage_summary():
+    """Per-stage count / p50 / p95 / p99 / max in seconds, in pipeline order"""
+    with _lock:
+        snapshot = {name: list(values) for name, values in _samples.items()}
+        counts = dict(_stage_counts)
+    order = [key for key, _ in METRIC_STAGES] + sorted(set(snapshot) - set(METRIC_STAGE_LABELS))
+    summary = {}
+    for name in order:
+        values = snapshot.get(name)
+        if not values:
+            continue
+        summary[name] = {
+            'count': counts.get(name, len(values)),
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'p99': round(percentile(values, 99), 2),
+            'max': round(max(values), 2),
+            'mean': round(sum(values) / len(values), 2),
+        }
+    return summary
+
+def worst_jobs():
+    with _lock:
+        return [dict(record) for record in _worst_jobs]
+
+def jobs_finished():
+    with _lock:
+        return dict(_jobs_finished)
+
+def format_timings_report(worst=3):
+    """HTML report for the admin /timings command"""
+    summary = stage_summary()
+    finished = jobs_finished()
+    if not summary:
+        return "⏱️ <b>Job Timings</b>\n\nNo finished jobs yet."
+
+    lines = [
+        "⏱️ <b>Job Timings</b>",
+        f"Jobs: {finished['ok']} ok, {finished['failed']} failed (last {MAX_SAMPLES_PER_STAGE} per stage)",
+        "",
+    ]
+    rows = [f"{'stage (seconds)':<24}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>7}"]
+    for name, stats in summary.items():
+        label = METRIC_STAGE_LABELS.get(name, name)[:24]
+        rows.append(f"{label:<24}{stats['p50']:>7.1f}{stats['p95']:>7.1f}{stats['p99']:>7.1f}{stats['max']:>7.1f}")
+    lines.append("<pre>" + html.escape("\n".join(rows)) + "</pre>")
+
+    slowest = worst_jobs()[:worst]
+    if slowest:
+        lines.append("")
+        lines.append("🐢 <b>Slowest jobs</b>")
+        for record in slowest:
+            top = sorted(
+                ((name, seconds) for name, seconds in record['spans'].items() if name != 'total'),
+                key=lambda item: item[1], reverse=True
+            )[:3]
+            parts = ", ".join(f"{METRIC_STAGE_LABELS.get(name, name)} {seconds:.0f}s" for name, seconds in top)
+            status = "✅" if record['ok'] else "❌"
+            lines.append(
+                f"{status} {record['started_at']} · {record['user_wait']:.0f}s · "
+                f"{html.escape(str(record['label'] or '')[:40])}\n   {parts}"
+            )
+    return "\n".join(lines)
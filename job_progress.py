@@ -0,0 +1,227 @@
+import html
+import threading
+import time
+from datetime import datetime
+
+# Minimum seconds between two edits of the same status message
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+
+# Job stages in display order: key -> label
+JOB_STAGES = [
+    ('queued', "📋 Queued"),
+    ('starting', "🚀 Starting Turnitin process"),
+    ('uploading', "📎 Uploading document"),
+    ('processing', "📊 Turnitin is processing the document"),
+    ('submitted', "⏳ Submitted, waiting for confirmation"),
+    ('searching', "🔎 Locating submission"),
+    ('similarity_wait', "⏳ Similarity not ready yet, waiting"),
+    ('downloading', "📥 Downloading reports"),
+    ('delivering', "📤 Sending reports"),
+]
+STAGE_LABELS = dict(JOB_STAGES)
+STAGE_ORDER = [key for key, _ in JOB_STAGES]
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def format_duration(seconds):
+    """Format seconds as '1m 05s' / '45s'"""
+    seconds = int(max(0, seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    return f"{seconds // 60}m {seconds % 60:02d}s"
+
+class JobProgress:
+    """Single live-updating status message for one document job.
+
+    Instead of sending a new message per step, the job keeps one message and edits it
+    in place (stage, queue position, details). Edits are debounced: bursts of updates
+    within DEFAULT_DEBOUNCE_SECONDS collapse into one edit carrying the latest state.
+    All Telegram calls go through the bot's outbound dispatcher, so callers never block
+    and the edits stay ordered after the initial send.
+    """
+
+    def __init__(self, bot, chat_id, filename=None, message_id=None, debounce=DEFAULT_DEBOUNCE_SECONDS):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.filename = filename
+        self.message_id = message_id
+        self.debounce = debounce
+
+        self.stage = 'queued'
+        self.queue_position = None
+        self.eta_text = None
+        self.job_id = None
+        self.details = []
+        self.final_text = None
+        self.stage_started = time.time()
+        self.job_started = None
+
+        self._lock = threading.Lock()
+        self._last_edit = 0.0
+        self._last_text = None
+        self._edit_queued = False
+        self._timer = None
+        self._closed = False
+        self._discarded = False
+
+    # ---- State updates -------------------------------------------------
+
+    def start(self, queue_position=None, eta_text=None, job_id=None):
+        """Send (or take over) the status message"""
+        with self._lock:
+            self.queue_position = queue_position
+            self.eta_text = eta_text
+            self.job_id = job_id
+            text = self._render()
+            if self.message_id is None:
+                self._last_text = text
+                self._last_edit = time.monotonic()
+                self.bot.send_message_async(self.chat_id, text, on_sent=self._remember_message)
+                return self
+        # Existing message (e.g. the Google Drive download status) - edit it now
+        self._request_edit(force=True)
+        return self
+
+    def set_queue_position(self, position, eta_text=None):
+        """Update queue position while waiting"""
+        with self._lock:
+            if self.stage != 'queued' or (position == self.queue_position and eta_text == self.eta_text):
+                return
+            self.queue_position = position
+            self.eta_text = eta_text
+        self._request_edit()
+
+    def set_stage(self, stage, detail=None):
+        """Move to a new stage (see JOB_STAGES)"""
+        with self._lock:
+            if self.stage == 'queued' and stage != 'queued':
+                self.job_started = time.time()
+            self.stage = stage
+            self.stage_started = time.time()
+            if detail:
+                self.details.append(detail)
+        self._request_edit()
+
+    def add_detail(self, detail):
+        """Append a detail line (e.g. submission metadata) to the status message"""
+        with self._lock:
+            self.details.append(detail)
+        self._request_edit()
+
+    def finish(self, text):
+        """Replace the status with a final text (always sent, not debounced)"""
+        with self._lock:
+            if self._closed:
+                return
+            self.final_text = text
+        self._request_edit(force=True)
+        with self._lock:
+            self._closed = True
+
+    def discard(self):
+        """Stop updating and return the status message ID (None if never sent) for cleanup"""
+        with self._lock:
+            self._closed = True
+            self._discarded = True
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            return self.message_id
+
+    # ---- Rendering -----------------------------------------------------
+
+    def _render(self):
+        """Build the status text from the current state (lock held)"""
+        if self.final_text:
+            return self.final_text
+
+        lines = []
+        if self.filename:
+            lines.append(f"📄 <b>{html.escape(str(self.filename))}</b>")
+            lines.append("")
+
+        if self.stage == 'queued':
+            if self.queue_position and self.queue_position > 1:
+                lines.append(f"📋 <b>Queued</b> - position <b>{self.queue_position}</b>")
+            else:
+                lines.append("🚀 <b>Queued</b> - your document will be processed next")
+            if self.eta_text:
+                lines.append(f"⏳ Estimated wait: <b>{self.eta_text}</b>")
+        else:
+            current = STAGE_ORDER.index(self.stage) if self.stage in STAGE_ORDER else len(STAGE_ORDER)
+            for index, key in enumerate(STAGE_ORDER[1:], start=1):
+                if key == 'similarity_wait' and self.stage != key:
+                    continue
+                if index < current:
+                    lines.append(f"✅ {STAGE_LABELS[key]}")
+                elif index == current:
+                    lines.append(f"▶️ <b>{STAGE_LABELS[key]}</b>")
+            if self.job_started:
+                lines.append("")
+                lines.append(f"⏱️ Elapsed: {format_duration(time.time() - self.job_started)}")
+
+        if self.details:
+            lines.append("")
+            lines.extend(self.details)
+
+        if self.job_id:
+            lines.append("")
+            lines.append(f"🆔 Job <code>{self.job_id}</code> · cancel: <code>/cancel {self.job_id}</code>")
+
+        return "\n".join(lines)
+
+    # ---- Debounced delivery --------------------------------------------
+
+    def _remember_message(self, message):
+        """on_sent callback for the initial status message"""
+        self.message_id = message.message_id
+
+    def _request_edit(self, force=False):
+        """Queue an edit now, or schedule one when the debounce window ends"""
+        with self._lock:
+            if self._closed or self._edit_queued:
+                # A queued edit renders the latest state when it runs
+                return
+            wait = 0 if force else self.debounce - (time.monotonic() - self._last_edit)
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._on_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            self._edit_queued = True
+        self.bot.outbound.submit(self.chat_id, self._send_edit, description="progress_edit")
+
+    def _on_timer(self):
+        """Debounce window elapsed"""
+        with self._lock:
+            self._timer = None
+        self._request_edit()
+
+    def _send_edit(self):
+        """Runs on the outbound sender thread: edit the message with the latest state"""
+        with self._lock:
+            self._edit_queued = False
+            if self._discarded:
+                return True
+            self._last_edit = time.monotonic()
+            text = self._render()
+            if text == self._last_text:
+                return True  # Telegram rejects edits that change nothing
+            self._last_text = text
+            message_id = self.message_id
+
+        if message_id is None:
+            # Initial send failed - send a fresh status message instead
+            result = self.bot.send_message(self.chat_id, text)
+            if result:
+                self.message_id = result.message_id
+            return result
+
+        try:
+            return self.bot.edit_message_text(text, self.chat_id, message_id)
+        except Exception as e:
+            log(f"Progress edit failed for chat {self.chat_id}: {e}")
+            return None
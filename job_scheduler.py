@@ -0,0 +1,269 @@
+import hashlib
+import heapq
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Policy for the processing queue: fifo | fair | sjf | smallest
+JOB_SCHEDULER_POLICY = os.getenv("JOB_SCHEDULER_POLICY", "fair").strip().lower() or "fair"
+# Admin documents skip ahead of everyone else (any policy)
+JOB_SCHEDULER_ADMIN_LANE = os.getenv("JOB_SCHEDULER_ADMIN_LANE", "1").strip().lower() in ("1", "true", "yes", "on")
+# Shortest-first aging: seconds of predicted work forgiven per second waited
+# (1.0 means a job predicted 60s longer than another starts first once it has waited 60s longer)
+JOB_SCHEDULER_AGING = float(os.getenv("JOB_SCHEDULER_AGING", "1.0") or 1.0)
+# Optional arrival trace (JSON lines) for bench/schedule_sim.py
+JOB_TRACE_FILE = os.getenv("JOB_TRACE_FILE", "").strip()
+
+POLICIES = ['fifo', 'fair', 'sjf', 'smallest']
+
+# 'smallest' turns file size into seconds with this rate so aging uses the same unit
+SMALLEST_SECONDS_PER_MB = 10.0
+
+_trace_lock = threading.Lock()
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def _arrival(item):
+    return item.get('queued_at') or 0.0
+
+class FifoPolicy:
+    """First come, first served (the old queue.Queue behaviour)"""
+    name = 'fifo'
+
+    def key(self, item, seq):
+        return (seq,)
+
+    def served(self, key):
+        pass
+
+    def left_queue(self, item, waiting):
+        pass
+
+class FairPolicy:
+    """Round-robin across users (start-time fair queuing with one unit per document).
+
+    Each document gets a tag one above the previous tag of the same user, but never
+    below the tag of the document last served, so a user who queues ten documents
+    gets every other slot once someone else arrives instead of the next ten.
+    """
+    name = 'fair'
+
+    def __init__(self):
+        self.virtual_time = 0
+        self.last_tag = {}   # user_id -> tag of their newest waiting document
+
+    def key(self, item, seq):
+        user_id = item.get('user_id')
+        tag = max(self.virtual_time, self.last_tag.get(user_id, 0)) + 1
+        self.last_tag[user_id] = tag
+        return (tag, seq)
+
+    def served(self, key):
+        self.virtual_time = max(self.virtual_time, key[0])
+
+    def left_queue(self, item, waiting):
+        """A document was served or withdrawn: the user's tag follows their newest waiting document.
+
+        Users with nothing waiting are dropped (their next document starts at the
+        virtual time), so /cancel does not push a user back and the map stays small.
+        """
+        user_id = item.get('user_id')
+        tags = [key[0] for key, other in waiting if other.get('user_id') == user_id]
+        if tags:
+            self.last_tag[user_id] = max(tags)
+        else:
+            self.last_tag.pop(user_id, None)
+
+class ShortestFirstPolicy:
+    """Shortest predicted job first, with aging so long jobs are not starved.
+
+    Ordering by predicted - aging * waited is the same as ordering by
+    predicted + aging * arrival, so keys never change once a job is queued.
+    """
+
+    def __init__(self, predict, aging=JOB_SCHEDULER_AGING, name='sjf'):
+        self.predict = predict
+        self.aging = aging
+        self.name = name
+
+    def key(self, item, seq):
+        try:
+            predicted = float(self.predict(item))
+        except Exception:
+            predicted = 0.0
+        return (predicted + self.aging * _arrival(item), seq)
+
+    def served(self, key):
+        pass
+
+    def left_queue(self, item, waiting):
+        pass
+
+def smallest_file_seconds(item):
+    return (item.get('file_size') or 0) / (1024 * 1024) * SMALLEST_SECONDS_PER_MB
+
+def make_policy(name, predict=None, aging=JOB_SCHEDULER_AGING):
+    """Policy object by name; sjf needs predict(item) -> expected seconds"""
+    name = (name or 'fifo').lower()
+    if name == 'fair':
+        return FairPolicy()
+    if name == 'sjf':
+        if predict is None:
+            raise ValueError("sjf policy needs a predictor")
+        return ShortestFirstPolicy(predict, aging, 'sjf')
+    if name == 'smallest':
+        return ShortestFirstPolicy(smallest_file_seconds, aging, 'smallest')
+    if name != 'fifo':
+        log(f"⚠️ Unknown JOB_SCHEDULER_POLICY '{name}', using fifo")
+    return FifoPolicy()
+
+class JobScheduler:
+    """Drop-in replacement for the processing queue.Queue with a pluggable ordering.
+
+    Supports put/get/get_nowait/task_done/join/qsize/empty and .queue (waiting
+    items in the order they will be served) so existing callers keep working.
+    None is the worker shutdown signal: it is handed out once every document
+    queued before it has been taken, as with a FIFO queue.
+    """
+
+    def __init__(self, policy=None, admin_lane=JOB_SCHEDULER_ADMIN_LANE):
+        self.policy = policy or FifoPolicy()
+        self.admin_lane = admin_lane
+        self._cond = threading.Condition()
+        self._heap = []          # (key, item)
+        self._stops = []         # seq of queued shutdown signals
+        self._seq = 0
+        self._unfinished = 0
+
+    def _key(self, item, seq):
+        lane = 0 if self.admin_lane and item.get('admin') else 1
+        return (lane,) + self.policy.key(item, seq)
+
+    def put(self, item, block=True, timeout=None):
+        with self._cond:
+            self._seq += 1
+            if item is None:
+                self._stops.append(self._seq)
+            else:
+                heapq.heappush(self._heap, (self._key(item, self._seq), self._seq, item))
+            self._unfinished += 1
+            self._cond.notify()
+
+    def put_nowait(self, item):
+        self.put(item, block=False)
+
+    def _next_stop_due(self):
+        if not self._stops:
+            return False
+        # A stop waits for the documents queued before it, not for later arrivals
+        return not any(seq < self._stops[0] for _, seq, _ in self._heap)
+
+    def _waiting(self):
+        """(policy key, item) of the waiting documents, for policy.left_queue"""
+        return [(key[1:], item) for key, _, item in self._heap]
+
+    def _take(self):
+        if self._next_stop_due():
+            self._stops.pop(0)
+            return None
+        key, _, item = heapq.heappop(self._heap)
+        self.policy.served(key[1:])
+        self.policy.left_queue(item, self._waiting())
+        return item
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if not block:
+                if not self._heap and not self._stops:
+                    raise queue.Empty
+            elif timeout is None:
+                while not self._heap and not self._stops:
+                    self._cond.wait()
+            else:
+                deadline = time.time() + timeout
+                while not self._heap and not self._stops:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    self._cond.wait(remaining)
+            return self._take()
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def task_done(self):
+        with self._cond:
+            if self._unfinished <= 0:
+                raise ValueError('task_done() called too many times')
+            self._unfinished -= 1
+            if self._unfinished == 0:
+                self._cond.notify_all()
+
+    def join(self):
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._heap) + len(self._stops)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def remove(self, match):
+        """Withdraw the waiting documents for which match(item) is true and return them"""
+        with self._cond:
+            removed = [entry for entry in self._heap if match(entry[2])]
+            if not removed:
+                return []
+            self._heap = [entry for entry in self._heap if not match(entry[2])]
+            heapq.heapify(self._heap)
+            waiting = self._waiting()
+            for _, _, item in removed:
+                self.policy.left_queue(item, waiting)
+            self._unfinished -= len(removed)
+            if self._unfinished == 0:
+                self._cond.notify_all()
+            return [item for _, _, item in removed]
+
+    def snapshot(self):
+        """Waiting documents in the order they will be served"""
+        with self._cond:
+            return [item for _, _, item in sorted(self._heap, key=lambda entry: entry[:2])]
+
+    @property
+    def queue(self):
+        return self.snapshot()
+
+def create_scheduler(predict=None):
+    """Scheduler for the configured policy"""
+    policy = make_policy(JOB_SCHEDULER_POLICY, predict)
+    lane = " + admin lane" if JOB_SCHEDULER_ADMIN_LANE else ""
+    log(f"📋 Job scheduling policy: {policy.name}{lane}")
+    return JobScheduler(policy, JOB_SCHEDULER_ADMIN_LANE)
+
+def record_trace(queue_item, service_seconds, ok=True):
+    """Append one finished job to JOB_TRACE_FILE (user ids are pseudonymised)"""
+    if not JOB_TRACE_FILE or not queue_item.get('queued_at'):
+        return
+    user = hashlib.sha256(str(queue_item.get('user_id')).encode()).hexdigest()[:10]
+    entry = {
+        'arrival': round(queue_item['queued_at'], 3),
+        'user': user,
+        'admin': bool(queue_item.get('admin')),
+        'file_size': queue_item.get('file_size') or 0,
+        'service': round(service_seconds, 2),
+        'ok': ok,
+    }
+    try:
+        with _trace_lock:
+            with open(JOB_TRACE_FILE, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        log(f"Job trace: could not write {JOB_TRACE_FILE}: {e}")
@@ -1,3 +1,4 @@
+import startup_timing   # First import: starts the startup timing clock
 import os
 import json
 import time
@@ -6,19 +7,36 @@ import queue
 import signal
 import sys
 import re
-import gdown
+import html
 import subprocess
+import uuid
 from datetime import datetime, timedelta
+startup_timing.mark_imports("stdlib")
 from dotenv import load_dotenv
-import telebot
 from telebot import types
-from turnitin_processor import process_turnitin, shutdown_browser_session
+startup_timing.mark_imports("telebot")
+# Playwright and the turnitin_* modules are imported by the worker thread, gdown on first use
+from job_progress import JobProgress
+import job_metrics
+import network_timing
+import queue_eta
+import job_scheduler
+import browser_registry
+import session_keeper
+# Login flag, shutdown event and worker/queue views shared with the browser layer
+from bot_state import (
+    bot_is_logging_in, browser_stack_loaded, queued_since, set_worker_status, shutdown_requested, worker_status
+)
+from job_metrics import JobCancelled
+from metrics_server import MetricsServer, register_collector, timed_storage
+from telegram_handler_optimized import OptimizedTelegramBot, use_bot_api_server
 from rate_limiter import (
     check_user_cooldown, 
     set_user_cooldown, 
     get_cooldown_message,
     clear_user_cooldown
 )
+startup_timing.mark_imports("bot modules")
 
 # Load environment variables
 load_dotenv()
@@ -29,19 +47,57 @@ admin_ids_str = os.getenv("ADMIN_TELEGRAM_ID", "")
 ADMIN_TELEGRAM_IDS = [int(id.strip()) for id in admin_ids_str.split(",") if id.strip()]
 ADMIN_TELEGRAM_ID = ADMIN_TELEGRAM_IDS[0] if ADMIN_TELEGRAM_IDS else None  # Keep for backward compatibility
 
-# Initialize standard bot
-bot = telebot.TeleBot(TELEGRAM_TOKEN, parse_mode='HTML')
-
-# Global login state flag - prevents file uploads during login
-bot_is_logging_in = threading.Event()  # Set when logging in, clear when ready
-bot_is_logging_in.clear()  # Initially ready (not logging in)
-
-# Processing queue and worker threads
-processing_queue = queue.Queue()
+# Update ingestion: long polling by default, webhook mode when TELEGRAM_WEBHOOK_URL is set
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "").strip()
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip()
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+
+# Alternative Bot API server (self-hosted telegram-bot-api or the local stand-in in bench/)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").strip()
+if TELEGRAM_API_URL:
+    use_bot_api_server(TELEGRAM_API_URL)
+
+# Initialize bot transport (pooled session, retries, per-chat + global rate budgets)
+# In webhook mode handlers run on the webhook server's bounded pool instead of TeleBot's
+bot = OptimizedTelegramBot(TELEGRAM_TOKEN, parse_mode='HTML', threaded=not TELEGRAM_WEBHOOK_URL)
+
+# Seconds running jobs get to finish after a shutdown signal, then to reach their next stage boundary
+SHUTDOWN_DRAIN_SECONDS = int(os.getenv("SHUTDOWN_DRAIN_SECONDS", "90") or 90)
+SHUTDOWN_CHECKPOINT_SECONDS = int(os.getenv("SHUTDOWN_CHECKPOINT_SECONDS", "30") or 30)
+# An idle worker checks its browser against the recycling limits this often
+BROWSER_IDLE_CHECK_SECONDS = 60
+QUEUE_STATE_FILE = "pending_queue.json"
+# Fields of a queue item saved across restarts (progress and the cancel/interrupt events are rebuilt;
+# submission_title is set when a job was interrupted after Turnitin accepted the upload,
+# pending_title when it was stopped between the Upload click and Turnitin's confirmation)
+PERSISTED_JOB_FIELDS = [
+    'job_id', 'user_id', 'file_path', 'original_filename', 'file_size', 'file_sha256',
+    'added_time', 'queued_at', 'download_seconds', 'quota_charged', 'submission_title', 'pending_title',
+]
+
+# Processing queue and worker threads (ordering policy: JOB_SCHEDULER_POLICY, see job_scheduler.py)
+processing_queue = job_scheduler.create_scheduler(
+    predict=lambda item: queue_eta.expected_job_seconds(item.get('file_size'))
+)
 worker_threads = []
 MAX_WORKERS = 1  # Maximum 1 concurrent worker
 MIN_QUEUE_SIZE_FOR_SCALING = 2  # Start additional workers when queue has 2+ items
 
+jobs_by_id = {}      # job_id -> queue_item, from enqueue until a worker finishes it (for /cancel)
+interrupted_jobs = []  # running jobs stopped by a shutdown, saved ahead of the queue
+
+# Startup 'git pull origin main': background (default) | blocking | off
+GIT_PULL_ON_STARTUP = os.getenv("GIT_PULL_ON_STARTUP", "background").strip().lower() or "background"
+GIT_PULL_OFF_VALUES = ("0", "off", "false", "no")
+# The startup timing report is logged once every milestone is in, or after this long
+STARTUP_REPORT_DEADLINE_SECONDS = 420
+
+# Local metrics endpoint (optional): METRICS_PORT=9464 serves http://METRICS_LISTEN:9464/metrics
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+
 # Subscription plans
 MONTHLY_PLANS = {
     "1_month": {"price": 1500, "duration": 30, "name": "1 Month"},
@@ -64,13 +120,19 @@ BANK_DETAILS = """🏦 Commercial Bank
 
 📱 Send payment slip via WhatsApp to: +94702947854"""
 
+RESTARTING_MESSAGE = (
+    "🔄 <b>Bot is restarting, please send your document again in a minute.</b>\n"
+    "🔄 <b>Bot đang khởi động lại, vui lòng gửi lại tài liệu sau một phút.</b>"
+)
+
 def log(message: str):
     """Log with timestamp"""
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
 
 def try_git_pull_on_startup():
     """Attempt to update the repository by running 'git pull origin main'.
-    This is best-effort and will not crash the bot if it fails (e.g., not a git repo)."""
+    This is best-effort and will not crash the bot if it fails (e.g., not a git repo).
+    Modules are already loaded, so pulled code takes effect on the next restart."""
     try:
         log("Attempting to update code from git (git pull origin main)...")
         result = subprocess.run(
@@ -88,18 +150,37 @@ def try_git_pull_on_startup():
             log(f"Git pull failed/skipped (code {result.returncode}). {err[:500]}")
     except Exception as e:
         log(f"Git pull not executed: {e}")
+    startup_timing.milestone("git pull done")
+
+def start_git_pull():
+    """Run the startup git pull per GIT_PULL_ON_STARTUP (background by default, off the polling path)"""
+    if GIT_PULL_ON_STARTUP in GIT_PULL_OFF_VALUES:
+        return
+    if GIT_PULL_ON_STARTUP == "blocking":
+        try_git_pull_on_startup()
+        return
+
+    def pull_when_loaded():
+        # The worker imports the turnitin_* modules lazily; pulling first could mix old and new code
+        browser_stack_loaded.wait(timeout=300)
+        try_git_pull_on_startup()
+
+    threading.Thread(target=pull_when_loaded, name="git-pull", daemon=True).start()
 
 def signal_handler(sig, frame):
-    """Handle shutdown signals"""
-    log("Shutdown signal received...")
-    shutdown_browser_session()
-    processing_queue.put(None)
+    """Handle shutdown signals: unwind polling; the drain runs in the main block's finally"""
+    if shutdown_requested.is_set():
+        log("Shutdown signal received again - drain already in progress")
+        return
+    log("Shutdown signal received - draining...")
+    shutdown_requested.set()
     sys.exit(0)
 
 # Register signal handlers
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
+@timed_storage('read', 'subscriptions')
 def load_subscriptions():
     """Load subscription data from file"""
     try:
@@ -110,11 +191,13 @@ def load_subscriptions():
     except:
         return {}
 
+@timed_storage('write', 'subscriptions')
 def save_subscriptions(data):
     """Save subscription data to file"""
     with open("subscriptions.json", "w") as f:
         json.dump(data, f, indent=2)
 
+@timed_storage('read', 'pending_requests')
 def load_pending_requests():
     """Load pending subscription requests"""
     try:
@@ -125,11 +208,13 @@ def load_pending_requests():
     except:
         return {}
 
+@timed_storage('write', 'pending_requests')
 def save_pending_requests(data):
     """Save pending subscription requests"""
     with open("pending_requests.json", "w") as f:
         json.dump(data, f, indent=2)
 
+@timed_storage('read', 'keys')
 def load_keys():
     """Load redeemable keys from file (keys.json)"""
     try:
@@ -140,11 +225,13 @@ def load_keys():
     except:
         return {}
 
+@timed_storage('write', 'keys')
 def save_keys(data):
     """Save redeemable keys to file (keys.json)"""
     with open("keys.json", "w") as f:
         json.dump(data, f, indent=2)
 
+@timed_storage('read', 'submission_history')
 def load_submission_history():
     """Load submission history from file"""
     try:
@@ -155,6 +242,7 @@ def load_submission_history():
     except:
         return {}
 
+@timed_storage('write', 'submission_history')
 def save_submission_history(data):
     """Save submission history to file"""
     with open("submission_history.json", "w") as f:
@@ -225,16 +313,285 @@ def get_user_subscription_info(user_id):
     
     return subscriptions[user_id_str]
 
+def running_jobs():
+    """(JobTimer, file size) of the jobs workers are processing right now"""
+    return [
+        (status['job'], status.get('file_size'))
+        for status in list(worker_status.values())
+        if status['state'] == 'processing' and status.get('job') is not None
+    ]
+
+def estimate_queue_wait(queue_position, waiting=None):
+    """Wait estimate for a queue position from measured job durations (None when a worker is free)"""
+    if waiting is None:
+        waiting = [item for item in list(processing_queue.queue) if item]
+    ahead = [item.get('file_size') for item in waiting[:max(0, queue_position - 1)]]
+    workers = sum(1 for t in worker_threads if t.is_alive()) or 1
+    seconds = queue_eta.estimate_wait_seconds(running_jobs(), ahead, workers)
+    if seconds <= 0:
+        return None
+    return queue_eta.format_eta(seconds)
+
+def enqueue_job(queue_item):
+    """Put a job on the processing queue and return its position (the scheduler may place it ahead of others)"""
+    queue_item.setdefault('queued_at', time.time())   # restored jobs keep their place
+    queue_item['admin'] = queue_item['user_id'] in ADMIN_TELEGRAM_IDS
+    queue_item.setdefault('job_id', uuid.uuid4().hex[:6])
+    queue_item['cancel_event'] = threading.Event()
+    queue_item['interrupt_event'] = threading.Event()
+    jobs_by_id[queue_item['job_id']] = queue_item
+    queued_since[id(queue_item)] = queue_item['queued_at']
+    if bot_is_logging_in.is_set() and queue_item.get('progress'):
+        # Uploads are no longer refused during a login; the job just waits for it
+        queue_item['progress'].add_detail("🔄 The bot is refreshing its Turnitin session - your document starts right after.")
+    processing_queue.put(queue_item)
+    waiting = processing_queue.snapshot()
+    for position, item in enumerate(waiting, start=1):
+        if item is queue_item:
+            return position
+    return len(waiting)
+
+def persist_queue():
+    """Save interrupted and waiting jobs to QUEUE_STATE_FILE for the next start"""
+    saved_ids = set()
+    jobs = []
+    # Jobs still running at the checkpoint deadline: keep their submission so it is not uploaded again
+    running = {
+        status.get('job_id'): status['job']
+        for status in list(worker_status.values())
+        if status.get('job') is not None
+    }
+    for queue_item in interrupted_jobs + active_jobs() + processing_queue.snapshot():
+        if queue_item.get('job_id') in saved_ids:
+            continue
+        saved_ids.add(queue_item.get('job_id'))
+        entry = {field: queue_item.get(field) for field in PERSISTED_JOB_FIELDS}
+        job = running.get(entry['job_id'])
+        if job is not None:
+            entry['submission_title'] = job.submission_title or entry['submission_title']
+            entry['pending_title'] = job.pending_title or entry['pending_title']
+        progress = queue_item.get('progress')
+        entry['message_id'] = progress.message_id if progress else None
+        jobs.append(entry)
+    if not jobs:
+        if os.path.exists(QUEUE_STATE_FILE):
+            os.remove(QUEUE_STATE_FILE)
+        return 0
+    tmp_path = QUEUE_STATE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(jobs, f, indent=2)
+    os.replace(tmp_path, QUEUE_STATE_FILE)
+    log(f"💾 Saved {len(jobs)} job(s) to {QUEUE_STATE_FILE}")
+    return len(jobs)
+
+def restore_queue():
+    """Re-queue the jobs saved by the previous shutdown (their status messages are reused)"""
+    if not os.path.exists(QUEUE_STATE_FILE):
+        return 0
+    try:
+        with open(QUEUE_STATE_FILE, "r") as f:
+            jobs = json.load(f)
+    except (OSError, ValueError) as e:
+        log(f"⚠️ Could not read {QUEUE_STATE_FILE}: {e}")
+        return 0
+    restored = 0
+    for entry in jobs:
+        if not entry.get('file_path') or not os.path.exists(entry['file_path']):
+            log(f"⚠️ Saved job {entry.get('job_id')} skipped: upload {entry.get('file_path')} is gone")
+            continue
+        message_id = entry.pop('message_id', None)
+        queue_item = dict(entry, status='queued')
+        progress = JobProgress(bot, queue_item['user_id'], queue_item.get('original_filename'), message_id=message_id)
+        queue_item['progress'] = progress
+        position = enqueue_job(queue_item)
+        progress.start(position, estimate_queue_wait(position), job_id=queue_item['job_id'])
+        restored += 1
+    os.remove(QUEUE_STATE_FILE)
+    log(f"♻️ Restored {restored} job(s) from the previous run")
+    return restored
+
+def join_workers(deadline):
+    for worker in worker_threads:
+        remaining = deadline - time.time()
+        if remaining > 0 and worker.is_alive():
+            worker.join(timeout=remaining)
+
+def drain_and_shutdown():
+    """Stop admission, let running jobs finish (or stop at a stage boundary) by the deadline, save the queue"""
+    shutdown_requested.set()
+    log(f"🛑 Draining: no new documents, running jobs get {SHUTDOWN_DRAIN_SECONDS}s to finish")
+    for _ in worker_threads:
+        processing_queue.put(None)   # Wakes idle workers
+    join_workers(time.time() + SHUTDOWN_DRAIN_SECONDS)
+
+    running = active_jobs()
+    if running:
+        log(f"⏸️ Drain deadline reached - stopping {len(running)} running job(s) at their next stage")
+        for queue_item in running:
+            queue_item['interrupted'] = True
+            queue_item['interrupt_event'].set()
+        join_workers(time.time() + SHUTDOWN_CHECKPOINT_SECONDS)
+    stuck = [worker.name for worker in worker_threads if worker.is_alive()]
+    if stuck:
+        log(f"⚠️ Workers still busy after the checkpoint deadline: {', '.join(stuck)}")
+
+    try:
+        persist_queue()
+    except Exception as e:
+        log(f"❌ Could not save the queue: {e}")
+    bot.flush_outbound(timeout=10)
+
+def refund_job(queue_item):
+    """Give back the document use and clear the cooldown a job was charged"""
+    user_id = queue_item['user_id']
+    refunded = False
+    if queue_item.get('quota_charged'):
+        subscriptions = load_subscriptions()
+        user_data = subscriptions.get(str(user_id))
+        if user_data is not None:
+            user_data['documents_remaining'] = int(user_data.get('documents_remaining', 0)) + 1
+            save_subscriptions(subscriptions)
+            refunded = True
+        queue_item['quota_charged'] = False
+    if user_id not in ADMIN_TELEGRAM_IDS:
+        clear_user_cooldown(user_id)
+    return refunded
+
+def cancel_job(job_id, requested_by):
+    """Cancel a job by ID: a queued job is withdrawn and refunded, a running one stops at its next stage.
+
+    Users can only cancel their own jobs; admins any job. Returns (ok, message).
+    """
+    queue_item = jobs_by_id.get(job_id)
+    if queue_item is None or (requested_by not in ADMIN_TELEGRAM_IDS and queue_item['user_id'] != requested_by):
+        return False, f"Job <code>{html.escape(job_id)}</code> not found (it may have finished already)."
+    by_admin = requested_by != queue_item['user_id']
+    filename = html.escape(str(queue_item.get('original_filename', 'Document')))
+    progress = queue_item.get('progress')
+
+    if processing_queue.remove(lambda item: item is queue_item):
+        jobs_by_id.pop(job_id, None)
+        queued_since.pop(id(queue_item), None)
+        queue_item['status'] = 'cancelled'
+        refunded = refund_job(queue_item)
+        try:
+            if os.path.exists(queue_item['file_path']):
+                os.remove(queue_item['file_path'])
+        except Exception as cleanup_error:
+            log(f"Cancel {job_id}: cleanup error: {cleanup_error}")
+        note = "\n📊 Your document use has been refunded." if refunded else ""
+        if progress:
+            progress.finish(f"🚫 <b>Cancelled{' by admin' if by_admin else ''}</b>\n\n📄 {filename}{note}")
+        refresh_queue_positions()
+        log(f"Job {job_id} of user {queue_item['user_id']} removed from the queue by {requested_by}")
+        return True, f"🚫 Job <code>{job_id}</code> ({filename}) removed from the queue.{' Refunded.' if refunded else ''}"
+
+    # Already picked up by a worker
+    if queue_item['cancel_event'].is_set():
+        return True, f"Job <code>{job_id}</code> is already being cancelled."
+    queue_item['cancel_event'].set()
+    if queue_item['user_id'] not in ADMIN_TELEGRAM_IDS:
+        clear_user_cooldown(queue_item['user_id'])
+    if progress:
+        progress.add_detail("🚫 <b>Cancelling</b> - stopping at the next step…")
+    log(f"Job {job_id} of user {queue_item['user_id']} cancel requested by {requested_by} while running")
+    return True, f"🚫 Job <code>{job_id}</code> ({filename}) is running - it will stop at the next step."
+
+def collect_bot_metrics():
+    """Queue, worker and Telegram metrics for the /metrics endpoint"""
+    now = time.time()
+    waiting_since = list(queued_since.values())
+    workers = list(worker_status.items())
+    telegram = bot.get_stats()
+
+    worker_samples = []
+    stage_samples = []
+    for worker_id, status in workers:
+        worker_samples.append(({'worker': worker_id, 'state': status['state']}, 1))
+        job = status.get('job')
+        if status['state'] == 'processing' and job is not None and job.current:
+            stage_samples.append(({'worker': worker_id, 'stage': job.current}, 1))
+    return [
+        ("turni_queue_depth", "gauge", "Documents waiting for a worker", [({}, len(waiting_since))]),
+        ("turni_queue_oldest_age_seconds", "gauge", "Age of the oldest waiting document",
+         [({}, round(now - min(waiting_since), 1) if waiting_since else 0)]),
+        ("turni_worker_state", "gauge", "Worker state (1 = current)", worker_samples),
+        ("turni_worker_state_seconds", "gauge", "Seconds the worker has been in its current state",
+         [({'worker': worker_id}, round(now - status['since'], 1)) for worker_id, status in workers]),
+        ("turni_worker_stage", "gauge", "Pipeline stage of the job a worker is running", stage_samples),
+        ("turni_logging_in", "gauge", "1 while a Turnitin login is in progress (uploads queue meanwhile)", [({}, int(bot_is_logging_in.is_set()))]),
+        ("turni_telegram_api_calls_total", "counter", "Telegram Bot API calls by method",
+         [({'method': method}, count) for method, count in sorted(telegram['api_calls'].items())]),
+        ("turni_telegram_429_total", "counter", "Telegram 429 (Too Many Requests) answers", [({}, telegram['retries_429'])]),
+        ("turni_telegram_api_errors_total", "counter", "Telegram API errors", [({}, telegram['api_errors'])]),
+        ("turni_telegram_outbound_pending", "gauge", "Queued outbound Telegram calls", [({}, telegram['outbound_pending'])]),
+        ("turni_telegram_outbound_failed_total", "counter", "Outbound Telegram calls that gave up", [({}, telegram['outbound_failed'])]),
+    ]
+
+def refresh_queue_positions():
+    """Update the live status message of every job still waiting in the queue"""
+    waiting = [item for item in list(processing_queue.queue) if item]
+    for position, item in enumerate(waiting, start=1):
+        progress = item.get('progress')
+        if progress:
+            progress.set_queue_position(position, estimate_queue_wait(position, waiting))
+
+def maintain_browser_between_jobs(worker_id):
+    """Run the login check the session keeper asked for, replace this worker's browser if it
+    hit its memory limit (or its job count or age limit while nothing is waiting), and keep
+    the warm standby ready while nothing is waiting"""
+    from turnitin_auth import (
+        BROWSER_STANDBY, cleanup_browser_session, maintain_standby_session, recycle_browser_session, recycle_reason,
+        verify_session_login
+    )
+    check = session_keeper.check_due()
+    if check:
+        set_worker_status(worker_id, 'refreshing')
+        refreshed = False
+        try:
+            refreshed = verify_session_login(renew=(check == 'expiring'))
+        except Exception as check_error:
+            log(f"[Worker-{worker_id}] Session check failed: {check_error} - resetting the browser session")
+            cleanup_browser_session()
+        finally:
+            session_keeper.check_finished(refreshed)
+    # With documents waiting only the memory limit recycles now (the next job would wait for a
+    # cold browser); job count and age recycles happen once the queue is empty
+    reason = recycle_reason(memory_only=not processing_queue.empty())
+    if reason:
+        set_worker_status(worker_id, 'recycling')
+        try:
+            recycle_browser_session(reason)
+        except Exception as recycle_error:
+            log(f"[Worker-{worker_id}] Browser recycle failed: {recycle_error} - a new session is created on the next document")
+    if BROWSER_STANDBY and processing_queue.empty():
+        try:
+            maintain_standby_session()
+        except Exception as standby_error:
+            log(f"[Worker-{worker_id}] Warm standby error: {standby_error}")
+
 def process_documents_worker(worker_id):
     """Worker thread to process documents from queue - SINGLE WORKER MODE (sequential processing)"""
     log(f"[Worker-{worker_id}] 🚀 Starting worker in SINGLE WORKER MODE")
     log(f"[Worker-{worker_id}] ℹ️  All documents will be processed sequentially, one at a time")
     
+    set_worker_status(worker_id, 'starting')
+    # The Playwright/turnitin stack loads here, on the worker thread, so polling does not wait for it
+    try:
+        with startup_timing.timed_import("turnitin stack"):
+            from turnitin_processor import process_turnitin, shutdown_browser_session
+            from turnitin_auth import get_or_create_browser_session, note_job_finished
+    except ImportError as import_error:
+        log(f"[Worker-{worker_id}] ❌ Cannot load the browser stack: {import_error} - documents will not be processed")
+        set_worker_status(worker_id, 'failed')
+        startup_timing.skip("worker ready", "browser stack failed to import")
+        return
+    finally:
+        browser_stack_loaded.set()
+    
     # Pre-login to Turnitin when worker starts - don't wait for first document
     log(f"[Worker-{worker_id}] Initializing browser and logging in...")
     try:
-        from turnitin_auth import get_or_create_browser_session
-        
         # Initialize browser session for this worker thread (includes login)
         page = get_or_create_browser_session()
         
@@ -244,15 +601,23 @@ def process_documents_worker(worker_id):
             log(f"[Worker-{worker_id}] ⚠️ Pre-login failed, will retry on first document")
     except Exception as login_error:
         log(f"[Worker-{worker_id}] Pre-login error: {login_error} - will retry on first document")
+    startup_timing.milestone("worker ready")
     
-    while True:
+    while not shutdown_requested.is_set():
         try:
-            # Block and wait for next item in queue (FIFO - First In First Out)
-            queue_item = processing_queue.get()
+            # Block and wait for the next item (order set by the scheduling policy)
+            set_worker_status(worker_id, 'idle')
+            try:
+                queue_item = processing_queue.get(timeout=BROWSER_IDLE_CHECK_SECONDS)
+            except queue.Empty:
+                # Idle: recycle a browser that reached its age limit and prepare the standby now rather than at the next job
+                maintain_browser_between_jobs(worker_id)
+                continue
             
             if queue_item is None:  # Shutdown signal
                 log(f"[Worker-{worker_id}] Shutdown signal received")
                 break
+            queued_since.pop(id(queue_item), None)
             
             # Check queue size for information
             queue_size = processing_queue.qsize()
@@ -262,15 +627,30 @@ def process_documents_worker(worker_id):
                 log(f"[Worker-{worker_id}] 📋 Queue status: Processing current document, no documents waiting")
             
             log(f"[Worker-{worker_id}] 📄 Starting to process document for user {queue_item['user_id']}")
+            job = job_metrics.begin_job(
+                queue_item.get('original_filename'),
+                queue_item['user_id'],
+                queue_wait=time.time() - queue_item['queued_at'] if queue_item.get('queued_at') else None,
+                telegram_download=queue_item.get('download_seconds'),
+                cancel_event=queue_item.get('cancel_event'),
+                interrupt_event=queue_item.get('interrupt_event')
+            )
+            set_worker_status(worker_id, 'processing', queue_item['user_id'], job, queue_item.get('file_size'), queue_item.get('job_id'))
             
+            progress = queue_item.get('progress')
             try:
-                bot.send_message(
-                    queue_item['user_id'], 
-                    f"📄 <b>Your document is now being processed...</b>\n\n"
-                    f"⏳ Please wait while we generate your reports."
-                )
+                if progress:
+                    progress.set_stage('starting')
+                else:
+                    bot.send_message_async(
+                        queue_item['user_id'], 
+                        f"📄 <b>Your document is now being processed...</b>\n\n"
+                        f"⏳ Please wait while we generate your reports."
+                    )
+                # Everyone still waiting moved up one place
+                refresh_queue_positions()
             except Exception as msg_error:
-                log(f"[Worker-{worker_id}] Error sending processing message: {msg_error}")
+                log(f"[Worker-{worker_id}] Error updating progress message: {msg_error}")
             
             # Process the document (SEQUENTIAL - completes entire workflow before next document)
             try:
@@ -281,9 +661,22 @@ def process_documents_worker(worker_id):
 
                 # Pass the bot instance to the processor
                 log(f"[Worker-{worker_id}] 🔄 Calling turnitin_processor...")
-                submission_info = process_turnitin(queue_item['file_path'], queue_item['user_id'], bot)
+                submission_info = process_turnitin(
+                    queue_item['file_path'], queue_item['user_id'], bot, progress=progress,
+                    resume_title=queue_item.get('submission_title'),
+                    pending_title=queue_item.get('pending_title')
+                )
                 log(f"[Worker-{worker_id}] ✅ Successfully processed document for user {queue_item['user_id']}")
 
+                job_ok = bool(submission_info and submission_info.get('reports_available'))
+                if job_ok:
+                    session_keeper.mark_verified()
+                timings = job_metrics.end_job(ok=job_ok)
+                if job_ok and timings:
+                    queue_eta.record_job(queue_item.get('file_size'), timings['spans'])
+                if timings:
+                    job_scheduler.record_trace(queue_item, timings['spans']['total'], ok=job_ok)
+
                 # Update queue item status
                 queue_item['status'] = 'completed'
                 queue_item['completed_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -299,8 +692,44 @@ def process_documents_worker(worker_id):
                     add_to_submission_history(queue_item['user_id'], history_item)
                     log(f"Added submission to history for user {queue_item['user_id']}")
 
+            except JobCancelled as cancelled:
+                if queue_item.get('interrupted') and not queue_item['cancel_event'].is_set():
+                    # Shutdown: keep the upload and run the job again after the restart - from the
+                    # inbox search when Turnitin already has the document
+                    log(f"[Worker-{worker_id}] ⏸️ Job {queue_item.get('job_id')} interrupted at stage {cancelled} by shutdown")
+                    if job.submission_title:
+                        queue_item['submission_title'] = job.submission_title
+                    elif job.pending_title:
+                        queue_item['pending_title'] = job.pending_title
+                    job_metrics.end_job(ok=False, error='interrupted')
+                    queue_item['status'] = 'interrupted'
+                    interrupted_jobs.append(queue_item)
+                    if progress:
+                        if queue_item.get('submission_title'):
+                            progress.add_detail("⏸️ <b>Bot is restarting</b> - your document is already submitted, the reports follow right after.")
+                        else:
+                            progress.add_detail("⏸️ <b>Bot is restarting</b> - your document will be processed again right after.")
+                else:
+                    log(f"[Worker-{worker_id}] 🚫 Job {queue_item.get('job_id')} cancelled at stage {cancelled}")
+                    timings = job_metrics.end_job(ok=False, error='cancelled')
+                    if timings:
+                        job_scheduler.record_trace(queue_item, timings['spans']['total'], ok=False)
+                    queue_item['status'] = 'cancelled'
+                    try:
+                        if os.path.exists(queue_item['file_path']):
+                            os.remove(queue_item['file_path'])
+                    except Exception as cleanup_error:
+                        log(f"[Worker-{worker_id}] Cleanup error: {cleanup_error}")
+                    if progress:
+                        progress.finish(
+                            f"🚫 <b>Cancelled</b>\n\n📄 {html.escape(str(queue_item.get('original_filename', 'Document')))}"
+                        )
+
             except Exception as process_error:
                 log(f"Worker {worker_id} error processing document: {process_error}")
+                timings = job_metrics.end_job(ok=False, error=str(process_error))
+                if timings:
+                    job_scheduler.record_trace(queue_item, timings['spans']['total'], ok=False)
 
                 # Update queue item status
                 queue_item['status'] = 'failed'
@@ -308,14 +737,24 @@ def process_documents_worker(worker_id):
                 queue_item['failed_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
                 try:
-                    bot.send_message(
-                        queue_item['user_id'],
-                        f"❌ Error processing document: {str(process_error)}\n\nPlease try again or contact support."
-                    )
+                    if progress:
+                        progress.finish(
+                            f"❌ Error processing document: {str(process_error)}\n\nPlease try again or contact support."
+                        )
+                    else:
+                        bot.send_message_async(
+                            queue_item['user_id'],
+                            f"❌ Error processing document: {str(process_error)}\n\nPlease try again or contact support."
+                        )
                 except:
                     pass
-            
+
+            network_timing.end_job()
+            jobs_by_id.pop(queue_item.get('job_id'), None)
             processing_queue.task_done()
+            note_job_finished()
+            if not shutdown_requested.is_set():
+                maintain_browser_between_jobs(worker_id)
             
             # All 3 workers are running from startup, no need to scale
             # scale_workers()
@@ -327,6 +766,11 @@ def process_documents_worker(worker_id):
             except:
                 pass
 
+    # The browser session is thread-local: only this thread can close its Chromium
+    set_worker_status(worker_id, 'stopped')
+    log(f"[Worker-{worker_id}] Closing browser session")
+    shutdown_browser_session()
+
 def scale_workers():
     """Dynamically scale workers based on queue size"""
     global worker_threads
@@ -444,6 +888,9 @@ def create_admin_menu():
         types.InlineKeyboardButton("📄 Processing Queue", callback_data="admin_queue"),
         types.InlineKeyboardButton("📜 View History", callback_data="admin_history")
     )
+    markup.add(
+        types.InlineKeyboardButton("🔧 Bot Stats", callback_data="admin_bot_stats")
+    )
     
     return markup
 
@@ -478,6 +925,7 @@ def is_google_docs_url(url: str) -> bool:
 def download_from_google_drive(file_id, output_path):
     """Download file from Google Drive using gdown"""
     try:
+        import gdown
         url = f"https://drive.google.com/uc?id={file_id}"
         gdown.download(url, output_path, quiet=False)
         return True
@@ -503,8 +951,8 @@ def download_google_doc_as_docx(doc_id: str, output_path_without_ext: str) -> tu
         log(f"Google Docs export error: {e}")
         return False, ""
 
-def process_google_drive_link(message, drive_url):
-    """Process Google Drive link and download file"""
+def process_google_drive_link(message, drive_url, quota_charged=False):
+    """Process Google Drive link and download file (quota_charged: a document use was taken for it)"""
     try:
         # Extract file ID from URL
         file_id = extract_google_drive_file_id(drive_url)
@@ -522,12 +970,19 @@ def process_google_drive_link(message, drive_url):
         
         log(f"Extracted Google Drive file ID: {file_id}")
         
-        # Notify user
+        # Notify user (send_message returns None when Telegram refused it)
         status_msg = bot.send_message(
             message.chat.id,
             "📥 <b>Downloading from Google Drive...</b>\n\n"
             "⏳ Please wait..."
         )
+        status_msg_id = status_msg.message_id if status_msg else None
+        
+        def show_status(text):
+            if status_msg_id:
+                bot.edit_message_text(text, message.chat.id, status_msg_id)
+            else:
+                bot.send_message(message.chat.id, text)
         
         # Prepare download path
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -537,22 +992,22 @@ def process_google_drive_link(message, drive_url):
         file_path = os.path.join(upload_dir, temp_filename)
         
         # Download file (Docs vs Drive files)
+        download_started = time.time()
         if is_google_docs_url(drive_url):
             success, file_path = download_google_doc_as_docx(file_id, file_path)
             original_filename = f"document_{timestamp}.docx"
         else:
             success = download_from_google_drive(file_id, file_path)
             original_filename = f"document_{timestamp}.docx"  # default; may be updated if gdown writes extension
+        download_seconds = time.time() - download_started
         
         if not success or not os.path.exists(file_path):
-            bot.edit_message_text(
+            show_status(
                 "❌ <b>Download Failed</b>\n\n"
                 "💡 Please check:\n"
                 "1. File sharing is set to 'Anyone with the link'\n"
                 "2. The link is correct\n"
-                "3. File is not too large (max 100 MB)",
-                message.chat.id,
-                status_msg.message_id
+                "3. File is not too large (max 100 MB)"
             )
             return
         
@@ -562,12 +1017,10 @@ def process_google_drive_link(message, drive_url):
         
         if file_size > MAX_FILE_SIZE:
             os.remove(file_path)
-            bot.edit_message_text(
+            show_status(
                 f"❌ <b>File Too Large</b>\n\n"
                 f"📁 File size: <b>{file_size / (1024 * 1024):.2f} MB</b>\n"
-                f"📊 Maximum allowed: <b>100 MB</b>",
-                message.chat.id,
-                status_msg.message_id
+                f"📊 Maximum allowed: <b>100 MB</b>"
             )
             return
         
@@ -590,52 +1043,38 @@ def process_google_drive_link(message, drive_url):
         
         log(f"Downloaded Google Drive file to {file_path} ({file_size / (1024 * 1024):.2f} MB)")
         
-        # Update status
-        bot.edit_message_text(
-            "✅ <b>Download Complete!</b>\n\n"
-            f"📁 Size: <b>{file_size / (1024 * 1024):.2f} MB</b>\n"
-            "📋 Adding to processing queue...",
-            message.chat.id,
-            status_msg.message_id
-        )
+        # The download status message becomes the job's live status message (a new one if it was never sent)
+        progress = JobProgress(bot, message.chat.id, original_filename, message_id=status_msg_id)
+        progress.add_detail(f"📁 Size: <b>{file_size / (1024 * 1024):.2f} MB</b> (Google Drive)")
         
         # Add to processing queue
         queue_item = {
             'user_id': message.chat.id,
             'file_path': file_path,
             'original_filename': original_filename,
+            'file_size': file_size,
             'added_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'status': 'queued'
+            'download_seconds': download_seconds,
+            'quota_charged': quota_charged,
+            'status': 'queued',
+            'progress': progress
         }
         
-        processing_queue.put(queue_item)
-        queue_position = processing_queue.qsize()
+        queue_position = enqueue_job(queue_item)
         
-        # Notify user about queue status (SINGLE WORKER MODE - Sequential Processing)
-        if queue_position == 1:
-            queue_message = (
-                "📄 <b>Document queued for processing</b>\n\n"
-                "🚀 Your document will be processed next.\n"
-                "⏳ Processing will complete from start to finish before any other document."
-            )
-        else:
-            estimated_wait = (queue_position - 1) * 3
-            queue_message = (
-                f"📄 <b>Document queued for processing</b>\n\n"
-                f"📊 Position in queue: <b>{queue_position}</b>\n"
-                f"⏳ Estimated wait: <b>~{estimated_wait} minutes</b>\n\n"
-                f"ℹ️ Each document is processed completely (submit + download reports) before the next one starts."
-            )
-        
-        bot.send_message(message.chat.id, queue_message)
+        # Show queue status in the same message (SINGLE WORKER MODE - Sequential Processing)
+        progress.start(queue_position, estimate_queue_wait(queue_position), job_id=queue_item['job_id'])
+        if queue_position < processing_queue.qsize():
+            # Placed ahead of others (fair share / admin lane) - they moved down one place
+            refresh_queue_positions()
         log(f"Added Google Drive document to queue for user {message.chat.id}. Queue size: {queue_position}")
         
     except Exception as e:
         bot.reply_to(message, f"❌ Failed to process Google Drive link: {e}")
         log(f"Error handling Google Drive link: {e}")
 
-def process_user_document(message):
-    """Process uploaded document through Turnitin"""
+def process_user_document(message, quota_charged=False):
+    """Process uploaded document through Turnitin (quota_charged: a document use was taken for it)"""
     try:
         log(f"Received document from user {message.chat.id}: {message.document.file_name}")
         
@@ -658,20 +1097,14 @@ def process_user_document(message):
         
         # Download file from Telegram
         log("Requesting file info from Telegram API...")
+        download_started = time.time()
         file_info = bot.get_file(message.document.file_id)
         if not file_info:
             bot.reply_to(message, "❌ Failed to get file information. Please try again.")
             log("Failed to get file information from Telegram API")
             return
         
-        log(f"Downloading file from Telegram servers: path={getattr(file_info, 'file_path', 'N/A')}")
-        downloaded_file = bot.download_file(file_info.file_path)
-        if not downloaded_file:
-            bot.reply_to(message, "❌ Failed to download file. Please try again.")
-            log("Failed to download file bytes from Telegram servers")
-            return
-        
-        # Save file locally
+        # Stream file from Telegram straight into the upload spool (bounded memory per download)
         original_filename = message.document.file_name or "document"
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         new_filename = f"{message.chat.id}_{timestamp}_{original_filename}"
@@ -680,57 +1113,54 @@ def process_user_document(message):
         os.makedirs(upload_dir, exist_ok=True)
         file_path = os.path.join(upload_dir, new_filename)
         
-        with open(file_path, 'wb') as f:
-            f.write(downloaded_file)
+        log(f"Downloading file from Telegram servers: path={getattr(file_info, 'file_path', 'N/A')}")
+        download_result = bot.download_file_to_path(
+            file_info.file_path,
+            file_path,
+            max_bytes=DIRECT_UPLOAD_LIMIT,
+            timeout=120
+        )
+        if not download_result:
+            bot.reply_to(message, "❌ Failed to download file. Please try again.")
+            log("Failed to download file from Telegram servers")
+            return
+        downloaded_size, file_sha256 = download_result
         
-        log(f"Saved document to {file_path} ({os.path.getsize(file_path)} bytes)")
+        log(f"Saved document to {file_path} ({downloaded_size} bytes, sha256={file_sha256[:12]})")
         
-        # Send immediate acknowledgement to user
+        # One live status message per job: receipt, queue position and stages are edits of it
         size_mb = file_size / (1024 * 1024)
-        receipt_message = (
-            f"✅ <b>File Received!</b>\n\n"
-            f"📁 <b>Filename:</b> {original_filename}\n"
-            f"📊 <b>Size:</b> {size_mb:.2f} MB\n\n"
-            f"⏳ <b>Please wait while we process your document...</b>\n\n"
-            f"💡 <i>Larger files may take longer to process</i>"
-        )
-        bot.send_message(message.chat.id, receipt_message)
-        log(f"Sent file receipt confirmation to user {message.chat.id}")
+        progress = JobProgress(bot, message.chat.id, original_filename)
+        progress.add_detail(f"📊 <b>Size:</b> {size_mb:.2f} MB")
         
         # Add to processing queue
         queue_item = {
             'user_id': message.chat.id,
             'file_path': file_path,
             'original_filename': original_filename,
+            'file_size': downloaded_size,
+            'file_sha256': file_sha256,
             'added_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'status': 'queued'
+            'download_seconds': time.time() - download_started,
+            'quota_charged': quota_charged,
+            'status': 'queued',
+            'progress': progress
         }
         
-        processing_queue.put(queue_item)
-        queue_position = processing_queue.qsize()
+        queue_position = enqueue_job(queue_item)
         log(f"Queued document for user {message.chat.id}. Queue size now: {queue_position}")
         
-        # Notify user about queue status (SINGLE WORKER MODE - Sequential Processing)
-        if queue_position == 1:
-            queue_message = (
-                "📄 <b>Document queued for processing</b>\n\n"
-                "🚀 Your document will be processed next.\n"
-                "⏳ Processing will complete from start to finish before any other document."
-            )
-        else:
-            estimated_wait = max(1, (queue_position - 1) * 3)
-            queue_message = (
-                f"📄 <b>Document queued for processing</b>\n\n"
-                f"📊 Position in queue: <b>{queue_position}</b>\n"
-                f"⏳ Estimated wait: <b>~{estimated_wait} minutes</b>\n\n"
-                f"ℹ️ Each document is processed completely (submit + download reports) before the next one starts."
-            )
-        bot.send_message(message.chat.id, queue_message)
+        # Receipt + queue status in a single message (SINGLE WORKER MODE - Sequential Processing)
+        progress.start(queue_position, estimate_queue_wait(queue_position), job_id=queue_item['job_id'])
+        if queue_position < processing_queue.qsize():
+            # Placed ahead of others (fair share / admin lane) - they moved down one place
+            refresh_queue_positions()
         log(f"Notified user {message.chat.id} about queue position {queue_position}")
         
     except Exception as e:
-        bot.reply_to(message, f"❌ Failed to process file: {e}")
-        log(f"Error handling document: {e}")
+        # get_file/download errors carry the Bot API URL, which contains the token
+        bot.reply_to(message, f"❌ Failed to process file: {bot.redact(e)}")
+        log(f"Error handling document: {bot.redact(e)}")
 
 # MESSAGE HANDLERS
 @bot.message_handler(commands=['start'])
@@ -1161,6 +1591,10 @@ def help_command(message):
     File lớn (≤100MB): gửi link <b>Google Drive</b> hoặc <b>Google Docs</b>
 • Make sure sharing is set to <b>Anyone with the link</b>
     Hãy bật quyền chia sẻ <b>Ai có liên kết cũng xem được</b>
+• Check your queue position and estimated wait: /status
+    Xem vị trí trong hàng đợi và thời gian chờ: <code>/status</code>
+• Sent the wrong file? Cancel it: /cancel (refunded while still queued)
+    Gửi nhầm file? Hủy bằng: <code>/cancel</code> (hoàn lượt nếu chưa xử lý)
 
 <b>Accepted link formats / Link hợp lệ</b>
 • Google Drive file: <code>https://drive.google.com/file/d/FILE_ID/view</code> hoặc <code>...open?id=FILE_ID</code>
@@ -1502,6 +1936,107 @@ Contact admin for more information."""
     
     log(f"Subscription stopped for user {target_user_id}. Old plan: {old_sub_info}")
 
+def build_status_text(chat_id):
+    """Queue position / progress and ETA of a user's documents"""
+    lines = ["📋 <b>Your documents / Tài liệu của bạn</b>", ""]
+    found = False
+    for worker_id, status in sorted(worker_status.items()):
+        job = status.get('job')
+        if status['state'] != 'processing' or status.get('user_id') != chat_id or job is None:
+            continue
+        found = True
+        stage_label = job_metrics.METRIC_STAGE_LABELS.get(job.current, "Starting")
+        remaining = queue_eta.remaining_seconds(job, status.get('file_size'))
+        lines.append(f"▶️ <b>{html.escape(str(job.label or 'Document'))}</b>")
+        lines.append(f"   {stage_label} · elapsed {int(time.time() - job.started) // 60}m · "
+                     f"about {queue_eta.format_eta(remaining)} left")
+        job_id = status.get('job_id')
+        if job_id:
+            lines.append(f"   🆔 <code>{job_id}</code> · <code>/cancel {job_id}</code>")
+
+    waiting = [item for item in list(processing_queue.queue) if item]
+    for position, item in enumerate(waiting, start=1):
+        if item['user_id'] != chat_id:
+            continue
+        found = True
+        eta = estimate_queue_wait(position, waiting)
+        lines.append(f"📋 <b>{html.escape(str(item.get('original_filename', 'Document')))}</b>")
+        lines.append(f"   Position {position} · {'starts in ' + eta if eta else 'next'}")
+        lines.append(f"   🆔 <code>{item['job_id']}</code> · <code>/cancel {item['job_id']}</code>")
+
+    if not found:
+        lines.append("No documents in the queue. Send a file to start.\nKhông có tài liệu nào trong hàng đợi.")
+    lines.append("")
+    lines.append(f"🕐 Updated {datetime.now().strftime('%H:%M:%S')}")
+    return "\n".join(lines)
+
+def create_status_markup():
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("🔄 Refresh", callback_data="refresh_status"))
+    return markup
+
+@bot.message_handler(commands=['status'])
+def status_command(message):
+    """Show the user's queue position / progress with a measured ETA"""
+    bot.send_message(message.chat.id, build_status_text(message.chat.id), reply_markup=create_status_markup())
+
+@bot.callback_query_handler(func=lambda call: call.data == "refresh_status")
+def refresh_status_callback(call):
+    try:
+        bot.edit_message_text(
+            build_status_text(call.message.chat.id),
+            call.message.chat.id,
+            call.message.message_id,
+            reply_markup=create_status_markup()
+        )
+    except Exception as e:
+        # "message is not modified" when nothing changed within the same second
+        log(f"Status refresh: {e}")
+    try:
+        bot.answer_callback_query(call.id)
+    except Exception:
+        pass
+
+def active_jobs():
+    """Jobs a worker is running right now (queue items)"""
+    return [item for item in list(jobs_by_id.values()) if item.get('status') == 'processing']
+
+@bot.message_handler(commands=['cancel'])
+def cancel_command(message):
+    """Cancel one of your documents: /cancel JOB_ID (or just /cancel when only one is active)"""
+    user_id = message.from_user.id
+    parts = message.text.split()
+    if len(parts) > 1:
+        _, text = cancel_job(parts[1].strip().lower(), user_id)
+        bot.reply_to(message, text)
+        return
+
+    own = [item for item in list(jobs_by_id.values()) if item['user_id'] == user_id]
+    if len(own) == 1:
+        _, text = cancel_job(own[0]["job_id"], user_id)
+        bot.reply_to(message, text)
+    elif not own:
+        bot.reply_to(message, "You have no documents in the queue.\nBạn không có tài liệu nào trong hàng đợi.")
+    else:
+        lines = ["Which document? / Tài liệu nào?", ""]
+        for item in own:
+            lines.append(f"• {html.escape(str(item.get('original_filename', 'Document')))}: <code>/cancel {item['job_id']}</code>")
+        bot.reply_to(message, "\n".join(lines))
+
+@bot.message_handler(commands=['timings'])
+def timings_command(message):
+    """Admin command: per-stage job timing percentiles and the slowest recent jobs"""
+    if message.from_user.id not in ADMIN_TELEGRAM_IDS:
+        return
+    bot.reply_to(message, job_metrics.format_timings_report())
+
+@bot.message_handler(commands=['network'])
+def network_command(message):
+    """Admin command: slowest / heaviest Turnitin endpoints seen by the browser"""
+    if message.from_user.id not in ADMIN_TELEGRAM_IDS:
+        return
+    bot.reply_to(message, network_timing.format_network_report())
+
 @bot.message_handler(commands=['clearcooldown'])
 def clear_cooldown_command(message):
     """Admin command to clear cooldown for a user"""
@@ -1539,16 +2074,8 @@ def handle_google_drive_link(message):
     
     log(f"DEBUG: Google Drive link received from user {user_id}")
     
-    # Check if bot is currently logging in - block all uploads
-    if bot_is_logging_in.is_set():
-        bot.reply_to(
-            message,
-            "🔄 <b>Bot is cleaning, please wait...</b>\n"
-            "🔄 <b>Bot đang làm sạch, vui lòng chờ...</b>\n\n"
-            "⏳ The bot is refreshing its session. Please try again in a moment.\n"
-            "⏳ Bot đang làm mới phiên. Vui lòng thử lại sau giây lát."
-        )
-        log(f"User {user_id} Google Drive link blocked - bot is logging in")
+    if shutdown_requested.is_set():
+        bot.reply_to(message, RESTARTING_MESSAGE)
         return
     
     # Admin has unlimited access and no cooldown
@@ -1591,9 +2118,11 @@ def handle_google_drive_link(message):
         # Decrease document count
         user_data["documents_remaining"] -= 1
         save_subscriptions(subscriptions)
+        quota_charged = True
         
         remaining_msg = f"\n\n📊 <b>Remaining Documents:</b> {user_data['documents_remaining']}"
     else:
+        quota_charged = False
         remaining_msg = ""
     
     # Set cooldown for this user (8 minutes)
@@ -1601,7 +2130,7 @@ def handle_google_drive_link(message):
     log(f"Set 8-minute cooldown for user {user_id}")
     
     # Process the Google Drive link
-    process_google_drive_link(message, message.text.strip())
+    process_google_drive_link(message, message.text.strip(), quota_charged=quota_charged)
 
 @bot.message_handler(content_types=['document'])
 def handle_document(message):
@@ -1610,16 +2139,9 @@ def handle_document(message):
     
     log(f"DEBUG: Document received from user {user_id}")
     
-    # Check if bot is currently logging in - block all uploads
-    if bot_is_logging_in.is_set():
-        bot.reply_to(
-            message,
-            "🔄 <b>Bot is cleaning, please wait...</b>\n"
-            "🔄 <b>Bot đang làm sạch, vui lòng chờ...</b>\n\n"
-            "⏳ The bot is refreshing its session. Please try again in a moment.\n"
-            "⏳ Bot đang làm mới phiên. Vui lòng thử lại sau giây lát."
-        )
-        log(f"User {user_id} upload blocked - bot is logging in")
+    if shutdown_requested.is_set():
+        bot.reply_to(message, RESTARTING_MESSAGE)
+        log(f"User {user_id} upload refused - bot is shutting down")
         return
     
     # Admin has unlimited access and no cooldown
@@ -1666,10 +2188,12 @@ def handle_document(message):
         # Decrease document count
         user_data["documents_remaining"] -= 1
         save_subscriptions(subscriptions)
+        quota_charged = True
         
         remaining = user_data["documents_remaining"]
         log(f"User {user_id} documents_remaining updated to {remaining} (document-based subscription)")
     else:
+        quota_charged = False
         log(f"User {user_id} time-based subscription - proceeding to process")
     
     # Set cooldown for this user (8 minutes)
@@ -1677,43 +2201,75 @@ def handle_document(message):
     log(f"Set 8-minute cooldown for user {user_id}")
     
     # Process the document
-    process_user_document(message)
+    process_user_document(message, quota_charged=quota_charged)
 
 if __name__ == "__main__":
-    # Update repository before starting the bot (best-effort)
-    try_git_pull_on_startup()
-
     # Import and register callback handlers
     from bot_callbacks import register_callback_handlers
     register_callback_handlers(bot, ADMIN_TELEGRAM_ID, MONTHLY_PLANS, DOCUMENT_PLANS, BANK_DETAILS, 
                               load_pending_requests, save_pending_requests, load_subscriptions, 
                               save_subscriptions, is_user_subscribed, get_user_subscription_info,
                               create_main_menu, create_monthly_plans_menu, create_document_plans_menu,
-                              create_admin_menu, processing_queue, log, get_user_submission_history)
+                              create_admin_menu, processing_queue, log, get_user_submission_history,
+                              cancel_job=cancel_job, active_jobs=active_jobs)
     
+    # Chromium left behind by a crashed or killed earlier run
+    browser_registry.sweep_stale()
+    browser_registry.start_reaper()
+    session_keeper.start_session_keeper()
+
+    # The startup report is logged once these are all in (the background git pull comes last)
+    startup_timing.expect("worker ready", "accepting updates")
+    if GIT_PULL_ON_STARTUP not in GIT_PULL_OFF_VALUES:
+        startup_timing.expect("git pull done")
+    startup_timing.report_by(STARTUP_REPORT_DEADLINE_SECONDS)
+
+    restore_queue()
     start_processing_worker()
+
+    if METRICS_PORT:
+        register_collector(collect_bot_metrics)
+        register_collector(browser_registry.collect_metrics)
+        try:
+            MetricsServer(METRICS_LISTEN, METRICS_PORT).start()
+        except OSError as e:
+            log(f"⚠️ Metrics endpoint not started: {e}")
     
     log("🤖 Turnitin bot starting...")
     
     try:
-        bot.infinity_polling(
-            timeout=60,
-            long_polling_timeout=60,
-            restart_on_change=False
-        )
+        if TELEGRAM_WEBHOOK_URL:
+            from telegram_webhook import run_webhook
+            # Update the repository (best-effort); by default in the background, for the next restart
+            start_git_pull()
+            startup_timing.milestone("accepting updates")
+            log(f"⏱️ Serving webhook {startup_timing.elapsed():.1f}s after start")
+            run_webhook(
+                bot,
+                TELEGRAM_WEBHOOK_URL,
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                secret_token=WEBHOOK_SECRET,
+                workers=WEBHOOK_WORKERS
+            )
+        else:
+            # getUpdates is refused while a webhook is registered (e.g. after running in webhook mode)
+            bot.remove_webhook()
+            start_git_pull()
+            startup_timing.milestone("accepting updates")
+            log(f"⏱️ Polling {startup_timing.elapsed():.1f}s after start")
+            bot.infinity_polling(
+                timeout=60,
+                long_polling_timeout=60,
+                restart_on_change=False
+            )
     except Exception as e:
         log(f"Polling error: {e}")
     finally:
         log("Bot shutting down...")
-        shutdown_browser_session()
-        
-        # Signal all workers to stop
-        for _ in worker_threads:
-            processing_queue.put(None)
-        
-        # Wait for all workers to finish
-        for worker in worker_threads:
-            if worker.is_alive():
-                worker.join(timeout=5)
-        
+        # Only update ingestion stops here (the webhook server is already down); draining jobs still send
+        bot.stop_polling()
+        # Workers finish or checkpoint their jobs and close their own browsers; the queue is saved
+        drain_and_shutdown()
+        bot.stop_sending()
         log("Bot shutdown complete")
\ No newline at end of file
@@ -0,0 +1,258 @@
+import functools
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Opt-in local endpoint (see main.py): METRICS_PORT=9464 -> http://127.0.0.1:9464/metrics
+DEFAULT_LISTEN = "127.0.0.1"
+DEFAULT_PORT = 9464
+
+# Bucket bounds in seconds
+STAGE_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 180, 300, 600, 900)
+LOGIN_BUCKETS = (5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+STORAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels.
+
+    Each metric has its own small lock, held only to update or copy a dict, so a
+    scrape never waits on anything a worker does.
+    """
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values = {}   # sorted label tuple -> value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}   # sorted label tuple -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                labels = key + (('le', _format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {round(values[-1], 6)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {values[len(self.buckets)]}")
+        return lines
+
+# Metrics updated by the bot modules
+JOB_OUTCOMES = Counter("turni_jobs_total", "Finished document jobs by outcome")
+JOB_STAGE_SECONDS = Histogram("turni_job_stage_seconds", "Time spent per pipeline stage per job", STAGE_BUCKETS)
+LOGINS = Counter("turni_logins_total", "Turnitin login attempts by result (already_logged_in: session check, no login)")
+LOGIN_SECONDS = Histogram("turni_login_seconds", "Turnitin login duration", LOGIN_BUCKETS)
+STORAGE_SECONDS = Histogram("turni_storage_seconds", "JSON storage read/write latency", STORAGE_BUCKETS)
+BROWSERS_REAPED = Counter("turni_browser_processes_reaped_total", "Stale or orphaned browser process trees killed, by reason")
+BROWSER_RECYCLES = Counter("turni_browser_recycles_total", "Browser sessions replaced between jobs, by trigger")
+BROWSER_STANDBY_EVENTS = Counter("turni_browser_standby_total", "Warm standby browsers prepared and swapped in, by event")
+
+_metrics = [JOB_OUTCOMES, JOB_STAGE_SECONDS, LOGINS, LOGIN_SECONDS, STORAGE_SECONDS, BROWSERS_REAPED, BROWSER_RECYCLES,
+            BROWSER_STANDBY_EVENTS]
+_collectors = []
+
+def register_collector(collect):
+    """Add a function called on every scrape.
+
+    It returns (name, type, help, [(labels dict, value), ...]) tuples and must only read
+    state that is safe without locks (counters, snapshots), never wait on a worker.
+    """
+    _collectors.append(collect)
+
+def timed_storage(operation, store):
+    """Decorator: record the latency of a JSON storage read/write"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STORAGE_SECONDS.observe(time.perf_counter() - started, operation=operation, store=store)
+        return wrapper
+    return decorator
+
+def read_proc_status(pid):
+    """(name, parent pid, rss bytes) from /proc/<pid>/status, or None"""
+    name, ppid, rss = None, None, 0
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("Name:"):
+                    name = line.split(None, 1)[1].strip()
+                elif line.startswith("PPid:"):
+                    ppid = int(line.split()[1])
+                elif line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return name, ppid, rss
+
+def list_processes():
+    """pid -> (name, parent pid, rss bytes) for every process; None where /proc is unavailable"""
+    if not os.path.isdir("/proc"):
+        return None
+    processes = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            status = read_proc_status(entry)
+            if status:
+                processes[int(entry)] = status
+    return processes
+
+def descendants(root_pid, processes):
+    """PIDs below root_pid in the process tree"""
+    children = {}
+    for pid, (_, ppid, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+    found = []
+    pending = list(children.get(root_pid, []))
+    while pending:
+        pid = pending.pop()
+        found.append(pid)
+        pending.extend(children.get(pid, []))
+    return found
+
+def is_browser_process(name):
+    return bool(name) and ('chrom' in name.lower() or 'headless_shell' in name.lower())
+
+def chromium_rss_bytes():
+    """(process count, total RSS) of the browser processes started by this bot; None where /proc is unavailable"""
+    processes = list_processes()
+    if processes is None:
+        return None
+    # Descendants of this process (Playwright driver -> Chromium and its helpers)
+    count, total = 0, 0
+    for pid in descendants(os.getpid(), processes):
+        name, _, rss = processes[pid]
+        if is_browser_process(name):
+            count += 1
+            total += rss
+    return count, total
+
+def _render_collected(name, metric_type, help_text, samples):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(sorted((labels or {}).items()))} {_format_value(value)}")
+    return lines
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in list(_collectors):
+        try:
+            for name, metric_type, help_text, samples in collect():
+                lines.extend(_render_collected(name, metric_type, help_text, samples))
+        except Exception as e:
+            log(f"Metrics: collector {getattr(collect, '__name__', collect)} failed: {e}")
+    browsers = chromium_rss_bytes()
+    if browsers is not None:
+        lines.extend(_render_collected(
+            "turni_chromium_processes", "gauge", "Browser processes started by the bot", [({}, browsers[0])]
+        ))
+        lines.extend(_render_collected(
+            "turni_chromium_rss_bytes", "gauge", "Resident memory of the bot's browser processes", [({}, browsers[1])]
+        ))
+    return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serves GET /metrics on a local port (scraped by Prometheus or curl)"""
+
+    def __init__(self, listen=DEFAULT_LISTEN, port=DEFAULT_PORT):
+        self.listen = listen
+        self.port = port
+        self._httpd = None
+
+    def _make_handler(self):
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0].rstrip('/') != "/metrics":
+                    body, status, content_type = b"not found", 404, "text/plain"
+                else:
+                    body, status, content_type = render_metrics().encode('utf-8'), 200, CONTENT_TYPE
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return _Handler
+
+    def start(self):
+        """Serve in a background thread"""
+        self._httpd = ThreadingHTTPServer((self.listen, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="metrics-server", daemon=True).start()
+        log(f"📈 Metrics endpoint on http://{self.listen}:{self.port}/metrics")
+        return self
+
+    def shutdown(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
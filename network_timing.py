@@ -0,0 +1,250 @@
+import html
+import os
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlparse
+
+from job_metrics import percentile
+
+# Opt-in: TURNITIN_NETWORK_TIMING=1 records every browser request per job
+NETWORK_TIMING = os.getenv("TURNITIN_NETWORK_TIMING", "").strip().lower() in ("1", "true", "yes", "on")
+
+# Requests kept per job (a viewer session can load a few hundred)
+MAX_REQUESTS_PER_JOB = 3000
+# Duration samples kept per endpoint for the percentiles
+MAX_SAMPLES_PER_ENDPOINT = 200
+# Per-job summaries kept for the report
+MAX_RECENT_JOBS = 20
+
+# Path segments that vary per request: numbers, hex ids, UUIDs, long tokens
+UUID_RE = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+HEX_RE = re.compile(r'^[0-9a-fA-F]{12,}$')
+TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{32,}$')
+HASHED_ASSET_RE = re.compile(r'[.-][0-9a-f]{8,}(?=\.[a-z0-9]+$)')
+
+# Per-worker state (each worker thread owns its own browser context)
+thread_local = threading.local()
+
+_lock = threading.Lock()
+_endpoints = {}                      # pattern -> aggregate
+_recent_jobs = deque(maxlen=MAX_RECENT_JOBS)
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def is_enabled():
+    return NETWORK_TIMING
+
+def _state():
+    if not hasattr(thread_local, 'network'):
+        thread_local.network = {'label': None, 'requests': None, 'responses': None, 'dropped': 0}
+    return thread_local.network
+
+def endpoint_pattern(method, url):
+    """Group URLs by endpoint: 'GET www.turnitin.com/t_inbox.asp', '/app/carta/download/{id}'..."""
+    parsed = urlparse(url)
+    if parsed.scheme in ('data', 'blob'):
+        return f"{method} {parsed.scheme}:"
+    segments = []
+    for segment in parsed.path.split('/'):
+        if segment.isdigit() or UUID_RE.match(segment) or HEX_RE.match(segment) or TOKEN_RE.match(segment):
+            segments.append("{id}")
+        else:
+            segments.append(HASHED_ASSET_RE.sub(".{hash}", segment))
+    return f"{method} {parsed.netloc}{'/'.join(segments) or '/'}"
+
+# ---- Browser hooks ---------------------------------------------------------
+
+def attach_network_timing(context):
+    """Record finished/failed requests of a new browser context (no-op unless enabled).
+
+    Everything is read from data the events already carry (request.timing, the
+    response's status and Content-Length), so neither the page nor the end of the
+    job waits on extra driver round trips; only the slowest few requests of a job
+    have their exact transfer size fetched (see end_job).
+    """
+    if not is_enabled() or context is None:
+        return
+    state = _state()
+
+    def on_response(response):
+        responses = state['responses']
+        if responses is None or len(responses) >= MAX_REQUESTS_PER_JOB:
+            return
+        try:
+            length = int(response.headers.get('content-length') or 0)
+        except ValueError:
+            length = 0
+        responses[response.request] = (response.status, length)
+
+    def on_finished(request):
+        _keep(state, request, None)
+
+    def on_failed(request):
+        _keep(state, request, request.failure or "failed")
+
+    context.on("response", on_response)
+    context.on("requestfinished", on_finished)
+    context.on("requestfailed", on_failed)
+    log(f"[{threading.current_thread().name}] 📡 Network timing enabled")
+
+def _keep(state, request, failure):
+    requests = state['requests']
+    if requests is None:
+        return
+    if len(requests) >= MAX_REQUESTS_PER_JOB:
+        state['dropped'] += 1
+        return
+    requests.append((request, failure))
+
+def begin_job(label):
+    """Start collecting requests for one document job"""
+    if not is_enabled():
+        return
+    state = _state()
+    state['label'] = label
+    state['requests'] = []
+    state['responses'] = {}
+    state['dropped'] = 0
+
+def _describe(request, failure, response_info):
+    """One request as a dict: pattern, type, status, duration and size (Content-Length)"""
+    timing = request.timing or {}
+    response_end = timing.get('responseEnd', -1)
+    duration_ms = response_end if response_end is not None and response_end >= 0 else None
+    status, size = response_info or (None, 0)
+    return {
+        'pattern': endpoint_pattern(request.method, request.url),
+        'type': request.resource_type,
+        'status': status,
+        'failure': failure,
+        'duration_ms': round(duration_ms, 1) if duration_ms is not None else None,
+        'bytes': size,
+    }
+
+def _transfer_size(request):
+    """Exact bytes on the wire (headers + body) - one driver round trip, so only for a few requests"""
+    try:
+        sizes = request.sizes()
+        return max(0, sizes.get('responseBodySize', 0)) + max(0, sizes.get('responseHeadersSize', 0))
+    except Exception:
+        return None
+
+def end_job(top=5):
+    """Add this job's requests to the endpoint aggregates and log the slowest"""
+    if not is_enabled():
+        return None
+    state = _state()
+    pending, state['requests'] = state['requests'], None
+    responses, state['responses'] = state['responses'] or {}, None
+    if pending is None:
+        return None
+
+    described = []
+    for request, failure in pending:
+        try:
+            described.append((request, _describe(request, failure, responses.get(request))))
+        except Exception:
+            continue
+    described.sort(key=lambda pair: pair[1]['duration_ms'] or 0, reverse=True)
+    for request, entry in described[:top]:
+        if entry['failure'] is None:
+            size = _transfer_size(request)
+            if size is not None:
+                entry['bytes'] = size
+    requests = [entry for _, entry in described]
+
+    with _lock:
+        for entry in requests:
+            aggregate = _endpoints.get(entry['pattern'])
+            if aggregate is None:
+                aggregate = _endpoints[entry['pattern']] = {
+                    'type': entry['type'], 'count': 0, 'failed': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'bytes': 0, 'statuses': {}, 'samples': deque(maxlen=MAX_SAMPLES_PER_ENDPOINT),
+                }
+            aggregate['count'] += 1
+            aggregate['bytes'] += entry['bytes']
+            if entry['failure']:
+                aggregate['failed'] += 1
+            if entry['status'] is not None:
+                aggregate['statuses'][entry['status']] = aggregate['statuses'].get(entry['status'], 0) + 1
+            if entry['duration_ms'] is not None:
+                aggregate['total_ms'] += entry['duration_ms']
+                aggregate['max_ms'] = max(aggregate['max_ms'], entry['duration_ms'])
+                aggregate['samples'].append(entry['duration_ms'])
+
+    slowest = requests[:top]
+    summary = {
+        'label': state['label'],
+        'finished_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'requests': len(requests),
+        'dropped': state['dropped'],
+        'failed': sum(1 for e in requests if e['failure']),
+        'bytes': sum(e['bytes'] for e in requests),
+        'slowest': slowest,
+    }
+    with _lock:
+        _recent_jobs.append(summary)
+
+    worker_name = threading.current_thread().name
+    log(f"[{worker_name}] 📡 Network: {summary['requests']} requests, {summary['failed']} failed, "
+        f"{summary['bytes'] / 1024:.0f} KB")
+    for entry in slowest:
+        log(f"[{worker_name}] 📡   {entry['duration_ms']} ms  {entry['type']:<10} {entry['status'] or entry['failure']}  {entry['pattern']}")
+    return summary
+
+def endpoint_summary():
+    """Aggregates per endpoint pattern (count, failures, total/p50/p95/max ms, bytes)"""
+    with _lock:
+        snapshot = {pattern: dict(aggregate, samples=list(aggregate['samples']), statuses=dict(aggregate['statuses']))
+                    for pattern, aggregate in _endpoints.items()}
+    summary = {}
+    for pattern, aggregate in snapshot.items():
+        samples = aggregate.pop('samples')
+        aggregate['p50_ms'] = round(percentile(samples, 50), 1) if samples else None
+        aggregate['p95_ms'] = round(percentile(samples, 95), 1) if samples else None
+        aggregate['total_ms'] = round(aggregate['total_ms'], 1)
+        summary[pattern] = aggregate
+    return summary
+
+def recent_jobs():
+    with _lock:
+        return list(_recent_jobs)
+
+def format_network_report(top=8):
+    """HTML report for the admin /network command: endpoints by total time and by bytes"""
+    if not is_enabled():
+        return "📡 <b>Network Timing</b>\n\nDisabled. Set TURNITIN_NETWORK_TIMING=1 and restart."
+    summary = endpoint_summary()
+    if not summary:
+        return "📡 <b>Network Timing</b>\n\nNo finished jobs yet."
+
+    def table(items, value):
+        rows = []
+        for pattern, aggregate in items:
+            name = pattern if len(pattern) <= 48 else "…" + pattern[-47:]
+            rows.append(f"{value(aggregate):>16} x{aggregate['count']:<4} {name}")
+        return "<pre>" + html.escape("\n".join(rows)) + "</pre>"
+
+    by_time = sorted(summary.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:top]
+    by_bytes = sorted(summary.items(), key=lambda item: item[1]['bytes'], reverse=True)[:top]
+    failing = [(pattern, aggregate) for pattern, aggregate in summary.items() if aggregate['failed']]
+    jobs = recent_jobs()
+
+    lines = [
+        "📡 <b>Network Timing</b>",
+        f"{len(summary)} endpoints over {len(jobs)} recent job(s)",
+        "",
+        "⏱️ <b>Top by total time</b> (p95 in ms)",
+        table(by_time, lambda a: f"{a['total_ms'] / 1000:.1f}s p95={a['p95_ms']}"),
+        "📦 <b>Top by bytes</b> (Content-Length; exact for the slowest requests)",
+        table(by_bytes, lambda a: f"{a['bytes'] / 1024:.0f}KB"),
+    ]
+    if failing:
+        failing.sort(key=lambda item: item[1]['failed'], reverse=True)
+        lines.append("❌ <b>Failing</b>")
+        lines.append(table(failing[:top], lambda a: f"{a['failed']} fail"))
+    return "\n".join(lines)
@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlparse
+
+# Opt-in: set TURNITIN_RECORD_DIR to capture page snapshots while jobs run
+RECORD_DIR = os.getenv("TURNITIN_RECORD_DIR", "").strip()
+
+# XHR/fetch responses kept between two steps, and the largest body saved
+MAX_PENDING_XHR = 50
+MAX_XHR_BYTES = 256 * 1024
+XHR_CONTENT_TYPES = ('application/json', 'text/', 'application/javascript')
+
+REDACTED = "[redacted]"
+
+# Query parameters that carry sessions, user ids or signatures
+SENSITIVE_PARAMS = (
+    'session-id', 'session', 'sid', 's', 'u', 'token', 'auth', 'key', 'signature',
+    'X-Amz-Signature', 'X-Amz-Credential', 'X-Amz-Security-Token', 'Policy', 'Key-Pair-Id',
+)
+SENSITIVE_PARAM_RE = re.compile(
+    r'([?&;](?:' + '|'.join(re.escape(p) for p in SENSITIVE_PARAMS) + r')=)[^&"\'\s<>#]+'
+)
+EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+# Hidden form fields holding tokens (csrf, session...)
+TOKEN_INPUT_RE = re.compile(
+    r'(<input[^>]*name="[^"]*(?:token|csrf|session|sid|auth)[^"]*"[^>]*value=")[^"]*',
+    re.IGNORECASE
+)
+# Personal fields in JSON payloads
+PERSONAL_JSON_RE = re.compile(
+    r'("(?:email|first_?name|last_?name|firstName|lastName|author|user_?name|userName|'
+    r'full_?name|fullName|[A-Za-z_]*[Tt]oken|[A-Za-z_]*[Ss]ession[A-Za-z_]*)"\s*:\s*)"[^"]*"'
+)
+SCRIPT_RE = re.compile(r'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+
+# Per-worker recording state (each worker thread owns its own browser)
+thread_local = threading.local()
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def is_enabled():
+    return bool(RECORD_DIR)
+
+def _state():
+    if not hasattr(thread_local, 'recorder'):
+        thread_local.recorder = {
+            'job_dir': None,
+            'manifest': None,
+            'scrub_values': [],
+            'pending_xhr': deque(maxlen=MAX_PENDING_XHR),
+            'lock': threading.Lock(),
+        }
+    return thread_local.recorder
+
+def _sensitive_values(extra=None):
+    """Literal values to redact: account credentials + per-job values (file name, chat id)"""
+    values = [os.getenv("TURNITIN_EMAIL", ""), os.getenv("TURNITIN_PASSWORD", "")]
+    values.extend(extra or [])
+    # Longest first so a file name is replaced before its stem
+    return sorted({str(v) for v in values if v and len(str(v)) >= 3}, key=len, reverse=True)
+
+def scrub_text(text, extra_values=None):
+    """Remove credentials, personal data and session tokens from captured text"""
+    if not text:
+        return text
+    for value in _sensitive_values(extra_values):
+        text = re.sub(re.escape(value), REDACTED, text, flags=re.IGNORECASE)
+    text = EMAIL_RE.sub("user@example.com", text)
+    text = SENSITIVE_PARAM_RE.sub(r'\1redacted', text)
+    text = TOKEN_INPUT_RE.sub(r'\1redacted', text)
+    text = PERSONAL_JSON_RE.sub(r'\1"' + REDACTED + '"', text)
+    return text
+
+def scrub_html(markup, extra_values=None):
+    """Scrub a DOM snapshot and drop scripts so the replay stays static and offline"""
+    return scrub_text(SCRIPT_RE.sub("", markup or ""), extra_values)
+
+def _safe_name(text):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', text).strip('_')[:60] or "step"
+
+# ---- Browser hooks ---------------------------------------------------------
+
+def attach_recorder(context):
+    """Listen for XHR/fetch responses on a new browser context (no-op unless enabled)"""
+    if not is_enabled() or context is None:
+        return
+    state = _state()
+
+    def on_response(response):
+        try:
+            if response.request.resource_type not in ('xhr', 'fetch'):
+                return
+            state['pending_xhr'].append(response)
+        except Exception:
+            pass
+
+    context.on("response", on_response)
+    log(f"[{threading.current_thread().name}] 🎥 Page recording enabled -> {RECORD_DIR}")
+
+def begin_job(label, scrub_values=None):
+    """Start a capture folder for one document job"""
+    if not is_enabled():
+        return
+    state = _state()
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    job_dir = os.path.join(RECORD_DIR, f"{stamp}_{_safe_name(threading.current_thread().name)}")
+    try:
+        os.makedirs(job_dir, exist_ok=True)
+    except Exception as e:
+        log(f"Recorder: cannot create {job_dir}: {e}")
+        return
+    with state['lock']:
+        state['job_dir'] = job_dir
+        state['scrub_values'] = [v for v in (scrub_values or []) if v]
+        state['pending_xhr'].clear()
+        state['manifest'] = {
+            'created_at': datetime.now().isoformat(),
+            'label': scrub_text(str(label), state['scrub_values']),
+            'steps': [],
+        }
+    _write_manifest(state)
+
+def record_step(page, step):
+    """Save a scrubbed DOM snapshot of page plus the XHR responses seen since the last step.
+
+    Never raises - recording must not break a job.
+    """
+    if not is_enabled():
+        return
+    state = _state()
+    if state['job_dir'] is None or page is None:
+        return
+    try:
+        extra = state['scrub_values']
+        index = len(state['manifest']['steps']) + 1
+        base_name = f"{index:02d}_{_safe_name(step)}"
+
+        url = page.url
+        markup = scrub_html(page.content(), extra)
+        with open(os.path.join(state['job_dir'], base_name + ".html"), 'w', encoding='utf-8') as f:
+            f.write(markup)
+
+        xhr_entries = []
+        pending = list(state['pending_xhr'])
+        state['pending_xhr'].clear()
+        for number, response in enumerate(pending, start=1):
+            entry = _save_xhr(state['job_dir'], f"{base_name}_xhr{number:02d}", response, extra)
+            if entry:
+                xhr_entries.append(entry)
+
+        parsed = urlparse(scrub_text(url, extra))
+        state['manifest']['steps'].append({
+            'step': step,
+            'file': base_name + ".html",
+            'url': scrub_text(url, extra),
+            'path': parsed.path or "/",
+            'query': parsed.query,
+            'recorded_at': datetime.now().isoformat(),
+            'xhr': xhr_entries,
+        })
+        _write_manifest(state)
+        log(f"[{threading.current_thread().name}] 🎥 Recorded step '{step}' ({len(markup)} bytes, {len(xhr_entries)} XHR)")
+    except Exception as e:
+        log(f"[{threading.current_thread().name}] Recorder: could not record '{step}': {e}")
+
+def _save_xhr(job_dir, name, response, extra):
+    """Write one XHR/fetch body (text types only, size-capped). Returns its manifest entry."""
+    try:
+        content_type = (response.headers.get('content-type') or "").split(';')[0].strip()
+        if not content_type.startswith(XHR_CONTENT_TYPES):
+            return None
+        body = response.body()
+        if len(body) > MAX_XHR_BYTES:
+            return None
+        text = scrub_text(body.decode('utf-8', errors='replace'), extra)
+        extension = ".json" if content_type == 'application/json' else ".txt"
+        with open(os.path.join(job_dir, name + extension), 'w', encoding='utf-8') as f:
+            f.write(text)
+        url = scrub_text(response.url, extra)
+        parsed = urlparse(url)
+        return {
+            'file': name + extension,
+            'url': url,
+            'path': parsed.path or "/",
+            'query': parsed.query,
+            'method': response.request.method,
+            'status': response.status,
+            'content_type': content_type,
+        }
+    except Exception:
+        # Bodies of redirects / aborted requests are not available
+        return None
+
+def _write_manifest(state):
+    path = os.path.join(state['job_dir'], "manifest.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state['manifest'], f, indent=2)
+    os.replace(tmp_path, path)
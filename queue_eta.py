@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from job_metrics import METRIC_STAGES
+
+ETA_FILE = "queue_eta.json"
+
+# Weight of the newest job in the moving averages
+EWMA_ALPHA = 0.3
+# Used until a size bucket has seen a job (the old flat estimate)
+DEFAULT_JOB_SECONDS = 180
+# A running job is never assumed to finish sooner than this
+MIN_REMAINING_SECONDS = 30
+
+# File size buckets: (upper bound in bytes, name)
+SIZE_BUCKETS = [
+    (1 * 1024 * 1024, "<1MB"),
+    (5 * 1024 * 1024, "1-5MB"),
+    (20 * 1024 * 1024, "5-20MB"),
+    (float('inf'), ">20MB"),
+]
+
+# Stages a worker spends time on (queue wait and the Telegram download happen before it)
+WORKER_STAGES = [key for key, _ in METRIC_STAGES if key not in ('queue_wait', 'telegram_download', 'total')]
+
+_lock = threading.Lock()
+_averages = None   # bucket -> {'jobs': n, 'total': s, 'stages': {stage: s}}
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def size_bucket(file_size):
+    for bound, name in SIZE_BUCKETS:
+        if (file_size or 0) <= bound:
+            return name
+    return SIZE_BUCKETS[-1][1]
+
+def _load():
+    """Averages from ETA_FILE (loaded once, lock held)"""
+    global _averages
+    if _averages is None:
+        try:
+            with open(ETA_FILE, "r") as f:
+                _averages = json.load(f)
+        except (OSError, ValueError):
+            _averages = {}
+    return _averages
+
+def _save(averages):
+    tmp_path = ETA_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(averages, f, indent=2)
+    os.replace(tmp_path, ETA_FILE)
+
+def _ewma(previous, value):
+    return value if previous is None else previous + EWMA_ALPHA * (value - previous)
+
+def record_job(file_size, spans):
+    """Fold a finished job's stage spans (job_metrics record) into its size bucket"""
+    if not spans or 'total' not in spans:
+        return
+    bucket = size_bucket(file_size)
+    with _lock:
+        averages = _load()
+        entry = averages.setdefault(bucket, {'jobs': 0, 'total': None, 'stages': {}})
+        entry['jobs'] += 1
+        worker_total = sum(spans.get(stage, 0.0) for stage in WORKER_STAGES) or spans['total']
+        entry['total'] = round(_ewma(entry['total'], worker_total), 2)
+        # Stages a job skipped count as 0 so e.g. the similarity wait averages to its expected cost
+        for stage in WORKER_STAGES:
+            entry['stages'][stage] = round(_ewma(entry['stages'].get(stage), spans.get(stage, 0.0)), 2)
+        try:
+            _save(averages)
+        except OSError as e:
+            log(f"Queue ETA: could not save {ETA_FILE}: {e}")
+
+def _bucket_entry(file_size):
+    """Averages for a file size, falling back to the nearest bucket that has data"""
+    with _lock:
+        averages = _load()
+        names = [name for _, name in SIZE_BUCKETS]
+        wanted = names.index(size_bucket(file_size))
+        for distance in range(len(names)):
+            for index in (wanted - distance, wanted + distance):
+                if 0 <= index < len(names) and averages.get(names[index], {}).get('total'):
+                    entry = averages[names[index]]
+                    return {'total': entry['total'], 'stages': dict(entry['stages'])}
+    return None
+
+def expected_job_seconds(file_size):
+    """Expected worker time for a queued document"""
+    entry = _bucket_entry(file_size)
+    return entry['total'] if entry else DEFAULT_JOB_SECONDS
+
+def remaining_seconds(job, file_size=None):
+    """Expected time left for a running job (job_metrics.JobTimer)"""
+    entry = _bucket_entry(file_size)
+    elapsed = time.time() - job.started
+    if not entry or job.current not in WORKER_STAGES:
+        total = entry['total'] if entry else DEFAULT_JOB_SECONDS
+        return max(MIN_REMAINING_SECONDS, total - elapsed)
+
+    stages = entry['stages']
+    current = job.current
+    in_current = job.spans.get(current, 0.0) + (time.time() - job.current_started)
+    remaining = max(0.0, stages.get(current, 0.0) - in_current)
+    remaining += sum(stages.get(stage, 0.0) for stage in WORKER_STAGES[WORKER_STAGES.index(current) + 1:])
+    return max(MIN_REMAINING_SECONDS, remaining)
+
+def estimate_wait_seconds(running, waiting_ahead, workers=1):
+    """Seconds until a worker is free for a new document.
+
+    running: [(JobTimer, file_size)] jobs in flight; waiting_ahead: file sizes queued before it.
+    """
+    workers = max(1, workers)
+    busy = sorted(remaining_seconds(job, size) for job, size in running)
+    # Workers become free at these times; idle ones are free now
+    free_at = busy[:workers] + [0.0] * (workers - len(busy[:workers]))
+    for size in waiting_ahead:
+        free_at.sort()
+        free_at[0] += expected_job_seconds(size)
+    return min(free_at)
+
+def format_eta(seconds):
+    """'~7 minutes' / '~1 minute' / 'under a minute'"""
+    minutes = int(round(seconds / 60))
+    if minutes < 1:
+        return "under a minute"
+    return f"~{minutes} minute{'s' if minutes != 1 else ''}"
+
+def summary():
+    """Current averages per bucket (for the admin view)"""
+    with _lock:
+        return json.loads(json.dumps(_load()))
@@ -2,9 +2,12 @@ import json
 import os
 from datetime import datetime, timedelta
 
+from metrics_server import timed_storage
+
 COOLDOWN_FILE = "user_cooldowns.json"
 COOLDOWN_DURATION_MINUTES = 8  # 8 phút
 
+@timed_storage('read', 'cooldowns')
 def load_cooldowns():
     """Load user cooldown data from file"""
     try:
@@ -15,6 +18,7 @@ def load_cooldowns():
     except:
         return {}
 
+@timed_storage('write', 'cooldowns')
 def save_cooldowns(data):
     """Save user cooldown data to file"""
     with open(COOLDOWN_FILE, "w") as f:
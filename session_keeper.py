@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Saved Playwright storage state (cookies + local storage) of the logged-in session
+STORAGE_STATE_FILE = "cookies.json"
+# Turnitin session cookies (their expiry decides when the login must be refreshed)
+SESSION_COOKIES = ['session-id', 't', 'apt.sid', 'cwr_s']
+
+# Verify the login on an idle worker when it has not been confirmed for this long
+SESSION_CHECK_MINUTES = float(os.getenv("SESSION_CHECK_MINUTES", "20") or 20)
+# Refresh when a session cookie expires within this many minutes
+SESSION_REFRESH_MARGIN_MINUTES = float(os.getenv("SESSION_REFRESH_MARGIN_MINUTES", "30") or 30)
+# Seconds between keeper passes
+KEEPER_INTERVAL = 30
+
+_lock = threading.Lock()
+_state = {
+    'last_verified': None,   # time.time() of the last confirmed login (login, check or finished job)
+    'cookie_expiry': None,   # Earliest session cookie expiry in the saved storage state
+    'due': None,             # Why a check was requested ('idle' / 'expiring'), None if not due
+    'last_refresh': None,    # time.time() of the last login done by a check
+    'checks': 0,
+    'refreshes': 0,
+}
+_keeper_started = False
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def session_cookie_expiry(storage_data):
+    """Earliest expiry (epoch seconds) of the session cookies in a storage state; None for browser-session cookies"""
+    expiries = [
+        cookie['expires'] for cookie in storage_data.get('cookies', [])
+        if cookie.get('name') in SESSION_COOKIES and cookie.get('expires', -1) > 0
+    ]
+    return min(expiries) if expiries else None
+
+def write_storage_state(storage_data):
+    """Persist a storage state atomically (a crash never leaves a truncated cookies file)"""
+    now = time.time()
+    cookies = storage_data.get('cookies', [])
+    storage_data['cookies'] = [c for c in cookies if c.get('expires', -1) > now or c.get('expires', -1) == -1]
+    tmp_path = STORAGE_STATE_FILE + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(storage_data, f)
+    os.replace(tmp_path, STORAGE_STATE_FILE)
+    with _lock:
+        _state['cookie_expiry'] = session_cookie_expiry(storage_data)
+    return len(cookies), len(storage_data['cookies'])
+
+def mark_verified():
+    """The login was just confirmed to work"""
+    with _lock:
+        _state['last_verified'] = time.time()
+        _state['due'] = None
+
+def expiring_soon():
+    """A saved session cookie expires within the refresh margin"""
+    with _lock:
+        expiry = _state['cookie_expiry']
+    return bool(expiry) and expiry - time.time() < SESSION_REFRESH_MARGIN_MINUTES * 60
+
+def _due_reason():
+    with _lock:
+        if _state['last_verified'] is None:
+            return None   # No session yet: the worker logs in on its own
+        last_verified = _state['last_verified']
+        last_refresh = _state['last_refresh']
+    # Cookies that are short-lived even right after a login must not cause a login every pass
+    recently_refreshed = last_refresh and time.time() - last_refresh < SESSION_REFRESH_MARGIN_MINUTES * 60
+    if expiring_soon() and not recently_refreshed:
+        return 'expiring'
+    if time.time() - last_verified > SESSION_CHECK_MINUTES * 60:
+        return 'idle'
+    return None
+
+def check_due():
+    """Reason a login check was requested, or None (polled by the worker between jobs)"""
+    with _lock:
+        return _state['due']
+
+def check_finished(refreshed):
+    """The worker ran the requested check (refreshed: it had to log in again)"""
+    with _lock:
+        _state['checks'] += 1
+        if refreshed:
+            _state['refreshes'] += 1
+            _state['last_refresh'] = time.time()
+        _state['due'] = None
+
+def _keeper_loop():
+    while True:
+        time.sleep(KEEPER_INTERVAL)
+        try:
+            reason = _due_reason()
+            with _lock:
+                if reason and not _state['due']:
+                    _state['due'] = reason
+                    log(f"🔑 Session keeper: login check requested ({reason})")
+        except Exception as e:
+            log(f"Session keeper error: {e}")
+
+def start_session_keeper():
+    global _keeper_started
+    if _keeper_started:
+        return
+    _keeper_started = True
+    threading.Thread(target=_keeper_loop, name="session-keeper", daemon=True).start()
+    log(f"🔑 Session keeper running (check after {SESSION_CHECK_MINUTES:g} min idle, "
+        f"refresh {SESSION_REFRESH_MARGIN_MINUTES:g} min before cookie expiry)")
+
+def stats():
+    with _lock:
+        return dict(_state)
@@ -0,0 +1,88 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# The startup clock starts when main.py imports this module (its first import)
+_started = time.time()
+_lock = threading.Lock()
+_last_mark = _started
+_imports = []      # (label, seconds)
+_milestones = {}   # name -> seconds after start
+_expected = set()  # milestones the report waits for
+_skipped = {}      # expected milestone -> why it will not be reached
+_reported = False
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+def elapsed():
+    return time.time() - _started
+
+def mark_imports(label):
+    """Time since the previous mark goes to label (call after each group of top-level imports)"""
+    global _last_mark
+    now = time.time()
+    with _lock:
+        _imports.append((label, now - _last_mark))
+        _last_mark = now
+
+@contextmanager
+def timed_import(label):
+    """Time a lazy import (e.g. the Playwright stack on the worker thread)"""
+    started = time.time()
+    try:
+        yield
+    finally:
+        with _lock:
+            _imports.append((label, time.time() - started))
+
+def expect(*names):
+    """Milestones the startup report waits for"""
+    with _lock:
+        _expected.update(names)
+
+def _complete():
+    return all(name in _milestones or name in _skipped for name in _expected)
+
+def milestone(name):
+    """Record when a startup milestone is first reached; logs the report once every expected one is in"""
+    with _lock:
+        _milestones.setdefault(name, elapsed())
+        complete = _complete()
+    if complete:
+        report()
+
+def skip(name, reason):
+    """An expected milestone will not be reached (e.g. the browser stack failed to import)"""
+    with _lock:
+        _skipped.setdefault(name, reason)
+        complete = _complete()
+    if complete:
+        report()
+
+def report_by(seconds):
+    """Log the report after `seconds` even if some expected milestones are still missing"""
+    timer = threading.Timer(seconds, report)
+    timer.daemon = True
+    timer.start()
+
+def report():
+    """Log the startup breakdown (once)"""
+    global _reported
+    with _lock:
+        if _reported:
+            return
+        _reported = True
+        imports = list(_imports)
+        milestones = sorted(_milestones.items(), key=lambda item: item[1])
+        skipped = dict(_skipped)
+        missing = sorted(name for name in _expected if name not in _milestones and name not in _skipped)
+    parts = ", ".join(f"{label} {seconds:.2f}s" for label, seconds in imports)
+    log(f"⏱️ Startup imports: {sum(seconds for _, seconds in imports):.2f}s ({parts})")
+    log("⏱️ Startup milestones: " + ", ".join(f"{name} at {seconds:.1f}s" for name, seconds in milestones))
+    if skipped:
+        log("⏱️ Startup milestones skipped: " + ", ".join(f"{name} ({reason})" for name, reason in skipped.items()))
+    if missing:
+        log(f"⏱️ Startup milestones not reached after {elapsed():.0f}s: {', '.join(missing)}")
@@ -3,18 +3,369 @@ import time
 import threading
 import os
 from telebot import apihelper
-from telebot.types import InputFile
+from telebot.types import InputFile, InputMediaDocument
 import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 import logging
+import hashlib
+import json
+import queue
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
 
+# Chunk size for streaming Telegram file downloads to disk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Telegram Bot API limits: ~1 message/second per chat, ~30 messages/second overall
+PER_CHAT_MESSAGES_PER_SECOND = 1.0
+GLOBAL_MESSAGES_PER_SECOND = 30.0
+PER_CHAT_BURST = 3  # A few back-to-back replies in one chat are tolerated by Telegram
+
+# Outbound dispatcher defaults
+OUTBOUND_THREADS = 4
+OUTBOUND_MAX_ATTEMPTS = 3
+OUTBOUND_BASE_DELAY = 2  # seconds, doubled on each retry
+# Calls made from outbound jobs: one attempt each (the dispatcher does the retrying, with
+# fresh file handles) and refusals raised so they are not retried at all
+OUTBOUND_CALL = {'max_retries': 1, 'raise_refusals': True}
+
+# Bot API deleteMessages accepts at most 100 message IDs per call
+MAX_DELETE_BATCH = 100
+
+# Bot API sendMediaGroup accepts 2-10 items; captions are limited to 1024 characters
+MAX_MEDIA_GROUP = 10
+MAX_CAPTION_LENGTH = 1024
+
+def create_pooled_session(pool_connections=10, pool_maxsize=20, retry_on_429=True):
+    """Create a requests.Session with connection pooling and a retry strategy"""
+    session = requests.Session()
+    
+    # Connection pooling and retry strategy
+    status_forcelist = [500, 502, 503, 504]
+    if retry_on_429:
+        status_forcelist.insert(0, 429)
+    retry_strategy = Retry(
+        total=3,
+        status_forcelist=status_forcelist,
+        backoff_factor=1,
+        respect_retry_after_header=True
+    )
+    
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,  # Number of connection pools
+        pool_maxsize=pool_maxsize,          # Max connections per pool
+        max_retries=retry_strategy
+    )
+    
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def telegram_file_url(token, file_path):
+    """Build the download URL for a Telegram file (honors a custom apihelper.FILE_URL)"""
+    if apihelper.FILE_URL:
+        return apihelper.FILE_URL.format(token, file_path)
+    return f"https://api.telegram.org/file/bot{token}/{file_path}"
+
+def redact_token(text, token):
+    """Mask the bot token in text that may contain a Bot API URL (exception messages)"""
+    text = str(text)
+    return text.replace(token, "<TOKEN>") if token else text
+
+def describe_request_error(error):
+    """Exception type and HTTP status of a failed request - its message holds the URL, token included"""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return f"{type(error).__name__} (HTTP {response.status_code})"
+    return type(error).__name__
+
+def use_bot_api_server(base_url):
+    """Point telebot at another Bot API server (self-hosted telegram-bot-api, or a local stand-in).
+    
+    base_url is the server root, e.g. 'http://127.0.0.1:8081'.
+    """
+    base_url = base_url.rstrip('/')
+    apihelper.API_URL = base_url + "/bot{0}/{1}"
+    apihelper.FILE_URL = base_url + "/file/bot{0}/{1}"
+
+def stream_file_to_disk(session, url, dest_path, max_bytes=None, timeout=60, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Stream a remote file to dest_path chunk by chunk.
+    
+    The file is written to a temporary '.part' file next to dest_path and renamed
+    once complete, so a partially downloaded file never appears in the upload spool.
+    Memory use stays at one chunk regardless of file size.
+    
+    Returns:
+        tuple: (size_in_bytes: int, sha256_hex: str)
+    
+    Raises:
+        requests.exceptions.RequestException on HTTP errors
+        ValueError if the file grows beyond max_bytes
+    """
+    part_path = dest_path + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    
+    try:
+        with session.get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            with open(part_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError(f"File exceeds {max_bytes} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+        os.replace(part_path, dest_path)
+    except Exception:
+        try:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        except OSError:
+            pass
+        raise
+    
+    return size, digest.hexdigest()
+
+class TelegramRateLimiter:
+    """Per-chat and global send budgets for the Telegram Bot API.
+    
+    Uses a reservation scheme (GCRA): each caller reserves the earliest slot in its
+    chat budget and then in the global budget, holding the lock only for the
+    bookkeeping and sleeping OUTSIDE the lock. Different chats never wait on each
+    other except through the shared global budget.
+    """
+    
+    def __init__(self, per_chat_rate=PER_CHAT_MESSAGES_PER_SECOND,
+                 global_rate=GLOBAL_MESSAGES_PER_SECOND, per_chat_burst=PER_CHAT_BURST):
+        self.per_chat_interval = 1.0 / per_chat_rate
+        self.global_interval = 1.0 / global_rate
+        self.per_chat_tolerance = self.per_chat_interval * max(0, per_chat_burst - 1)
+        self.global_tolerance = 0.0
+        self._chat_tat = {}  # chat_id -> theoretical arrival time of next message
+        self._global_tat = 0.0
+        self._lock = threading.Lock()
+        
+        # Counters
+        self.throttle_waits = 0
+        self.throttle_wait_seconds = 0.0
+    
+    def _reserve(self, chat_id):
+        """Reserve the next slot for chat_id (None = global budget). Returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if chat_id is None:
+                tat, interval, tolerance = self._global_tat, self.global_interval, self.global_tolerance
+            else:
+                tat, interval, tolerance = self._chat_tat.get(chat_id, now), self.per_chat_interval, self.per_chat_tolerance
+            
+            send_at = max(now, tat - tolerance)
+            new_tat = max(tat, send_at) + interval
+            
+            if chat_id is None:
+                self._global_tat = new_tat
+            else:
+                self._chat_tat[chat_id] = new_tat
+                # Drop idle chats so the table stays small
+                if len(self._chat_tat) > 5000:
+                    self._chat_tat = {k: v for k, v in self._chat_tat.items() if v > now}
+            
+            wait = send_at - now
+            if wait > 0:
+                self.throttle_waits += 1
+                self.throttle_wait_seconds += wait
+            return wait
+    
+    def acquire(self, chat_id=None):
+        """Wait for a slot in the chat budget, then in the global budget. Returns seconds waited."""
+        waited = 0.0
+        # The chat slot is reserved first so a throttled chat never holds a future global slot
+        if chat_id is not None:
+            wait = self._reserve(chat_id)
+            if wait > 0:
+                time.sleep(wait)
+                waited += wait
+        wait = self._reserve(None)
+        if wait > 0:
+            time.sleep(wait)
+            waited += wait
+        return waited
+    
+    def penalize(self, chat_id, retry_after):
+        """Push a chat's budget forward after Telegram answered 429 with retry_after"""
+        with self._lock:
+            until = time.monotonic() + retry_after
+            if chat_id is not None:
+                self._chat_tat[chat_id] = max(self._chat_tat.get(chat_id, 0.0), until)
+            else:
+                self._global_tat = max(self._global_tat, until)
+
+class TelegramRefused(Exception):
+    """Telegram rejected the call itself (400/403/404: blocked bot, bad HTML, ...) - retrying cannot help"""
+
+    def __init__(self, error_code, description):
+        super().__init__(f"Telegram API error {error_code}: {description}")
+        self.error_code = error_code
+
+class OutboundDispatcher:
+    """Non-blocking outbound queue for Telegram calls.
+    
+    Worker threads enqueue calls and return immediately. Calls for the same chat run
+    strictly in submission order (one at a time per chat); different chats are served
+    round-robin by a small pool of sender threads. A call that raises is retried with
+    exponential backoff, except TelegramRefused, which fails at once so the chat's
+    later calls are not held up. flush() waits until a chat (or everything) has been sent.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, num_threads=OUTBOUND_THREADS, max_attempts=OUTBOUND_MAX_ATTEMPTS,
+                 base_delay=OUTBOUND_BASE_DELAY, logger=None):
+        self.num_threads = num_threads
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.logger = logger or logging.getLogger('telegram_bot')
+        
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = {}        # chat_id -> deque of jobs
+        self._scheduled = set()   # chats that have a token in _ready or are being sent
+        self._unfinished = {}     # chat_id -> jobs not yet completed
+        self._unfinished_total = 0
+        self._ready = queue.Queue()
+        self._threads = []
+        
+        # Counters
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+    
+    def start(self):
+        """Start sender threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.num_threads):
+                t = threading.Thread(target=self._sender_loop, daemon=True, name=f"TelegramOut-{i + 1}")
+                t.start()
+                self._threads.append(t)
+    
+    def submit(self, chat_id, fn, on_sent=None, description=""):
+        """Queue fn() for chat_id. Returns a Future with fn's result.
+        
+        on_sent(result) is called from the sender thread after a successful call.
+        """
+        future = Future()
+        job = {'fn': fn, 'future': future, 'on_sent': on_sent, 'description': description}
+        with self._lock:
+            self._pending.setdefault(chat_id, deque()).append(job)
+            self._unfinished[chat_id] = self._unfinished.get(chat_id, 0) + 1
+            self._unfinished_total += 1
+            if chat_id not in self._scheduled:
+                self._scheduled.add(chat_id)
+                self._ready.put(chat_id)
+        return future
+    
+    def flush(self, chat_id=None, timeout=None):
+        """Block until queued calls for chat_id (or all chats) are done. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while (self._unfinished.get(chat_id, 0) if chat_id is not None else self._unfinished_total) > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+    
+    def pending_count(self, chat_id=None):
+        """Number of queued or in-flight calls"""
+        with self._lock:
+            if chat_id is not None:
+                return self._unfinished.get(chat_id, 0)
+            return self._unfinished_total
+    
+    def stop(self, timeout=10):
+        """Flush outstanding calls (bounded by timeout) and stop sender threads"""
+        flushed = self.flush(timeout=timeout)
+        for _ in self._threads:
+            self._ready.put(self._STOP)
+        return flushed
+    
+    def _sender_loop(self):
+        """Take one job from the next ready chat, send it, re-queue the chat if more are waiting"""
+        while True:
+            chat_id = self._ready.get()
+            if chat_id is self._STOP:
+                return
+            
+            with self._lock:
+                jobs = self._pending.get(chat_id)
+                job = jobs.popleft() if jobs else None
+            
+            if job is not None:
+                self._run_job(chat_id, job)
+            
+            with self._idle:
+                if job is not None:
+                    self._unfinished[chat_id] -= 1
+                    if self._unfinished[chat_id] <= 0:
+                        del self._unfinished[chat_id]
+                    self._unfinished_total -= 1
+                    self._idle.notify_all()
+                if self._pending.get(chat_id):
+                    self._ready.put(chat_id)
+                else:
+                    self._pending.pop(chat_id, None)
+                    self._scheduled.discard(chat_id)
+    
+    def _run_job(self, chat_id, job):
+        """Run a job with retries and exponential backoff"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = job['fn']()
+            except Exception as e:
+                if attempt < self.max_attempts and not isinstance(e, TelegramRefused):
+                    delay = self.base_delay * (2 ** (attempt - 1))
+                    self.retried += 1
+                    self.logger.warning(f"Outbound {job['description'] or 'call'} to {chat_id} failed (attempt {attempt}): {e}; retrying in {delay}s")
+                    time.sleep(delay)
+                    continue
+                self.failed += 1
+                self.logger.error(f"Outbound {job['description'] or 'call'} to {chat_id} failed after {attempt} attempts: {e}")
+                job['future'].set_exception(e)
+                return
+            
+            self.sent += 1
+            if result is not None and job['on_sent']:
+                try:
+                    job['on_sent'](result)
+                except Exception as cb_err:
+                    self.logger.warning(f"Outbound on_sent callback error: {cb_err}")
+            job['future'].set_result(result)
+            return
+
 class OptimizedTelegramBot:
-    def __init__(self, token, parse_mode='HTML'):
+    """Telegram transport used by the bot.
+    
+    Wraps telebot.TeleBot with a pooled requests.Session, retry-aware error handling
+    and Telegram rate budgets. Exposes the TeleBot surface used across the code base
+    (message_handler, send_message, reply_to, edit_message_text, ...); anything not
+    overridden here is delegated to the underlying TeleBot.
+    """
+    
+    def __init__(self, token, parse_mode='HTML', num_threads=2,
+                 per_chat_rate=PER_CHAT_MESSAGES_PER_SECOND, global_rate=GLOBAL_MESSAGES_PER_SECOND,
+                 outbound_threads=OUTBOUND_THREADS, threaded=True):
         self.token = token
         self.parse_mode = parse_mode
         
+        # Setup logging first - later setup steps log warnings
+        self._setup_logging()
+        
         # Configure connection pooling and retry strategy
         self._setup_session()
         
@@ -22,41 +373,31 @@ class OptimizedTelegramBot:
         self.bot = telebot.TeleBot(
             token,
             parse_mode=parse_mode,
-            threaded=False,  # Better control over threading
-            skip_pending=True,  # Skip old updates on startup
-            num_threads=2  # Limit concurrent threads
+            threaded=threaded,  # Handlers run in a small pool so uploads don't block polling
+            num_threads=num_threads
         )
         
         # Apply our optimized session to the bot's internal mechanisms
         self._apply_session_optimization()
         
-        # Rate limiting
-        self.last_request_time = {}
-        self.request_lock = threading.Lock()
+        # Rate limiting (per-chat + global budgets, no global lock held while sleeping)
+        self.rate_limiter = TelegramRateLimiter(per_chat_rate=per_chat_rate, global_rate=global_rate)
         
-        # Setup logging
-        self._setup_logging()
+        # Non-blocking outbound queue used by the document workers
+        self.outbound = OutboundDispatcher(num_threads=outbound_threads, logger=self.logger)
+        self.outbound.start()
+        
+        # API call counters
+        self._stats_lock = threading.Lock()
+        self.api_calls = {}
+        self.retries_429 = 0
+        self.api_errors = 0
+        self.started_at = datetime.now()
         
     def _setup_session(self):
         """Setup optimized HTTP session with connection pooling"""
-        self.session = requests.Session()
-        
-        # Connection pooling and retry strategy
-        retry_strategy = Retry(
-            total=3,
-            status_forcelist=[429, 500, 502, 503, 504],
-            backoff_factor=1,
-            respect_retry_after_header=True
-        )
-        
-        adapter = HTTPAdapter(
-            pool_connections=10,  # Number of connection pools
-            pool_maxsize=20,     # Max connections per pool
-            max_retries=retry_strategy
-        )
-        
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        # 429s are handled (and counted) by _handle_telegram_error, not by urllib3
+        self.session = create_pooled_session(retry_on_429=False)
         
         # Set default timeout
         self.session.timeout = 30
@@ -70,15 +411,8 @@ class OptimizedTelegramBot:
             # For older versions, replace the global apihelper session
             elif hasattr(apihelper, 'session'):
                 apihelper.session = self.session
-            # As fallback, monkey patch the requests module used by apihelper
             else:
-                # Store original get/post methods
-                original_get = requests.get
-                original_post = requests.post
-                
-                # Replace with session methods
-                requests.get = self.session.get
-                requests.post = self.session.post
+                self.logger.warning("telebot exposes no session hook; using its default HTTP session")
                 
         except Exception as e:
             self.logger.warning(f"Could not optimize session: {e}")
@@ -93,34 +427,44 @@ class OptimizedTelegramBot:
             self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
         
+    def _count_call(self, method_name):
+        """Count an outgoing API call"""
+        with self._stats_lock:
+            self.api_calls[method_name] = self.api_calls.get(method_name, 0) + 1
+        
     def _rate_limit_check(self, chat_id, method_name):
-        """Check and enforce rate limits per chat"""
-        with self.request_lock:
-            current_time = time.time()
-            key = f"{chat_id}_{method_name}"
-            
-            if key in self.last_request_time:
-                time_diff = current_time - self.last_request_time[key]
-                if time_diff < 0.05:  # 50ms minimum between same operations
-                    sleep_time = 0.05 - time_diff
-                    time.sleep(sleep_time)
-            
-            self.last_request_time[key] = current_time
+        """Wait for a send slot within the per-chat and global budgets"""
+        self.rate_limiter.acquire(chat_id)
     
-    def _handle_telegram_error(self, func, *args, max_retries=3, **kwargs):
-        """Generic error handler with retry logic for Telegram API calls"""
+    def _handle_telegram_error(self, func, *args, max_retries=3, raise_refusals=False, **kwargs):
+        """Generic error handler with retry logic for Telegram API calls.
+        
+        Failures return None; with raise_refusals, a 400/403/404 raises TelegramRefused
+        instead so the outbound dispatcher can tell it from a transient failure.
+        """
+        method_name = getattr(func, '__name__', 'unknown')
+        chat_id = kwargs.get('chat_id')
+        
         for attempt in range(max_retries):
             try:
+                self._count_call(method_name)
                 return func(*args, **kwargs)
             
             except telebot.apihelper.ApiTelegramException as e:
                 if e.error_code == 429:  # Too Many Requests
-                    retry_after = int(e.result_json.get('parameters', {}).get('retry_after', 1))
-                    self.logger.warning(f"Rate limited, waiting {retry_after} seconds")
+                    retry_after = int((e.result_json or {}).get('parameters', {}).get('retry_after', 1))
+                    with self._stats_lock:
+                        self.retries_429 += 1
+                    self.rate_limiter.penalize(chat_id, retry_after)
+                    self.logger.warning(f"Rate limited on {method_name} (chat {chat_id}), waiting {retry_after} seconds")
                     time.sleep(retry_after)
                     continue
                 elif e.error_code in [400, 403, 404]:  # Client errors - don't retry
+                    with self._stats_lock:
+                        self.api_errors += 1
                     self.logger.error(f"Telegram API error {e.error_code}: {e.description}")
+                    if raise_refusals:
+                        raise TelegramRefused(e.error_code, e.description)
                     return None
                 elif attempt < max_retries - 1:  # Server errors - retry
                     wait_time = (attempt + 1) * 2  # Exponential backoff
@@ -128,6 +472,8 @@ class OptimizedTelegramBot:
                     time.sleep(wait_time)
                     continue
                 else:
+                    with self._stats_lock:
+                        self.api_errors += 1
                     self.logger.error(f"Telegram API failed after {max_retries} attempts: {e.description}")
                     return None
             
@@ -138,6 +484,8 @@ class OptimizedTelegramBot:
                     time.sleep(wait_time)
                     continue
                 else:
+                    with self._stats_lock:
+                        self.api_errors += 1
                     self.logger.error("Request timed out after all retries")
                     return None
             
@@ -148,47 +496,52 @@ class OptimizedTelegramBot:
                     time.sleep(wait_time)
                     continue
                 else:
+                    with self._stats_lock:
+                        self.api_errors += 1
                     self.logger.error("Connection failed after all retries")
                     return None
             
             except Exception as e:
+                with self._stats_lock:
+                    self.api_errors += 1
                 self.logger.error(f"Unexpected error: {e}")
                 return None
         
         return None
     
-    def send_message(self, chat_id, text, reply_markup=None, disable_web_page_preview=True):
+    def send_message(self, chat_id, text, reply_markup=None, disable_web_page_preview=True, **kwargs):
         """Optimized send_message with error handling"""
-        self._rate_limit_check(chat_id, 'send_message')
-        
         # Split long messages to avoid Telegram limits
         if len(text) > 4096:
             messages = []
             for i in range(0, len(text), 4000):
                 chunk = text[i:i+4000]
+                self._rate_limit_check(chat_id, 'send_message')
                 result = self._handle_telegram_error(
                     self.bot.send_message,
                     chat_id=chat_id,
                     text=chunk,
                     reply_markup=reply_markup if i == 0 else None,
-                    disable_web_page_preview=disable_web_page_preview
+                    disable_web_page_preview=disable_web_page_preview,
+                    **kwargs
                 )
                 if result:
                     messages.append(result)
-            return messages
+            # Callers use .message_id - return the first chunk
+            return messages[0] if messages else None
         
+        self._rate_limit_check(chat_id, 'send_message')
         return self._handle_telegram_error(
             self.bot.send_message,
             chat_id=chat_id,
             text=text,
             reply_markup=reply_markup,
-            disable_web_page_preview=disable_web_page_preview
+            disable_web_page_preview=disable_web_page_preview,
+            **kwargs
         )
     
-    def send_document(self, chat_id, document, caption=None, timeout=60):
+    def send_document(self, chat_id, document, caption=None, timeout=60, **kwargs):
         """Optimized send_document with chunked upload for large files"""
-        self._rate_limit_check(chat_id, 'send_document')
-        
         try:
             # Check file size
             if hasattr(document, 'name'):
@@ -197,23 +550,37 @@ class OptimizedTelegramBot:
                     self.logger.error(f"File too large: {file_size} bytes")
                     return None
             
-            # Use longer timeout for file uploads
-            original_timeout = getattr(self.bot, 'timeout', 30)
+            self._rate_limit_check(chat_id, 'send_document')
             
             result = self._handle_telegram_error(
                 self.bot.send_document,
                 chat_id=chat_id,
                 document=document,
                 caption=caption,
-                timeout=timeout
+                timeout=timeout,
+                **kwargs
             )
             
             return result
             
+        except TelegramRefused:
+            raise
         except Exception as e:
             self.logger.error(f"Document upload failed: {e}")
             return None
     
+    def send_media_group(self, chat_id, media, timeout=120, **kwargs):
+        """Send several documents as one album (single sendMediaGroup upload)"""
+        self._rate_limit_check(chat_id, 'send_media_group')
+        
+        return self._handle_telegram_error(
+            self.bot.send_media_group,
+            chat_id=chat_id,
+            media=media,
+            timeout=timeout,
+            **kwargs
+        )
+    
     def delete_message(self, chat_id, message_id):
         """Optimized delete_message with proper error handling"""
         self._rate_limit_check(chat_id, 'delete_message')
@@ -225,17 +592,46 @@ class OptimizedTelegramBot:
             max_retries=1  # Don't retry deletions aggressively
         )
     
-    def delete_messages_batch(self, chat_id, message_ids, delay=0.1):
-        """Delete multiple messages with rate limiting"""
-        results = []
-        for message_id in message_ids:
-            result = self.delete_message(chat_id, message_id)
-            results.append(result)
-            if delay > 0:
-                time.sleep(delay)
-        return results
-    
-    def edit_message_text(self, text, chat_id, message_id, reply_markup=None):
+    def delete_messages(self, chat_id, message_ids):
+        """Bulk-delete up to MAX_DELETE_BATCH messages with one deleteMessages call"""
+        if hasattr(self.bot, 'delete_messages'):
+            return self.bot.delete_messages(chat_id, message_ids)
+        # Older pyTelegramBotAPI without the wrapper - call the Bot API method directly
+        return apihelper._make_request(
+            self.token,
+            'deleteMessages',
+            params={'chat_id': chat_id, 'message_ids': json.dumps(message_ids)},
+            method='post'
+        )
+    
+    def delete_messages_batch(self, chat_id, message_ids):
+        """Delete many messages using deleteMessages (one request per 100 IDs).
+        
+        Falls back to per-message deletes for a chunk only if the bulk call fails.
+        Returns True if every chunk was deleted in bulk.
+        """
+        # Drop empties/duplicates, keep order
+        ids = list(dict.fromkeys(int(m) for m in message_ids if m))
+        all_ok = True
+        
+        for start in range(0, len(ids), MAX_DELETE_BATCH):
+            chunk = ids[start:start + MAX_DELETE_BATCH]
+            self._rate_limit_check(chat_id, 'delete_messages')
+            result = self._handle_telegram_error(
+                self.delete_messages,
+                chat_id=chat_id,
+                message_ids=chunk,
+                max_retries=1  # Don't retry deletions aggressively
+            )
+            if result is None:
+                all_ok = False
+                self.logger.warning(f"Bulk delete failed for chat {chat_id}, deleting {len(chunk)} message(s) one by one")
+                for message_id in chunk:
+                    self.delete_message(chat_id, message_id)
+        
+        return all_ok
+    
+    def edit_message_text(self, text, chat_id, message_id, reply_markup=None, **kwargs):
         """Optimized edit_message_text"""
         self._rate_limit_check(chat_id, 'edit_message_text')
         
@@ -248,7 +644,8 @@ class OptimizedTelegramBot:
             text=text,
             chat_id=chat_id,
             message_id=message_id,
-            reply_markup=reply_markup
+            reply_markup=reply_markup,
+            **kwargs
         )
     
     def edit_message_reply_markup(self, chat_id, message_id, reply_markup=None):
@@ -269,33 +666,150 @@ class OptimizedTelegramBot:
     def download_file(self, file_path, timeout=60):
         """Optimized download_file with chunked download"""
         try:
-            url = f"https://api.telegram.org/file/bot{self.token}/{file_path}"
+            url = telegram_file_url(self.token, file_path)
             
             response = self.session.get(url, timeout=timeout, stream=True)
             response.raise_for_status()
             
-            content = b''
-            for chunk in response.iter_content(chunk_size=8192):
+            chunks = []
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                 if chunk:
-                    content += chunk
+                    chunks.append(chunk)
             
-            return content
+            return b''.join(chunks)
             
         except requests.exceptions.Timeout:
             self.logger.error("File download timed out")
             return None
         except requests.exceptions.RequestException as e:
+            self.logger.error(f"File download failed: {describe_request_error(e)}")
+            return None
+    
+    def download_file_to_path(self, file_path, dest_path, max_bytes=None, timeout=60):
+        """Stream a Telegram file straight to dest_path.
+        
+        Returns:
+            tuple: (size_in_bytes, sha256_hex) or None if the download failed
+        """
+        try:
+            return stream_file_to_disk(
+                self.session,
+                telegram_file_url(self.token, file_path),
+                dest_path,
+                max_bytes=max_bytes,
+                timeout=timeout
+            )
+        except requests.exceptions.Timeout:
+            self.logger.error("File download timed out")
+            return None
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"File download failed: {describe_request_error(e)}")
+            return None
+        except (ValueError, OSError) as e:
             self.logger.error(f"File download failed: {e}")
             return None
     
-    def reply_to(self, message, text, reply_markup=None):
+    def redact(self, text):
+        """Text safe to log or show: the bot token masked"""
+        return redact_token(text, self.token)
+    
+    def send_message_async(self, chat_id, text, on_sent=None, **kwargs):
+        """Queue send_message without blocking the caller. Returns a Future."""
+        def _send():
+            result = self.send_message(chat_id, text, **OUTBOUND_CALL, **kwargs)
+            if result is None:
+                # Transient failure (timeout, 5xx, 429); raise so the dispatcher retries
+                raise Exception("Telegram did not accept the message")
+            return result
+        
+        return self.outbound.submit(chat_id, _send, on_sent=on_sent, description="send_message")
+    
+    def send_document_async(self, chat_id, file_path, caption=None, on_sent=None, **kwargs):
+        """Queue a document upload from file_path. Returns a Future.
+        
+        The file is opened by the sender thread, so it must exist until the future is done.
+        """
+        def _send():
+            with open(file_path, 'rb') as f:
+                result = self.send_document(chat_id, f, caption=caption, **OUTBOUND_CALL, **kwargs)
+            if result is None:
+                # Raise so the dispatcher retries the upload with backoff (the file is reopened)
+                raise Exception(f"Telegram did not accept {os.path.basename(file_path)}")
+            return result
+        
+        return self.outbound.submit(chat_id, _send, on_sent=on_sent, description="send_document")
+    
+    def send_document_group_async(self, chat_id, documents, parse_mode='HTML', on_sent=None, **kwargs):
+        """Queue several files as one media-group upload. Returns a Future.
+        
+        Args:
+            documents: List of (file_path, caption) tuples, 2 to MAX_MEDIA_GROUP items
+            
+        The files are opened by the sender thread, so they must exist until the future is done.
+        """
+        if not 2 <= len(documents) <= MAX_MEDIA_GROUP:
+            raise ValueError(f"A media group needs 2-{MAX_MEDIA_GROUP} documents, got {len(documents)}")
+        
+        def _send():
+            files = []
+            try:
+                media = []
+                for file_path, caption in documents:
+                    f = open(file_path, 'rb')
+                    files.append(f)
+                    if caption and len(caption) > MAX_CAPTION_LENGTH:
+                        caption = caption[:MAX_CAPTION_LENGTH - 3] + "..."
+                    media.append(InputMediaDocument(f, caption=caption, parse_mode=parse_mode))
+                result = self.send_media_group(chat_id, media, **OUTBOUND_CALL, **kwargs)
+            finally:
+                for f in files:
+                    f.close()
+            if result is None:
+                # Raise so the dispatcher retries the upload with backoff (the files are reopened)
+                raise Exception(f"Telegram did not accept the media group ({len(documents)} documents)")
+            return result
+        
+        return self.outbound.submit(chat_id, _send, on_sent=on_sent, description="send_media_group")
+    
+    def delete_message_async(self, chat_id, message_id):
+        """Queue delete_message without blocking the caller. Returns a Future."""
+        return self.outbound.submit(
+            chat_id,
+            lambda: self.delete_message(chat_id, message_id),
+            description="delete_message"
+        )
+    
+    def delete_messages_async(self, chat_id, message_ids):
+        """Queue a bulk delete without blocking the caller. Returns a Future."""
+        message_ids = list(message_ids)
+        return self.outbound.submit(
+            chat_id,
+            lambda: self.delete_messages_batch(chat_id, message_ids),
+            description="delete_messages"
+        )
+    
+    def flush_outbound(self, chat_id=None, timeout=None):
+        """Wait until queued outbound calls for chat_id (or all chats) are sent"""
+        return self.outbound.flush(chat_id=chat_id, timeout=timeout)
+    
+    def reply_to(self, message, text, reply_markup=None, **kwargs):
         """Optimized reply_to"""
         return self.send_message(
             message.chat.id, 
             text, 
-            reply_markup=reply_markup
+            reply_markup=reply_markup,
+            reply_to_message_id=message.message_id,
+            **kwargs
         )
     
+    def message_handler(self, **kwargs):
+        """Decorator registering a message handler on the underlying TeleBot"""
+        return self.bot.message_handler(**kwargs)
+    
+    def callback_query_handler(self, **kwargs):
+        """Decorator registering a callback query handler on the underlying TeleBot"""
+        return self.bot.callback_query_handler(**kwargs)
+    
     def register_message_handler(self, func, **kwargs):
         """Register message handlers"""
         # Apply the decorator to the function and register it
@@ -307,24 +821,30 @@ class OptimizedTelegramBot:
         return self.bot.callback_query_handler(**kwargs)(func)
     
     def infinity_polling(self, **kwargs):
-        """Start infinity polling with error recovery"""
+        """Start infinity polling with error recovery (returns once stop_polling is called)"""
+        kwargs.setdefault('timeout', 60)
+        kwargs.setdefault('long_polling_timeout', 60)
         while True:
             try:
                 self.logger.info("Starting Telegram polling...")
-                self.bot.infinity_polling(
-                    timeout=kwargs.get('timeout', 60),
-                    long_polling_timeout=kwargs.get('long_polling_timeout', 60),
-                    **kwargs
-                )
+                self.bot.infinity_polling(**kwargs)
+                return
             except Exception as e:
                 self.logger.error(f"Polling error: {e}")
                 self.logger.info("Restarting polling in 5 seconds...")
                 time.sleep(5)
     
     def stop_polling(self):
-        """Stop polling gracefully"""
+        """Stop receiving updates; sending keeps working until stop_sending()"""
         try:
             self.bot.stop_polling()
+        except Exception as e:
+            self.logger.error(f"Error stopping polling: {e}")
+    
+    def stop_sending(self, outbound_timeout=10):
+        """Last step of a shutdown: flush queued outbound messages, stop the senders, close the session"""
+        try:
+            self.outbound.stop(timeout=outbound_timeout)
             self.session.close()
             self.logger.info("Bot stopped gracefully")
         except Exception as e:
@@ -332,8 +852,28 @@ class OptimizedTelegramBot:
     
     def get_stats(self):
         """Get connection and request statistics"""
+        with self._stats_lock:
+            api_calls = dict(self.api_calls)
+            retries_429 = self.retries_429
+            api_errors = self.api_errors
         return {
             'session_active': self.session is not None,
-            'total_requests': len(self.last_request_time),
-            'last_request_times': dict(list(self.last_request_time.items())[-5:])  # Last 5 requests
-        }
\ No newline at end of file
+            'total_requests': sum(api_calls.values()),
+            'api_calls': api_calls,
+            'retries_429': retries_429,
+            'api_errors': api_errors,
+            'throttle_waits': self.rate_limiter.throttle_waits,
+            'throttle_wait_seconds': round(self.rate_limiter.throttle_wait_seconds, 2),
+            'outbound_pending': self.outbound.pending_count(),
+            'outbound_sent': self.outbound.sent,
+            'outbound_failed': self.outbound.failed,
+            'outbound_retried': self.outbound.retried,
+            'uptime_seconds': int((datetime.now() - self.started_at).total_seconds())
+        }
+    
+    def __getattr__(self, name):
+        """Delegate everything not wrapped here to the underlying TeleBot"""
+        # Only called when normal lookup fails; guard against recursion during __init__
+        if name == 'bot':
+            raise AttributeError(name)
+        return getattr(self.bot, name)
\ No newline at end of file
@@ -0,0 +1,228 @@
+import hmac
+import json
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from telebot.types import Update
+
+# Defaults for webhook mode (overridable via .env, see main.py)
+DEFAULT_LISTEN = "127.0.0.1"  # Behind a reverse proxy (nginx/caddy) terminating TLS
+DEFAULT_PORT = 8443
+DEFAULT_WORKERS = 8
+DEFAULT_PATH = "/telegram/webhook"
+
+# Telegram sends one update per request; anything larger is not an update
+MAX_BODY_BYTES = 1024 * 1024
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def log(message: str):
+    """Log a message with a timestamp to the terminal."""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+class _BodyReader:
+    """rfile wrapper that remembers how much of the request body was read"""
+
+    def __init__(self, rfile):
+        self.rfile = rfile
+        self.consumed = 0
+
+    def read(self, size):
+        data = self.rfile.read(size)
+        self.consumed += len(data)
+        return data
+
+    def finish(self, content_length):
+        """Read what is left of the body (up to MAX_BODY_BYTES). False if the connection must be closed."""
+        try:
+            length = int(content_length or 0)
+        except ValueError:
+            return False
+        if length < 0 or length > MAX_BODY_BYTES:
+            return self.consumed == length
+        if self.consumed < length:
+            self.read(length - self.consumed)
+        return self.consumed >= length
+
+class WebhookServer:
+    """Receives Telegram updates over HTTP and runs the bot handlers on a bounded pool.
+
+    Each POST is acknowledged as soon as the update is parsed and handed to the pool,
+    so Telegram never waits on a handler. When every worker is busy and the backlog is
+    full, the server answers 503 and Telegram redelivers the update later.
+    """
+
+    def __init__(self, bot, listen=DEFAULT_LISTEN, port=DEFAULT_PORT, path=DEFAULT_PATH,
+                 secret_token=None, workers=DEFAULT_WORKERS, backlog=None):
+        self.bot = bot
+        self.listen = listen
+        self.port = port
+        self.path = path or DEFAULT_PATH
+        self.secret_token = secret_token
+        self.workers = workers
+
+        # In-flight updates: running + waiting for a worker
+        self._slots = threading.BoundedSemaphore(backlog or workers * 4)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webhook")
+        self._httpd = None
+
+        # Counters (read by get_stats)
+        self._stats_lock = threading.Lock()
+        self.received = 0
+        self.rejected = 0
+        self.handler_errors = 0
+
+    def _make_handler(self):
+        """Build the request handler class bound to this server"""
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                # Access logs would print one line per update
+                pass
+
+            def _reply(self, status, body=b""):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                if self.close_connection:
+                    self.send_header("Connection", "close")
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                # Health check for the reverse proxy / load balancer
+                if self.path.rstrip('/') == server.path.rstrip('/') + "/health":
+                    self._reply(200, b"ok")
+                else:
+                    self._reply(404)
+
+            def do_POST(self):
+                body = _BodyReader(self.rfile)
+                status = server.handle_post(self.path, self.headers, body)
+                # An unread body would be parsed as the next request on this keep-alive connection
+                if not body.finish(self.headers.get("Content-Length")):
+                    self.close_connection = True
+                self._reply(status)
+
+        return _Handler
+
+    def handle_post(self, path, headers, rfile):
+        """Validate one webhook request and queue its update. Returns the HTTP status."""
+        if path.split('?')[0].rstrip('/') != self.path.rstrip('/'):
+            return 404
+
+        if self.secret_token:
+            received_token = headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received_token, self.secret_token):
+                with self._stats_lock:
+                    self.rejected += 1
+                return 403
+
+        try:
+            length = int(headers.get("Content-Length", 0))
+        except ValueError:
+            return 400
+        if length <= 0 or length > MAX_BODY_BYTES:
+            return 413 if length > MAX_BODY_BYTES else 400
+
+        try:
+            update = Update.de_json(json.loads(rfile.read(length).decode("utf-8")))
+        except Exception as e:
+            log(f"Webhook: invalid update payload: {e}")
+            return 400
+
+        if not self._slots.acquire(blocking=False):
+            # Saturated - let Telegram retry instead of queueing without bound
+            with self._stats_lock:
+                self.rejected += 1
+            return 503
+
+        with self._stats_lock:
+            self.received += 1
+        self._executor.submit(self._process_update, update)
+        return 200
+
+    def _process_update(self, update):
+        """Run the registered handlers for one update (on a pool thread)"""
+        try:
+            self.bot.process_new_updates([update])
+        except Exception as e:
+            with self._stats_lock:
+                self.handler_errors += 1
+            log(f"Webhook: handler error for update {getattr(update, 'update_id', '?')}: {e}")
+        finally:
+            self._slots.release()
+
+    def start(self):
+        """Bind the HTTP server (does not block)"""
+        self._httpd = ThreadingHTTPServer((self.listen, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        log(f"🌐 Webhook server listening on http://{self.listen}:{self.port}{self.path} ({self.workers} workers)")
+        return self
+
+    def serve_forever(self):
+        """Serve until shutdown() is called"""
+        if self._httpd is None:
+            self.start()
+        self._httpd.serve_forever(poll_interval=0.5)
+
+    def shutdown(self, wait=True):
+        """Stop accepting updates and wait for running handlers"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        self._executor.shutdown(wait=wait)
+        log("Webhook server stopped")
+
+    def get_stats(self):
+        """Counters for the admin stats view"""
+        with self._stats_lock:
+            return {
+                'received': self.received,
+                'rejected': self.rejected,
+                'handler_errors': self.handler_errors,
+            }
+
+def run_webhook(bot, webhook_url, listen=DEFAULT_LISTEN, port=DEFAULT_PORT, secret_token=None,
+                workers=DEFAULT_WORKERS, drop_pending_updates=False):
+    """Register webhook_url with Telegram and serve updates until interrupted.
+
+    Args:
+        bot: OptimizedTelegramBot (created with threaded=False so handlers run on our pool)
+        webhook_url: Public HTTPS URL Telegram posts to; its path is served locally
+        listen, port: Local bind address (the reverse proxy forwards to it)
+        secret_token: Shared secret checked on every request; generated if not given
+        workers: Handler pool size (also sent to Telegram as max_connections)
+    """
+    if not secret_token:
+        # Processes sharing one endpoint must share the secret - set WEBHOOK_SECRET for that
+        secret_token = secrets.token_urlsafe(32)
+        log("⚠️ WEBHOOK_SECRET not set - using a random secret for this process")
+
+    path = urlparse(webhook_url).path or DEFAULT_PATH
+    server = WebhookServer(bot, listen=listen, port=port, path=path,
+                           secret_token=secret_token, workers=workers).start()
+
+    registered = bot.set_webhook(
+        url=webhook_url,
+        secret_token=secret_token,
+        max_connections=max(1, min(100, workers)),
+        drop_pending_updates=drop_pending_updates
+    )
+    if not registered:
+        server.shutdown(wait=False)
+        raise RuntimeError(f"Telegram rejected webhook URL {webhook_url}")
+    log(f"✅ Webhook registered: {webhook_url}")
+
+    try:
+        server.serve_forever()
+    finally:
+        server.shutdown()
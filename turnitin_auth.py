@@ -7,6 +7,13 @@ import threading
 from datetime import datetime
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+from page_recorder import attach_recorder
+from network_timing import attach_network_timing
+from diagnostics import attach_diagnostics
+from metrics_server import BROWSER_RECYCLES, BROWSER_STANDBY_EVENTS, LOGINS, LOGIN_SECONDS
+from browser_registry import register_new, release as release_browser_pids, set_role, snapshot_browsers, snapshot_children, tree_rss
+import bot_state
+from session_keeper import STORAGE_STATE_FILE, mark_verified as mark_session_verified, write_storage_state
 
 # Stealth mode to bypass bot detection
 try:
@@ -22,12 +29,26 @@ load_dotenv()
 TURNITIN_EMAIL = os.getenv("TURNITIN_EMAIL")
 TURNITIN_PASSWORD = os.getenv("TURNITIN_PASSWORD")
 
+# Site root - override to run against a local stand-in (bench/mock_turnitin.py)
+TURNITIN_BASE_URL = os.getenv("TURNITIN_BASE_URL", "https://www.turnitin.com").rstrip('/')
+
 # Webshare API configuration
 WEBSHARE_API_TOKEN = os.getenv("WEBSHARE_API_TOKEN", "")
 
 # Manual proxy configuration
 MANUAL_PROXY = os.getenv("MANUAL_PROXY", "")
 
+# Browser recycling between jobs: replace the browser after this many jobs, this age,
+# or above this resident memory (browser + helpers). 0 disables a trigger.
+BROWSER_RECYCLE_JOBS = int(os.getenv("BROWSER_RECYCLE_JOBS", "100") or 0)
+BROWSER_RECYCLE_MAX_AGE_MINUTES = float(os.getenv("BROWSER_RECYCLE_MAX_AGE_MINUTES", "120") or 0)
+BROWSER_RECYCLE_RSS_MB = float(os.getenv("BROWSER_RECYCLE_RSS_MB", "1500") or 0)
+
+# Warm standby (opt-in): a second logged-in browser parked on Quick Submit, swapped in
+# when the active one is discarded. Costs a second Chromium's memory.
+BROWSER_STANDBY = os.getenv("BROWSER_STANDBY", "").strip().lower() in ("1", "true", "yes", "on")
+QUICK_SUBMIT_INBOX_PATH = "/t_inbox.asp?lang=en_us&aid=quicksubmit"
+
 # Thread-local storage for browser sessions (each worker thread gets its own session)
 thread_local = threading.local()
 
@@ -65,7 +86,14 @@ def get_thread_browser_session():
             'page': None,
             'logged_in': False,
             'last_activity': None,
-            'current_proxy': None
+            'current_proxy': None,
+            'user_agent': None,
+            'pids': [],          # Registered browser PIDs (browser_registry)
+            'driver_pids': [],   # Registered Playwright driver PIDs
+            'created_at': None,  # When the session logged in (recycling age)
+            'jobs': 0,           # Jobs run on this browser (recycling count)
+            'carry_over': None,  # Proxy and user agent kept across a recycle
+            'standby': None      # Warm standby browser (BROWSER_STANDBY)
         }
     return thread_local.browser_session
 
@@ -223,6 +251,53 @@ def test_browser_proxy(page, proxy_info):
     
     return False
 
+def build_launch_options(proxy_info):
+    """Chromium launch options, routed through proxy_info when given"""
+    launch_options = {
+        'headless': True,
+        'args': [
+            '--no-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-gpu',
+            '--disable-extensions',
+            '--no-first-run',
+            '--disable-default-apps',
+            '--disable-web-security',
+            '--disable-features=VizDisplayCompositor'
+        ]
+    }
+    
+    # Add Webshare proxy configuration if available
+    if proxy_info:
+        launch_options['proxy'] = {
+            "server": f"http://{proxy_info['proxy_address']}:{proxy_info['port']}",
+            "username": proxy_info['username'],
+            "password": proxy_info['password']
+        }
+    return launch_options
+
+def build_context_options(user_agent):
+    """Browser context options with enhanced anti-detection"""
+    return {
+        'viewport': {'width': 1920, 'height': 1080},
+        'user_agent': user_agent,
+        'extra_http_headers': {
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Site': 'none',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-User': '?1',
+            'Sec-Fetch-Dest': 'document',
+            'Cache-Control': 'max-age=0'
+        },
+        'java_script_enabled': True,
+        'accept_downloads': True,
+        'ignore_https_errors': True
+    }
+
 def get_or_create_browser_session():
     """Get existing browser session or create new one with improved proxy handling"""
     # Get thread-local browser session
@@ -238,27 +313,15 @@ def get_or_create_browser_session():
             # Test if session is still alive
             current_url = browser_session['page'].url
             
-            # Check session age - refresh if older than 1 hour
-            if browser_session['last_activity']:
-                session_age = datetime.now() - browser_session['last_activity']
-                session_age_minutes = session_age.total_seconds() / 60
-                
-                if session_age_minutes > 60:  # 1 hour
-                    log(f"[{threading.current_thread().name}] Session is {session_age_minutes:.1f} minutes old (>60 min), refreshing login...")
-                    cleanup_browser_session()
-                    # Will create new session below
-                else:
-                    browser_session['last_activity'] = datetime.now()
-                    log(f"[{threading.current_thread().name}] Reusing existing browser session ({session_age_minutes:.1f} min old) - Current URL: {current_url}")
-                    return browser_session['page']
-            else:
-                # No timestamp, update it and continue
-                browser_session['last_activity'] = datetime.now()
-                log(f"[{threading.current_thread().name}] Reusing existing browser session - Current URL: {current_url}")
-                return browser_session['page']
+            # Age, job count and memory are checked between jobs by the worker (recycle_reason)
+            browser_session['last_activity'] = datetime.now()
+            log(f"[{threading.current_thread().name}] Reusing existing browser session ({browser_session['jobs']} job(s) so far) - Current URL: {current_url}")
+            return browser_session['page']
         except Exception as e:
             log(f"[{threading.current_thread().name}] Existing session invalid: {e}, creating new session")
             cleanup_browser_session()
+            if browser_session['logged_in']:
+                return browser_session['page']   # Warm standby swapped in
     
     # CRITICAL: Acquire session initialization lock
     # This ensures only ONE worker initializes browser at a time
@@ -274,65 +337,34 @@ def get_or_create_browser_session():
             try:
                 # Start Playwright with thread-safety lock
                 with playwright_lock:
+                    before = snapshot_children()
                     browser_session['playwright'] = sync_playwright().start()
+                    browser_session['driver_pids'] = register_new(before, 'driver')
                 
-                # Get a working proxy with testing and rotation
-                proxy_info = get_working_proxy()
+                # A recycled session keeps its proxy and user agent so the saved login stays valid
+                carry_over = browser_session['carry_over'] or {}
+                browser_session['carry_over'] = None
                 
-                # Prepare browser launch options
-                launch_options = {
-                    'headless': True,
-                    'args': [
-                        '--no-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-gpu',
-                        '--disable-extensions',
-                        '--no-first-run',
-                        '--disable-default-apps',
-                        '--disable-web-security',
-                        '--disable-features=VizDisplayCompositor'
-                    ]
-                }
+                # Get a working proxy with testing and rotation
+                proxy_info = carry_over['proxy'] if 'proxy' in carry_over else get_working_proxy()
                 
-                # Add Webshare proxy configuration if available
+                launch_options = build_launch_options(proxy_info)
                 if proxy_info:
-                    proxy_config = {
-                        "server": f"http://{proxy_info['proxy_address']}:{proxy_info['port']}",
-                        "username": proxy_info['username'],
-                        "password": proxy_info['password']
-                    }
-                    launch_options['proxy'] = proxy_config
                     browser_session['current_proxy'] = proxy_info
                     log(f"Using tested proxy: {proxy_info['proxy_address']}:{proxy_info['port']}")
                 else:
                     log("No proxy configured, using direct connection")
                 
                 # Launch browser with proxy support
+                before = snapshot_browsers(browser_session['driver_pids'])
                 browser_session['browser'] = browser_session['playwright'].chromium.launch(**launch_options)
+                browser_session['pids'] = register_new(before, 'browser', browser_only=True, drivers=browser_session['driver_pids'])
                 
                 # Create context with enhanced anti-detection
-                context_options = {
-                    'viewport': {'width': 1920, 'height': 1080},
-                    'user_agent': random.choice(USER_AGENTS),
-                    'extra_http_headers': {
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-                        'Accept-Language': 'en-US,en;q=0.9',
-                        'Accept-Encoding': 'gzip, deflate, br',
-                        'Connection': 'keep-alive',
-                        'Upgrade-Insecure-Requests': '1',
-                        'Sec-Fetch-Site': 'none',
-                        'Sec-Fetch-Mode': 'navigate',
-                        'Sec-Fetch-User': '?1',
-                        'Sec-Fetch-Dest': 'document',
-                        'Cache-Control': 'max-age=0'
-                    },
-                    'java_script_enabled': True,
-                    'accept_downloads': True,
-                    'ignore_https_errors': True
-                }
+                context_options = build_context_options(carry_over.get('user_agent') or random.choice(USER_AGENTS))
                 
                 # Load cookies if available (but validate them first)
-                cookies_path = "cookies.json"
+                cookies_path = STORAGE_STATE_FILE
                 should_load_cookies = False
                 
                 if os.path.exists(cookies_path):
@@ -363,6 +395,10 @@ def get_or_create_browser_session():
                     log("No saved cookies found, creating fresh session")
                 
                 browser_session['context'] = browser_session['browser'].new_context(**context_options)
+                browser_session['user_agent'] = context_options['user_agent']
+                attach_recorder(browser_session['context'])  # No-op unless TURNITIN_RECORD_DIR is set
+                attach_network_timing(browser_session['context'])  # No-op unless TURNITIN_NETWORK_TIMING is set
+                attach_diagnostics(browser_session['context'])
                 browser_session['page'] = browser_session['context'].new_page()
                 
                 # Apply stealth mode to bypass bot detection (AWS WAF, Cloudflare, etc.)
@@ -386,6 +422,9 @@ def get_or_create_browser_session():
                 if check_and_perform_login():
                     browser_session['logged_in'] = True
                     browser_session['last_activity'] = datetime.now()
+                    browser_session['created_at'] = datetime.now()
+                    browser_session['jobs'] = 0
+                    mark_session_verified()
                     log(f"[{threading.current_thread().name}] ✅ Browser session created and logged in successfully")
                     
                     # Double-check page is not None
@@ -408,17 +447,29 @@ def get_or_create_browser_session():
 
 def check_and_perform_login():
     """Check if login is needed and perform if necessary"""
+    started = time.time()
+    result = None
+    # Flag covers every exit (success, failure, exception); uploads queue meanwhile
+    bot_state.login_started()
+    log(f"[{threading.current_thread().name}] 🔒 Login started - new uploads wait in the queue")
+    try:
+        result = _check_and_perform_login_impl()
+        return bool(result)
+    finally:
+        bot_state.login_finished()
+        log(f"[{threading.current_thread().name}] 🔓 Login {'complete' if result else 'failed'}")
+        if result == 'already_logged_in':
+            # Session check only: counted apart, and kept out of the login duration
+            LOGINS.inc(result='already_logged_in')
+        else:
+            LOGINS.inc(result='ok' if result else 'failed')
+            LOGIN_SECONDS.observe(time.time() - started)
+
+def _check_and_perform_login_impl():
+    """Internal implementation of check_and_perform_login (truthy on success; 'already_logged_in' when no login was needed)"""
     browser_session = get_thread_browser_session()
     page = browser_session['page']
     
-    # Notify main.py that login is starting - block all file uploads
-    try:
-        from main import bot_is_logging_in
-        bot_is_logging_in.set()  # Set flag - bot is now logging in
-        log(f"[{threading.current_thread().name}] 🔒 Login started - file uploads blocked")
-    except Exception as flag_err:
-        log(f"Could not set login flag: {flag_err}")
-    
     # Acquire login lock - only one thread logs in at a time
     log(f"[{threading.current_thread().name}] Waiting for login lock...")
     with login_lock:
@@ -427,7 +478,7 @@ def check_and_perform_login():
         try:
             # Go to Turnitin login page with longer timeout
             log("Navigating to Turnitin login page...")
-            page.goto("https://www.turnitin.com/login_page.asp?lang=en_us", timeout=90000, wait_until='load')
+            page.goto(f"{TURNITIN_BASE_URL}/login_page.asp?lang=en_us", timeout=90000, wait_until='load')
             log("Page navigation complete, waiting for full page load...")
             
             # Wait for DOM to be ready
@@ -469,15 +520,7 @@ def check_and_perform_login():
                 log("Already logged in - Quick Submit found")
                 save_cookies()
                 
-                # Clear login flag - bot is ready to accept files
-                try:
-                    from main import bot_is_logging_in
-                    bot_is_logging_in.clear()
-                    log(f"[{threading.current_thread().name}] 🔓 Already logged in - file uploads allowed")
-                except Exception as flag_err:
-                    log(f"Could not clear login flag: {flag_err}")
-                
-                return True
+                return 'already_logged_in'
             except:
                 log("Need to perform login")
                 
@@ -751,14 +794,6 @@ def check_and_perform_login():
                         log("✅ Quick Submit page loaded successfully!")
                         save_cookies()
                         
-                        # Clear login flag - bot is now ready to accept files
-                        try:
-                            from main import bot_is_logging_in
-                            bot_is_logging_in.clear()
-                            log(f"[{threading.current_thread().name}] 🔓 Login complete - file uploads now allowed")
-                        except Exception as flag_err:
-                            log(f"Could not clear login flag: {flag_err}")
-                        
                         return True
                 except Exception as click_err:
                     log(f"Error clicking Quick Submit: {click_err}")
@@ -766,14 +801,6 @@ def check_and_perform_login():
                     log("Quick Submit element exists but click failed - trying alternative...")
                     save_cookies()
                     
-                    # Clear login flag - bot is now ready to accept files
-                    try:
-                        from main import bot_is_logging_in
-                        bot_is_logging_in.clear()
-                        log(f"[{threading.current_thread().name}] 🔓 Login complete - file uploads now allowed")
-                    except Exception as flag_err:
-                        log(f"Could not clear login flag: {flag_err}")
-                    
                     return True
                     
             except PlaywrightTimeout:
@@ -808,14 +835,6 @@ def check_and_perform_login():
                             log("✅ Quick Submit clicked successfully")
                             save_cookies()
                             
-                            # Clear login flag - bot is now ready to accept files
-                            try:
-                                from main import bot_is_logging_in
-                                bot_is_logging_in.clear()
-                                log(f"[{threading.current_thread().name}] 🔓 Login complete - file uploads now allowed")
-                            except Exception as flag_err:
-                                log(f"Could not clear login flag: {flag_err}")
-                            
                             return True
                     except Exception as e:
                         log(f"{description} failed: {e}")
@@ -824,14 +843,6 @@ def check_and_perform_login():
                 log("Could not find Quick Submit link with any selector, but login appears successful")
                 save_cookies()
                 
-                # Clear login flag - bot is now ready to accept files
-                try:
-                    from main import bot_is_logging_in
-                    bot_is_logging_in.clear()
-                    log(f"[{threading.current_thread().name}] 🔓 Login complete - file uploads now allowed")
-                except Exception as flag_err:
-                    log(f"Could not clear login flag: {flag_err}")
-                
                 return True
                 
             except Exception as e:
@@ -841,14 +852,6 @@ def check_and_perform_login():
         except Exception as e:
             log(f"Login process failed: {e}")
             
-            # Clear login flag on failure - allow retries
-            try:
-                from main import bot_is_logging_in
-                bot_is_logging_in.clear()
-                log(f"[{threading.current_thread().name}] ⚠️ Login failed - cleared flag for retry")
-            except Exception as flag_err:
-                log(f"Could not clear login flag: {flag_err}")
-            
             return False
 
 def navigate_to_quick_submit():
@@ -888,46 +891,21 @@ def navigate_to_quick_submit():
         raise
 
 def save_cookies():
-    """Save cookies for future sessions (clean up expired cookies)"""
+    """Save cookies for future sessions (expired cookies dropped, file replaced atomically)"""
     try:
         browser_session = get_thread_browser_session()
         if browser_session['context']:
-            import json as json_module
-            
-            # Get storage state
-            storage_path = "cookies.json"
-            browser_session['context'].storage_state(path=storage_path)
-            
-            # Clean up expired cookies
-            try:
-                current_time = time.time()
-                with open(storage_path, 'r', encoding='utf-8') as f:
-                    storage_data = json_module.load(f)
-                
-                # Filter out expired cookies
-                if 'cookies' in storage_data:
-                    original_count = len(storage_data['cookies'])
-                    storage_data['cookies'] = [
-                        c for c in storage_data['cookies'] 
-                        if c.get('expires', -1) > current_time or c.get('expires', -1) == -1
-                    ]
-                    new_count = len(storage_data['cookies'])
-                    
-                    # Save cleaned cookies back
-                    with open(storage_path, 'w', encoding='utf-8') as f:
-                        json_module.dump(storage_data, f)
-                    
-                    log(f"Cookies saved successfully ({original_count} -> {new_count} after cleanup)")
-                else:
-                    log("Cookies saved successfully")
-            except Exception as cleanup_err:
-                log(f"Cookies saved but cleanup warning: {cleanup_err}")
-                
+            original_count, new_count = write_storage_state(browser_session['context'].storage_state())
+            log(f"Cookies saved successfully ({original_count} -> {new_count} after cleanup)")
     except Exception as e:
         log(f"[{threading.current_thread().name}] Error saving cookies: {e}")
 
-def cleanup_browser_session():
-    """Clean up browser session for current thread"""
+def cleanup_browser_session(promote_standby=True):
+    """Clean up browser session for current thread.
+
+    With a healthy warm standby the standby becomes the session right away and the
+    Playwright driver is kept; otherwise everything is closed.
+    """
     browser_session = get_thread_browser_session()
     
     try:
@@ -937,19 +915,234 @@ def cleanup_browser_session():
             browser_session['context'].close()
         if browser_session['browser']:
             browser_session['browser'].close()
-        if browser_session['playwright']:
-            browser_session['playwright'].stop()
     except Exception as e:
         log(f"[{threading.current_thread().name}] Error during cleanup: {e}")
+    # Anything that did not exit is killed by the browser reaper
+    release_browser_pids(browser_session.get('pids'))
     
     # Reset session
-    browser_session['playwright'] = None
+    browser_session['pids'] = []
     browser_session['browser'] = None
     browser_session['context'] = None
     browser_session['page'] = None
     browser_session['logged_in'] = False
     browser_session['last_activity'] = None
     browser_session['current_proxy'] = None
+    browser_session['created_at'] = None
+    browser_session['jobs'] = 0
+    
+    if promote_standby and _promote_standby_session():
+        return
+    discard_standby_session()
+    try:
+        if browser_session['playwright']:
+            browser_session['playwright'].stop()
+    except Exception as e:
+        log(f"[{threading.current_thread().name}] Error stopping Playwright: {e}")
+    release_browser_pids(browser_session['driver_pids'])
+    browser_session['driver_pids'] = []
+    browser_session['playwright'] = None
+
+def prepare_standby_session():
+    """Launch a second browser from the saved storage state and park it on Quick Submit.
+
+    Runs on the worker thread between jobs (Playwright objects belong to the thread
+    that created them). Returns True if a standby is ready.
+    """
+    browser_session = get_thread_browser_session()
+    if not BROWSER_STANDBY or browser_session['standby']:
+        return bool(browser_session['standby'])
+    if not browser_session['playwright'] or not browser_session['logged_in']:
+        return False
+    
+    worker_name = threading.current_thread().name
+    started = time.time()
+    save_cookies()
+    if not os.path.exists(STORAGE_STATE_FILE):
+        return False
+    
+    browser = None
+    pids = []
+    try:
+        # Runs outside session_init_lock: only this thread's driver is searched for the new browser
+        before = snapshot_browsers(browser_session['driver_pids'])
+        browser = browser_session['playwright'].chromium.launch(**build_launch_options(browser_session['current_proxy']))
+        pids = register_new(before, 'browser', browser_only=True, drivers=browser_session['driver_pids'], role='standby')
+        context_options = build_context_options(browser_session['user_agent'] or random.choice(USER_AGENTS))
+        context_options['storage_state'] = STORAGE_STATE_FILE
+        context = browser.new_context(**context_options)
+        page = context.new_page()
+        if STEALTH_AVAILABLE:
+            try:
+                stealth_sync(page)
+            except Exception as stealth_err:
+                log(f"⚠️ Could not apply stealth mode to standby: {stealth_err}")
+        page.goto(f"{TURNITIN_BASE_URL}{QUICK_SUBMIT_INBOX_PATH}", timeout=60000, wait_until='domcontentloaded')
+        # Redirected to the login page if the saved state is no longer valid
+        page.wait_for_selector('a.sn_quick_submit', timeout=20000)
+    except Exception as e:
+        log(f"[{worker_name}] Warm standby not ready: {e}")
+        BROWSER_STANDBY_EVENTS.inc(event='prepare_failed')
+        try:
+            if browser:
+                browser.close()
+        except Exception:
+            pass
+        release_browser_pids(pids)
+        return False
+    
+    browser_session['standby'] = {
+        'browser': browser,
+        'context': context,
+        'page': page,
+        'pids': pids,
+        'user_agent': context_options['user_agent'],
+        'proxy': browser_session['current_proxy'],
+        'prepared_at': datetime.now(),
+    }
+    BROWSER_STANDBY_EVENTS.inc(event='prepared')
+    mark_session_verified()
+    log(f"[{worker_name}] 🔥 Warm standby browser ready on Quick Submit ({time.time() - started:.1f}s)")
+    return True
+
+def _promote_standby_session():
+    """Make the warm standby the active session (after the active one was closed)"""
+    browser_session = get_thread_browser_session()
+    standby = browser_session['standby']
+    if not standby:
+        return False
+    worker_name = threading.current_thread().name
+    try:
+        # Round trip through the driver: fails if the driver or the standby browser died
+        standby['page'].evaluate("1")
+    except Exception as e:
+        log(f"[{worker_name}] Warm standby unusable ({e}), starting a cold session")
+        BROWSER_STANDBY_EVENTS.inc(event='swap_failed')
+        return False
+    
+    browser_session['standby'] = None
+    browser_session['carry_over'] = None
+    browser_session['browser'] = standby['browser']
+    browser_session['context'] = standby['context']
+    browser_session['page'] = standby['page']
+    browser_session['pids'] = standby['pids']
+    set_role(standby['pids'], 'active')
+    browser_session['user_agent'] = standby['user_agent']
+    browser_session['current_proxy'] = standby['proxy']
+    browser_session['created_at'] = standby['prepared_at']
+    browser_session['last_activity'] = datetime.now()
+    browser_session['jobs'] = 0
+    browser_session['logged_in'] = True
+    attach_recorder(standby['context'])
+    attach_network_timing(standby['context'])
+    attach_diagnostics(standby['context'])
+    BROWSER_STANDBY_EVENTS.inc(event='swapped')
+    age_minutes = (datetime.now() - standby['prepared_at']).total_seconds() / 60
+    log(f"[{worker_name}] 🔥 Swapped in warm standby browser (prepared {age_minutes:.0f} min ago)")
+    return True
+
+def discard_standby_session():
+    """Close the warm standby browser, if any"""
+    browser_session = get_thread_browser_session()
+    standby = browser_session['standby']
+    if not standby:
+        return
+    browser_session['standby'] = None
+    try:
+        standby['browser'].close()
+    except Exception as e:
+        log(f"[{threading.current_thread().name}] Error closing warm standby: {e}")
+    release_browser_pids(standby['pids'])
+
+def maintain_standby_session():
+    """Between jobs: replace a standby older than the recycling age, then make sure one is ready"""
+    browser_session = get_thread_browser_session()
+    standby = browser_session['standby']
+    if standby and BROWSER_RECYCLE_MAX_AGE_MINUTES:
+        age_minutes = (datetime.now() - standby['prepared_at']).total_seconds() / 60
+        if age_minutes >= BROWSER_RECYCLE_MAX_AGE_MINUTES:
+            log(f"[{threading.current_thread().name}] Warm standby is {age_minutes:.0f} min old, preparing a fresh one")
+            discard_standby_session()
+    return prepare_standby_session()
+
+def verify_session_login(renew=False):
+    """Between jobs: check the login with one page load and log in again if it expired
+    (or, with renew, because its cookies are about to expire).
+
+    Returns True if it logged in again. Uploads are not blocked meanwhile; they queue.
+    """
+    browser_session = get_thread_browser_session()
+    page = browser_session['page']
+    if not page or not browser_session['logged_in']:
+        return False
+    worker_name = threading.current_thread().name
+    page.goto(f"{TURNITIN_BASE_URL}{QUICK_SUBMIT_INBOX_PATH}", timeout=60000, wait_until='domcontentloaded')
+    try:
+        page.wait_for_selector('a.sn_quick_submit', timeout=15000)
+        save_cookies()   # Keeps the saved state (and sliding cookie expiry) current
+        if not renew:
+            mark_session_verified()
+            log(f"[{worker_name}] 🔑 Session check: still logged in")
+            return False
+        # Still valid but about to expire: log in again now rather than in the middle of a job
+        log(f"[{worker_name}] 🔑 Session check: session cookies expire soon, logging in again")
+        browser_session['context'].clear_cookies()
+    except PlaywrightTimeout:
+        log(f"[{worker_name}] 🔑 Session check: login expired, logging in again")
+    
+    if not check_and_perform_login():
+        raise Exception("Login refresh failed")
+    mark_session_verified()
+    # The standby was built from the expired state
+    discard_standby_session()
+    return True
+
+def note_job_finished():
+    """Count a job against the current browser (recycling by job count)"""
+    browser_session = get_thread_browser_session()
+    if browser_session['browser']:
+        browser_session['jobs'] += 1
+
+def recycle_reason(memory_only=False):
+    """Why the current browser should be replaced ('jobs', 'age', 'rss'), or None.
+
+    memory_only: documents are waiting - only the memory limit is worth making the next
+    job wait for a new browser; the job count and age limits wait until the queue is empty.
+    """
+    browser_session = get_thread_browser_session()
+    if not browser_session['browser'] or not browser_session['logged_in']:
+        return None
+    if BROWSER_RECYCLE_RSS_MB and browser_session['pids']:
+        if tree_rss(browser_session['pids']) >= BROWSER_RECYCLE_RSS_MB * 1024 * 1024:
+            return 'rss'
+    if memory_only:
+        return None
+    if BROWSER_RECYCLE_JOBS and browser_session['jobs'] >= BROWSER_RECYCLE_JOBS:
+        return 'jobs'
+    if BROWSER_RECYCLE_MAX_AGE_MINUTES and browser_session['created_at']:
+        age_minutes = (datetime.now() - browser_session['created_at']).total_seconds() / 60
+        if age_minutes >= BROWSER_RECYCLE_MAX_AGE_MINUTES:
+            return 'age'
+    return None
+
+def recycle_browser_session(reason):
+    """Replace the browser and context, keeping the login (storage state) so no re-login is needed"""
+    browser_session = get_thread_browser_session()
+    worker_name = threading.current_thread().name
+    age_minutes = (datetime.now() - browser_session['created_at']).total_seconds() / 60 if browser_session['created_at'] else 0
+    rss_mb = tree_rss(browser_session['pids']) / (1024 * 1024)
+    log(f"[{worker_name}] ♻️ Recycling browser ({reason}): {browser_session['jobs']} job(s), "
+        f"{age_minutes:.0f} min old, {rss_mb:.0f} MB")
+    started = time.time()
+    save_cookies()
+    carry_over = {'proxy': browser_session['current_proxy'], 'user_agent': browser_session['user_agent']}
+    cleanup_browser_session()
+    if not browser_session['logged_in']:
+        browser_session['carry_over'] = carry_over   # No warm standby: start cold with the same identity
+    BROWSER_RECYCLES.inc(reason=reason)
+    page = get_or_create_browser_session()
+    log(f"[{worker_name}] ♻️ Browser recycled in {time.time() - started:.1f}s")
+    return page
 
 def get_session_page():
     """Get the current session page, creating if necessary"""
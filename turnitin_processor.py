@@ -9,32 +9,45 @@ def log(message: str):
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
 
 # Import optimized modules
-from turnitin_auth import get_session_page, navigate_to_quick_submit, cleanup_browser_session
+from turnitin_auth import get_session_page, navigate_to_quick_submit, cleanup_browser_session, TURNITIN_BASE_URL
 from turnitin_submission import submit_document
+from job_progress import JobProgress
+from job_metrics import start_stage as start_metric_stage, record_submission, job_interrupted, JobCancelled
+from page_recorder import begin_job as begin_page_recording
+from network_timing import begin_job as begin_network_timing
+from diagnostics import begin_job as begin_diagnostics, capture_failure
 from turnitin_reports import (
     find_submission_with_retry, 
-    download_reports_with_retry
+    download_reports_with_retry,
+    submission_in_inbox
 )
 
 # Load environment variables
 load_dotenv()
 
-def process_turnitin(file_path: str, chat_id: int, bot):
+def process_turnitin(file_path: str, chat_id: int, bot, progress=None, resume_title=None, pending_title=None):
     """
     Optimized Turnitin processing function:
     - Uses persistent browser session
     - Removes unnecessary debugging
     - Uses only working methods
     - Faster processing times
+    - Reports every step on one live status message (progress)
+    - resume_title: the document was already submitted under this title (job interrupted
+      by a restart) - skip the upload and continue at the inbox search
+    - pending_title: a restart interrupted the upload before Turnitin confirmed it - the
+      document is uploaded again only if no submission with this title is in the inbox
     """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     processing_messages = []
     worker_name = threading.current_thread().name
+    active_page = None  # Page shown in a failure bundle
     
     try:
-        # Send initial message
-        msg = bot.send_message(chat_id, "🚀 Starting Turnitin process...")
-        processing_messages.append(msg.message_id)
+        # Live status message (queued edits - the worker does not wait on Telegram)
+        if progress is None:
+            progress = JobProgress(bot, chat_id, os.path.basename(file_path))
+        progress.set_stage('starting')
         log(f"[{worker_name}] Starting Turnitin process...")
 
         # Verify file exists
@@ -45,7 +58,13 @@ def process_turnitin(file_path: str, chat_id: int, bot):
         original_filename = os.path.basename(file_path)
         log(f"[{worker_name}] File verified: {file_path} (Size: {os.path.getsize(file_path)} bytes)")
 
+        # Page captures (opt-in) must not contain the user's file name or chat ID
+        begin_page_recording(original_filename, [original_filename, os.path.splitext(original_filename)[0], str(chat_id)])
+        begin_network_timing(original_filename)
+        begin_diagnostics(original_filename, [original_filename, os.path.splitext(original_filename)[0], str(chat_id)])
+
         # Get or create browser session (persistent)
+        start_metric_stage('session')
         page = get_session_page()
         
         if page is None:
@@ -66,25 +85,43 @@ def process_turnitin(file_path: str, chat_id: int, bot):
             raise Exception("Session page is None - browser session not initialized properly")
         
         log(f"[{worker_name}] Session page verified, URL: {session_page.url}")
-        actual_submission_title = submit_document(session_page, file_path, chat_id, timestamp, bot, processing_messages)
+        active_page = session_page
+        if resume_title or pending_title:
+            start_metric_stage('navigate_quick_submit')
+            navigate_to_quick_submit()
+        if not resume_title and pending_title:
+            session_page.wait_for_load_state('networkidle', timeout=30000)
+            if submission_in_inbox(session_page, pending_title):
+                resume_title = pending_title
+            else:
+                log(f"[{worker_name}] Upload '{pending_title}' from before the restart is not in the inbox, uploading again")
+        if resume_title:
+            log(f"[{worker_name}] Already submitted before the restart, resuming at the inbox search")
+            actual_submission_title = resume_title
+        else:
+            actual_submission_title = submit_document(session_page, file_path, chat_id, timestamp, bot, processing_messages, progress)
+        record_submission(actual_submission_title)
 
         # Find the submitted document
         log(f"[{worker_name}] Finding submitted document...")
         log(f"[{worker_name}] Submission title to search for: '{actual_submission_title}'")
-        page1 = find_submission_with_retry(session_page, actual_submission_title, chat_id, bot, processing_messages)
+        page1 = find_submission_with_retry(session_page, actual_submission_title, chat_id, bot, processing_messages, progress)
         
         if page1 is None:
             log(f"[{worker_name}] Document not found, user will retry later")
+            capture_failure(session_page, 'submission_not_found', f"title={actual_submission_title}")
+            progress.finish("⚠️ <b>Submission not found in the Turnitin inbox.</b>\n\nPlease try again later.")
             return  # Exit without closing browser
 
         # Download reports (handles downloading and sending to Telegram)
+        active_page = page1
         log(f"[{worker_name}] Downloading reports...")
         try:
-            submission_info = download_reports_with_retry(page1, chat_id, bot, original_filename)
+            submission_info = download_reports_with_retry(page1, chat_id, bot, original_filename, progress=progress)
         except TypeError as e:
             if "'dict' object has no attribute" in str(e) or "has no attribute 'url'" in str(e):
                 log(f"[{worker_name}] Page object error: {e} - this means find_submission returned wrong type")
-                bot.send_message(chat_id, "❌ Internal error: submission page error")
+                progress.finish("❌ Internal error: submission page error")
                 return
             raise
         
@@ -111,6 +148,7 @@ def process_turnitin(file_path: str, chat_id: int, bot):
             log(f"[{worker_name}] Error closing submission page: {close_error}")
 
         # Navigate to assignment inbox for next request
+        start_metric_stage('return_to_inbox', check_cancel=False)  # Reports are delivered, nothing left to save
         try:
             from turnitin_auth import get_thread_browser_session
             browser_session = get_thread_browser_session()
@@ -121,13 +159,13 @@ def process_turnitin(file_path: str, chat_id: int, bot):
                 current_url = main_page.url
                 if 'aid=' in current_url:
                     aid_part = current_url.split('aid=')[1].split('&')[0]
-                    inbox_url = f"https://www.turnitin.com/t_inbox.asp?lang=en_us&aid={aid_part}"
+                    inbox_url = f"{TURNITIN_BASE_URL}/t_inbox.asp?lang=en_us&aid={aid_part}"
                     log(f"[{worker_name}] Using extracted assignment ID: {aid_part}")
                 else:
-                    inbox_url = "https://www.turnitin.com/t_inbox.asp?lang=en_us&aid=quicksubmit"
+                    inbox_url = f"{TURNITIN_BASE_URL}/t_inbox.asp?lang=en_us&aid=quicksubmit"
                     log(f"[{worker_name}] Using default assignment ID: quicksubmit")
             except Exception:
-                inbox_url = "https://www.turnitin.com/t_inbox.asp?lang=en_us&aid=quicksubmit"
+                inbox_url = f"{TURNITIN_BASE_URL}/t_inbox.asp?lang=en_us&aid=quicksubmit"
                 log(f"[{worker_name}] Using fallback assignment ID: quicksubmit")
 
             # Navigate to assignment inbox for the next document
@@ -147,17 +185,36 @@ def process_turnitin(file_path: str, chat_id: int, bot):
             'reports_available': submission_info.get('reports_available', False)
         }
 
+    except JobCancelled as cancelled:
+        if job_interrupted():
+            # Shutdown: stay inside the checkpoint window - the drain flushes outbound messages
+            # and the browser is closed next, so its pages are left as they are
+            log(f"[{worker_name}] ⏸️ Job interrupted (at stage {cancelled})")
+            bot.flush_outbound(chat_id, timeout=2)
+            if processing_messages:
+                bot.delete_messages_async(chat_id, processing_messages)
+            raise
+        log(f"[{worker_name}] 🚫 Job cancelled (at stage {cancelled}), cleaning up")
+        bot.flush_outbound(chat_id, timeout=15)
+        if processing_messages:
+            bot.delete_messages_async(chat_id, processing_messages)
+        release_job_pages(worker_name)
+        raise  # The worker decides what happens to the upload (deleted, or kept for a restart)
+
     except Exception as e:
         error_msg = f"An error occurred during Turnitin processing: {str(e)}"
+        capture_failure(active_page, 'process_error', e)
         
-        # Clean up processing messages
-        for message_id in processing_messages:
-            try:
-                bot.delete_message(chat_id, message_id)
-            except:
-                pass
+        # Clean up the status message and any processing messages
+        # (wait briefly so queued ones have their IDs recorded)
+        bot.flush_outbound(chat_id, timeout=15)
+        status_message_id = progress.discard() if progress else None
+        if status_message_id:
+            processing_messages.append(status_message_id)
+        if processing_messages:
+            bot.delete_messages_async(chat_id, processing_messages)
         
-        bot.send_message(chat_id, f"❌ {error_msg}")
+        bot.send_message_async(chat_id, f"❌ {error_msg}")
         log(f"[{worker_name}] ERROR: {error_msg}")
         
         # Clean up files
@@ -173,8 +230,28 @@ def process_turnitin(file_path: str, chat_id: int, bot):
             log(f"[{worker_name}] Critical browser error detected, resetting session")
             cleanup_browser_session()
 
+def release_job_pages(worker_name=""):
+    """Close the pages a job opened (report viewer) and put the session page back on the inbox"""
+    from turnitin_auth import get_thread_browser_session
+    browser_session = get_thread_browser_session()
+    main_page = browser_session['page']
+    context = browser_session['context']
+    if context is None or main_page is None:
+        return
+    for extra_page in list(context.pages):
+        if extra_page is not main_page:
+            try:
+                extra_page.close()
+            except Exception as close_error:
+                log(f"[{worker_name}] Error closing job page: {close_error}")
+    try:
+        main_page.goto(f"{TURNITIN_BASE_URL}/t_inbox.asp?lang=en_us&aid=quicksubmit", timeout=30000)
+        log(f"[{worker_name}] Session page back on the inbox")
+    except Exception as nav_error:
+        log(f"[{worker_name}] Error returning to inbox after cancel: {nav_error}")
+
 def shutdown_browser_session():
     """Shutdown browser session when bot stops"""
     log("Shutting down browser session...")
-    cleanup_browser_session()
+    cleanup_browser_session(promote_standby=False)
     log("Browser session closed")
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import html
 import time
 import threading
 from datetime import datetime, timedelta
@@ -13,9 +14,123 @@ def random_wait(min_seconds=2, max_seconds=4):
     wait_time = random.uniform(min_seconds, max_seconds)
     time.sleep(wait_time)
 
-from turnitin_auth import navigate_to_quick_submit
+from turnitin_auth import navigate_to_quick_submit, TURNITIN_BASE_URL
+from page_recorder import record_step
+from job_metrics import start_stage as start_metric_stage, sleep_unless_cancelled
+from diagnostics import capture_failure, mark_window as mark_diagnostics_window
 
-def find_submission_with_retry(page, submission_title, chat_id, bot, processing_messages):
+def normalize_title(txt: str) -> str:
+    """Collapse whitespace so inbox titles compare reliably"""
+    try:
+        return " ".join((txt or "").strip().split())
+    except Exception:
+        return txt or ""
+
+def get_inbox_rows(page):
+    """Rows of the submission inbox table (rows without td cells are headers)"""
+    # First, try to find the main submission table
+    table = page.query_selector("table[class*='inbox'], table[id*='inbox'], table[class*='submission']")
+    if table:
+        return table.query_selector_all("tbody tr")
+    # Fallback: get all table rows but skip header rows (rows with th elements)
+    rows = page.query_selector_all("tr")
+    return [r for r in rows if len(r.query_selector_all("th")) == 0]
+
+def read_inbox_row(row, cells):
+    """TITLE and PAPER ID text of one inbox row, given its td cells"""
+    title_text = ""
+    # Preferred: anchor text inside TITLE column
+    title_cell = row.query_selector("td[class*='ibox_title']") or (cells[2] if len(cells) > 2 else None)
+    if title_cell:
+        title_link_el = title_cell.query_selector("a")
+        if title_link_el:
+            title_text = title_link_el.inner_text().strip()
+        else:
+            title_text = title_cell.inner_text().strip()
+
+    # Fallback: checkbox input carries paper title in its title attribute
+    if not title_text:
+        try:
+            cb = row.query_selector("td.ibox_checkbox input[name='object_checkbox']")
+            if cb:
+                tattr = cb.get_attribute("title")
+                if tattr:
+                    title_text = tattr.strip()
+        except Exception:
+            pass
+
+    # Extract PAPER ID for logging/diagnostics (column 10)
+    paper_id_text = ""
+    if len(cells) > 10:
+        try:
+            paper_id_cell = cells[10]
+            pid_link = paper_id_cell.query_selector("a")
+            paper_id_text = (pid_link.inner_text().strip() if pid_link else paper_id_cell.inner_text().strip())
+        except Exception:
+            paper_id_text = ""
+    return title_text, paper_id_text
+
+def submission_in_inbox(page, submission_title):
+    """One pass over the inbox on `page`: is a submission with this title listed?"""
+    wanted = normalize_title(submission_title).lower()
+    for row in get_inbox_rows(page):
+        cells = row.query_selector_all("td")
+        if cells and normalize_title(read_inbox_row(row, cells)[0]).lower() == wanted:
+            return True
+    return False
+
+# Viewer toolbar elements that open the download menu, most specific first
+DOWNLOAD_MENU_OPENERS = [
+    "button[aria-label*='Download' i]",
+    ".tii-sws-download-btn-mfe",
+    "tii-sws-download-btn-mfe",
+    "tii-sws-header tii-sws-download-btn-mfe",
+    "div[role='button']:has-text('Download')",
+]
+
+def open_download_menu(page, worker_name=""):
+    """Open the viewer's download menu and wait for its items to render"""
+    # Try up to 5 rounds with small delays
+    for _ in range(5):
+        for opener in DOWNLOAD_MENU_OPENERS:
+            try:
+                el = page.query_selector(opener)
+                if not el:
+                    continue
+                log(f"[{worker_name}] Opening download menu via selector: {opener}")
+                el.click()
+                try:
+                    page.wait_for_selector("ul.download-menu .download-menu-item button", timeout=5000)
+                    return True
+                except Exception:
+                    time.sleep(0.5)
+                    # Try next opener if menu not visible
+            except Exception:
+                continue
+    return False
+
+def get_badge_percentage(page, tab_index, worker_name=""):
+    """Get badge percentage from a viewer tab button. Returns None if not found."""
+    try:
+        # Try multiple selectors for tab badges
+        selectors = [
+            f"tii-sws-tab-navigator tii-sws-tab-button:nth-of-type({tab_index}) tdl-badge span.label",
+            f"tii-sws-tab-navigator tii-sws-tab-button:nth-of-type({tab_index}) .badge span.label",
+            f"tii-sws-submission-workspace tii-sws-tab-navigator tii-sws-tab-button:nth-of-type({tab_index}) tdl-badge span.label",
+        ]
+        for selector in selectors:
+            badge_label = page.query_selector(selector)
+            if badge_label:
+                badge_text = badge_label.inner_text().strip()
+                log(f"[{worker_name}] Tab {tab_index} badge text: '{badge_text}'")
+                return badge_text
+        log(f"[{worker_name}] Tab {tab_index} badge not found")
+        return None
+    except Exception as e:
+        log(f"[{worker_name}] Error getting badge for tab {tab_index}: {e}")
+        return None
+
+def find_submission_with_retry(page, submission_title, chat_id, bot, processing_messages, progress=None):
     """Find the submitted document by title/ID and wait for similarity score"""
     import threading
     from turnitin_auth import get_thread_browser_session, submission_search_lock
@@ -31,15 +146,20 @@ def find_submission_with_retry(page, submission_title, chat_id, bot, processing_
     with submission_search_lock:
         log(f"[{worker_name}] Acquired submission search lock, starting search...")
         try:
-            return _find_submission_with_retry_impl(page, submission_title, chat_id, bot, processing_messages)
+            return _find_submission_with_retry_impl(page, submission_title, chat_id, bot, processing_messages, progress)
         finally:
             log(f"[{worker_name}] Released submission search lock")
 
-def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, processing_messages):
+def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, processing_messages, progress=None):
     """Internal implementation of find_submission_with_retry (called with lock held)"""
     import threading
     worker_name = threading.current_thread().name
 
+    start_metric_stage('inbox_search')
+    mark_diagnostics_window()
+    if progress:
+        progress.set_stage('searching')
+
     # Ensure we're on the assignment inbox page
     try:
         current_url = page.url
@@ -48,7 +168,7 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
         # If not on inbox page, navigate to it
         if 't_inbox.asp' not in current_url:
             log(f"[{worker_name}] Not on inbox page, navigating to assignment inbox...")
-            page.goto("https://www.turnitin.com/t_assignments.asp")
+            page.goto(f"{TURNITIN_BASE_URL}/t_assignments.asp")
             time.sleep(3)
 
         # Wait for page to load and find assignments
@@ -147,6 +267,7 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                 
         except Exception as sort_error:
             log(f"[{worker_name}] Sort/refresh error: {sort_error}")
+        record_step(page, 'inbox')
 
         # Look for submission link with exact title match (not prefix)
         log(f"[{worker_name}] Searching for submission: '{submission_title}'")
@@ -164,16 +285,7 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                 time.sleep(2)
             
             try:
-                # First, try to find the main submission table
-                table = page.query_selector("table[class*='inbox'], table[id*='inbox'], table[class*='submission']")
-                
-                if table:
-                    rows = table.query_selector_all("tbody tr")
-                else:
-                    # Fallback: get all table rows but skip header rows
-                    rows = page.query_selector_all("tr")
-                    # Filter out header rows (rows with th elements)
-                    rows = [r for r in rows if len(r.query_selector_all("th")) == 0]
+                rows = get_inbox_rows(page)
                 
                 log(f"[{worker_name}] Found {len(rows)} data rows in submission table (attempt {retry_attempt + 1})")
                 
@@ -212,46 +324,10 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                                             cell_contents.append(f"[{cell_idx}]={content}")
                                 log(f"[{worker_name}] Row {row_idx} cells: {' | '.join(cell_contents)}")
                             
-                            # Extract TITLE text from the title cell (preferred) or checkbox title attribute
-                            def _normalize(txt: str) -> str:
-                                try:
-                                    return " ".join((txt or "").strip().split())
-                                except Exception:
-                                    return txt or ""
-
-                            title_text = ""
-                            # Preferred: anchor text inside TITLE column
-                            title_cell = row.query_selector("td[class*='ibox_title']") or (cells[2] if len(cells) > 2 else None)
-                            if title_cell:
-                                title_link_el = title_cell.query_selector("a")
-                                if title_link_el:
-                                    title_text = title_link_el.inner_text().strip()
-                                else:
-                                    title_text = title_cell.inner_text().strip()
-
-                            # Fallback: checkbox input carries paper title in its title attribute
-                            if not title_text:
-                                try:
-                                    cb = row.query_selector("td.ibox_checkbox input[name='object_checkbox']")
-                                    if cb:
-                                        tattr = cb.get_attribute("title")
-                                        if tattr:
-                                            title_text = tattr.strip()
-                                except Exception:
-                                    pass
-
-                            # Extract PAPER ID for logging/diagnostics (column 10)
-                            paper_id_text = ""
-                            if len(cells) > 10:
-                                try:
-                                    paper_id_cell = cells[10]
-                                    pid_link = paper_id_cell.query_selector("a")
-                                    paper_id_text = (pid_link.inner_text().strip() if pid_link else paper_id_cell.inner_text().strip())
-                                except Exception:
-                                    paper_id_text = ""
+                            title_text, paper_id_text = read_inbox_row(row, cells)
 
                             # Exact match on TITLE
-                            if _normalize(title_text).lower() == _normalize(submission_title).lower():
+                            if normalize_title(title_text).lower() == normalize_title(submission_title).lower():
                                 log(f"[{worker_name}] Found exact match: TITLE='{title_text}' | PAPER ID='{paper_id_text}' (row {row_idx})")
 
                                 # BEFORE opening viewer: check SIMILARITY column for '--' (pending)
@@ -269,16 +345,20 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                                         log(f"[{worker_name}] Similarity cell text: '{similarity_text}'")
                                     # If similarity shows '--', wait 5 minutes then reload and check again
                                     if similarity_text is not None and similarity_text.strip() == "--":
+                                        start_metric_stage('similarity_wait')
                                         try:
-                                            bot.send_message(
-                                                chat_id,
-                                                "⏳ Similarity is not ready yet (showing --). Waiting 5 minutes then retry…\n"
-                                                "⏳ Similarity chưa sẵn sàng (hiển thị --). Chờ 5 phút rồi thử lại…"
-                                            )
+                                            if progress:
+                                                progress.set_stage('similarity_wait')
+                                            else:
+                                                bot.send_message_async(
+                                                    chat_id,
+                                                    "⏳ Similarity is not ready yet (showing --). Waiting 5 minutes then retry…\n"
+                                                    "⏳ Similarity chưa sẵn sàng (hiển thị --). Chờ 5 phút rồi thử lại…"
+                                                )
                                         except Exception:
                                             pass
                                         log(f"[{worker_name}] Similarity is '--' — sleeping 5 minutes before retry")
-                                        time.sleep(5 * 60)
+                                        sleep_unless_cancelled(5 * 60)
                                         # Reload inbox and re-check the same title row's similarity
                                         try:
                                             page.reload(wait_until='networkidle')
@@ -305,7 +385,7 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                                                 if tcell2:
                                                     alink = tcell2.query_selector("a")
                                                     ttext2 = (alink.inner_text().strip() if alink else tcell2.inner_text().strip())
-                                                if _normalize(ttext2).lower() == _normalize(submission_title).lower():
+                                                if normalize_title(ttext2).lower() == normalize_title(submission_title).lower():
                                                     found_again = True
                                                     scell2 = r2.query_selector("td.or_report_cell") or (c2[3] if len(c2) > 3 else None)
                                                     if scell2:
@@ -318,12 +398,15 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                                         if found_again and (similarity_text2 is not None) and similarity_text2.strip() == "--":
                                             # Still '--' after 5 minutes → end session and notify user
                                             try:
-                                                bot.send_message(
-                                                    chat_id,
+                                                not_checkable_msg = (
                                                     "❌ This file cannot be checked on Turnitin right now (Similarity remains -- after retry).\n"
                                                     "❌ File này không thể kiểm tra trên Turnitin lúc này (Similarity vẫn -- sau khi thử lại).\n\n"
                                                     "📩 Vui lòng báo admin để kiểm tra lại."
                                                 )
+                                                if progress:
+                                                    progress.finish(not_checkable_msg)
+                                                else:
+                                                    bot.send_message_async(chat_id, not_checkable_msg)
                                             except Exception:
                                                 pass
                                             log(f"[{worker_name}] Similarity still '--' after 5-minute wait — aborting this submission")
@@ -332,6 +415,7 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                                     log(f"[{worker_name}] Similarity pre-check error: {sim_check_err}")
 
                                 # Prefer clicking the TITLE link and handle popup/new window
+                                start_metric_stage('viewer_open')
                                 try:
                                     title_link = row.query_selector("td[class*='ibox_title'] a") or row.query_selector("a")
                                     if title_link:
@@ -417,7 +501,7 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                                                 log(f"[{worker_name}] Submission page fully loaded after double click")
                                                 # If we didn't land on the viewer, attempt direct href again (in case element re-rendered)
                                                 current_after_click = page.url
-                                                if ("ev.turnitin.com" in current_after_click) or ("newreport" in current_after_click) or ("paper_frameset" in current_after_click):
+                                                if ("/app/carta" in current_after_click) or ("ev.turnitin.com" in current_after_click) or ("newreport" in current_after_click) or ("paper_frameset" in current_after_click):
                                                     log(f"[{worker_name}] Detected viewer URL after double click: {current_after_click}")
                                                     return page
                                                 else:
@@ -449,7 +533,7 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
                                                                 # Popup failed, try same-tab navigation
                                                                 report_link.click()
                                                                 try:
-                                                                    page.wait_for_url(lambda url: 'ev.turnitin.com/app/carta' in url, timeout=45000)
+                                                                    page.wait_for_url(lambda url: '/app/carta' in url, timeout=45000)
                                                                     log(f"[{worker_name}] Viewer URL detected in same tab")
                                                                 except Exception:
                                                                     pass
@@ -484,7 +568,7 @@ def _find_submission_with_retry_impl(page, submission_title, chat_id, bot, proce
         log(f"[{worker_name}] Error finding submission: {e}")
         return {'found': False, 'error': str(e)}
 
-def download_reports(page, chat_id, bot, original_filename=None):
+def download_reports(page, chat_id, bot, original_filename=None, progress=None):
     """Download Similarity and AI Writing reports as PDF files"""
     import time
     import random
@@ -499,6 +583,8 @@ def download_reports(page, chat_id, bot, original_filename=None):
     
     sim_filename = None
     ai_filename = None
+    scores = {}
+    mark_diagnostics_window()
     
     try:
         # Check if we're on the reports page (Turnitin viewer)
@@ -507,7 +593,7 @@ def download_reports(page, chat_id, bot, original_filename=None):
         
         # Guard: ensure this is the viewer, not the inbox
         try:
-            on_viewer = ('ev.turnitin.com/app/carta' in current_url) or bool(page.query_selector('tii-sws-submission-workspace'))
+            on_viewer = ('/app/carta' in current_url) or bool(page.query_selector('tii-sws-submission-workspace'))
         except Exception:
             on_viewer = False
         if not on_viewer:
@@ -524,10 +610,13 @@ def download_reports(page, chat_id, bot, original_filename=None):
             time.sleep(5)
         
         # Downloading reports...
-        bot.send_message(chat_id, "📥 Downloading reports...")
+        if progress:
+            progress.set_stage('downloading')
+        else:
+            bot.send_message_async(chat_id, "📥 Downloading reports...")
+            bot.send_message_async(chat_id, "⏳ Preparing reports…")
 
         # Adaptive readiness wait (no fixed 60s sleep)
-        bot.send_message(chat_id, "⏳ Preparing reports…")
         try:
             # Poll for the presence of the download opener for up to ~90s
             start_ts = time.time()
@@ -571,40 +660,18 @@ def download_reports(page, chat_id, bot, original_filename=None):
         
         # Download button found - reports available
         log(f"[{worker_name}] Download button found - reports available")
+        record_step(page, 'viewer')
+        menu_recorded = []
         
-    # Helper: open the download menu and wait for items to render
-        def open_download_menu(p):
-            openers = [
-                "button[aria-label*='Download' i]",
-                ".tii-sws-download-btn-mfe",
-                "tii-sws-download-btn-mfe",
-                "tii-sws-header tii-sws-download-btn-mfe",
-                "div[role='button']:has-text('Download')",
-            ]
-            # Try up to 3 rounds with small delays
-            for _ in range(5):
-                for opener in openers:
-                    try:
-                        el = p.query_selector(opener)
-                        if not el:
-                            continue
-                        log(f"[{worker_name}] Opening download menu via selector: {opener}")
-                        el.click()
-                        try:
-                            p.wait_for_selector("ul.download-menu .download-menu-item button", timeout=5000)
-                            return True
-                        except Exception:
-                            time.sleep(0.5)
-                            # Try next opener if menu not visible
-                    except Exception:
-                        continue
-            return False
-
         # Prefer menu-driven download as per provided markup
         def menu_click_download(p, button_selector, timeout_ms=90000, description=""):
-            if not open_download_menu(p):
+            if not open_download_menu(p, worker_name):
                 log(f"[{worker_name}] Download menu did not appear; cannot proceed with menu item clicks")
+                capture_failure(p, 'download_menu_missing')
                 return None
+            if not menu_recorded:
+                record_step(p, 'download_menu')
+                menu_recorded.append(True)
             try:
                 btn = p.query_selector(button_selector)
                 if not btn:
@@ -631,30 +698,8 @@ def download_reports(page, chat_id, bot, original_filename=None):
         # Check badges BEFORE attempting downloads to determine availability
         log(f"[{worker_name}] Checking Similarity and AI badges...")
         
-        # Helper function to get badge percentage
-        def get_badge_percentage(tab_index):
-            """Get badge percentage from tab button. Returns None if not found or '--'"""
-            try:
-                # Try multiple selectors for tab badges
-                selectors = [
-                    f"tii-sws-tab-navigator tii-sws-tab-button:nth-of-type({tab_index}) tdl-badge span.label",
-                    f"tii-sws-tab-navigator tii-sws-tab-button:nth-of-type({tab_index}) .badge span.label",
-                    f"tii-sws-submission-workspace tii-sws-tab-navigator tii-sws-tab-button:nth-of-type({tab_index}) tdl-badge span.label",
-                ]
-                for selector in selectors:
-                    badge_label = page.query_selector(selector)
-                    if badge_label:
-                        badge_text = badge_label.inner_text().strip()
-                        log(f"[{worker_name}] Tab {tab_index} badge text: '{badge_text}'")
-                        return badge_text
-                log(f"[{worker_name}] Tab {tab_index} badge not found")
-                return None
-            except Exception as e:
-                log(f"[{worker_name}] Error getting badge for tab {tab_index}: {e}")
-                return None
-        
         # Check Similarity badge (Tab 1) - allow if shows any percentage (0% or higher)
-        sim_badge = get_badge_percentage(1)
+        sim_badge = get_badge_percentage(page, 1, worker_name)
         sim_available = False
         if sim_badge and '%' in sim_badge and '--' not in sim_badge:
             sim_available = True
@@ -663,13 +708,13 @@ def download_reports(page, chat_id, bot, original_filename=None):
             log(f"[{worker_name}] Similarity Report NOT available (badge: {sim_badge})")
         
         # Check AI badge (Tab 3) - skip if shows '--% '
-        ai_badge = get_badge_percentage(3)
+        ai_badge = get_badge_percentage(page, 3, worker_name)
         ai_available = False
         if ai_badge and '--' in ai_badge:
             log(f"[{worker_name}] AI Writing Report NOT available (shows '--')")
             ai_available = False
             # Send unavailability message
-            bot.send_message(
+            bot.send_message_async(
                 chat_id,
                 "⚠️ <b>AI Writing Report Unavailable / Báo cáo AI không có sẵn</b>\n\n"
                 "📋 <b>Turnitin cannot generate AI report for this file.</b>\n"
@@ -697,6 +742,7 @@ def download_reports(page, chat_id, bot, original_filename=None):
             log(f"[{worker_name}] AI Writing Report status unclear (badge: {ai_badge})")
         
         # Attempt AI report FIRST if available (user request): try text selector then fallbacks
+        start_metric_stage('report_download_ai')
         download2 = None
         if ai_available:
             try:
@@ -734,10 +780,12 @@ def download_reports(page, chat_id, bot, original_filename=None):
                 log(f"[{worker_name}] Saved AI Writing Report as {ai_filename}")
             else:
                 log(f"[{worker_name}] Failed to download AI report despite badge showing available")
+                capture_failure(page, 'ai_report_download_failed', f"badge={ai_badge}")
         else:
             log(f"[{worker_name}] Skipping AI download (not available per badge check)")
 
         # Now download Similarity Report (second) if available
+        start_metric_stage('report_download_similarity')
         download = None
         if sim_available:
             # Try to use the explicit Similarity Report menu item first (li[1])
@@ -784,6 +832,7 @@ def download_reports(page, chat_id, bot, original_filename=None):
                 log(f"[{worker_name}] Saved Similarity Report as {sim_filename}")
             else:
                 log(f"[{worker_name}] Failed to download Similarity report despite badge showing available")
+                capture_failure(page, 'similarity_report_download_failed', f"badge={sim_badge}")
         else:
             log(f"[{worker_name}] Skipping Similarity download (not available per badge check)")
         
@@ -792,60 +841,22 @@ def download_reports(page, chat_id, bot, original_filename=None):
         reports_ai = bool(ai_filename and os.path.exists(ai_filename))
         log(f"[{worker_name}] Reports downloaded - Similarity: {reports_sim}, AI: {reports_ai}")
         
-        # Send score notification to user before uploading files
-        score_message = "📊 <b>Analysis Results / Kết quả phân tích</b>\n\n"
-        
-        if sim_badge and sim_available:
-            score_message += f"📄 <b>Similarity / Tương đồng:</b> {sim_badge}\n"
-        else:
-            score_message += f"📄 <b>Similarity / Tương đồng:</b> N/A\n"
-        
-        if ai_badge and ai_available:
-            score_message += f"🤖 <b>AI Writing / Viết bằng AI:</b> {ai_badge}\n"
-        else:
-            score_message += f"🤖 <b>AI Writing / Viết bằng AI:</b> N/A\n"
-        
-        score_message += f"\n📥 <b>Uploading reports to Telegram...</b>\n📥 <b>Đang tải báo cáo lên Telegram...</b>"
-        
-        bot.send_message(chat_id, score_message, parse_mode='HTML')
-        log(f"[{worker_name}] Sent scores to user - Similarity: {sim_badge}, AI: {ai_badge}")
+        # Scores are delivered in the caption of the report upload (no separate score message)
+        scores['similarity'] = sim_badge if (sim_badge and sim_available) else None
+        scores['ai'] = ai_badge if (ai_badge and ai_available) else None
+        if progress:
+            progress.set_stage('delivering')
+        log(f"[{worker_name}] Scores - Similarity: {sim_badge}, AI: {ai_badge}")
         
     except Exception as e:
         log(f"[{worker_name}] Error downloading reports: {e}")
-        bot.send_message(chat_id, f"⚠️ Error downloading reports: {e}")
+        capture_failure(page, 'download_error', e)
+        bot.send_message_async(chat_id, f"⚠️ Error downloading reports: {e}")
     
     # Send reports directly to Telegram as files
-    try:
-        reports_sent = 0
-        
-        if sim_filename and os.path.exists(sim_filename):
-            log(f"[{worker_name}] Sending Similarity Report to Telegram: {sim_filename}")
-            if send_document_with_retry(bot, chat_id, sim_filename, "📊 <b>Similarity Report</b>"):
-                reports_sent += 1
-                log(f"[{worker_name}] Similarity Report sent successfully to Telegram")
-        
-        if ai_filename and os.path.exists(ai_filename):
-            log(f"[{worker_name}] Sending AI Writing Report to Telegram: {ai_filename}")
-            if send_document_with_retry(bot, chat_id, ai_filename, "🤖 <b>AI Writing Report</b>"):
-                reports_sent += 1
-                log(f"[{worker_name}] AI Writing Report sent successfully to Telegram")
-        
-        # Send summary message
-        if reports_sent > 0:
-            summary_message = "✅ <b>Reports Ready!</b>\n\n"
-            
-            if original_filename:
-                summary_message += f"📁 <b>File:</b> {original_filename}\n\n"
-            
-            summary_message += f"📊 <b>Reports Sent:</b> {reports_sent}\n\n"
-            summary_message += "📄 Similarity Report\n"
-            summary_message += "🤖 AI Writing Report\n\n"
-            summary_message += "💾 All reports are ready in Telegram!"
-            
-            bot.send_message(chat_id, summary_message)
-    except Exception as e:
-        log(f"[{worker_name}] Error in report delivery: {e}")
-        bot.send_message(chat_id, f"⚠️ Error delivering reports: {e}")
+    start_metric_stage('telegram_delivery')
+    reports_sent = send_reports_to_user(chat_id, bot, sim_filename, ai_filename, original_filename, progress=progress, scores=scores)
+    log(f"[{worker_name}] Report delivery finished - {reports_sent} report(s) sent")
 
     # Return submission info
     submission_info = {
@@ -862,96 +873,115 @@ def download_reports(page, chat_id, bot, original_filename=None):
 # Removed Filebin upload helpers per user request: direct Telegram upload only
 
 
-def send_reports_to_user(chat_id, bot, sim_filename, ai_filename, original_filename=None):
+def build_report_caption(original_filename=None, scores=None):
+    """Combined caption for the report upload: file name and scores"""
+    scores = scores or {}
+    caption = "📊 <b>Analysis Results / Kết quả phân tích</b>\n\n"
+    if original_filename:
+        caption += f"📁 <b>File:</b> {html.escape(str(original_filename)[:200])}\n"
+    caption += f"📄 <b>Similarity / Tương đồng:</b> {html.escape(scores.get('similarity') or 'N/A')}\n"
+    caption += f"🤖 <b>AI Writing / Viết bằng AI:</b> {html.escape(scores.get('ai') or 'N/A')}"
+    return caption
+
+
+def send_reports_to_user(chat_id, bot, sim_filename, ai_filename, original_filename=None, flush_timeout=300, progress=None, scores=None):
     """Send downloaded reports directly to Telegram as files.
     
+    Both PDFs go out as one media group (single upload request) with the scores in
+    the caption of the last document. If the album upload fails, each file is sent
+    on its own. Uploads are queued on the bot's outbound dispatcher and flushed, so
+    the reports are delivered (or given up on) before returning.
+    
     Args:
         chat_id: Telegram chat ID to send reports to
         bot: Telegram bot instance
         sim_filename: Path to similarity report PDF file
         ai_filename: Path to AI writing report PDF file
         original_filename: Optional original document filename for reference
+        flush_timeout: Maximum seconds to wait for the uploads to finish
+        progress: Optional JobProgress; finished once delivery is done
+        scores: Optional {'similarity': '12%', 'ai': '0%'} shown in the caption
         
     Returns:
-        Number of reports successfully sent
+        Number of reports sent (a media group still uploading at flush_timeout counts as sent)
     """
     import threading
     worker_name = threading.current_thread().name
     
     try:
-        reports_sent = 0
-        
+        documents = []
         if sim_filename and os.path.exists(sim_filename):
-            log(f"[{worker_name}] Sending Similarity Report to Telegram: {sim_filename}")
-            if send_document_with_retry(bot, chat_id, sim_filename, "📊 <b>Similarity Report</b>"):
-                reports_sent += 1
-                log(f"[{worker_name}] Similarity Report sent successfully to Telegram")
-        
+            documents.append((sim_filename, "📄 <b>Similarity Report</b>"))
         if ai_filename and os.path.exists(ai_filename):
-            log(f"[{worker_name}] Sending AI Writing Report to Telegram: {ai_filename}")
-            if send_document_with_retry(bot, chat_id, ai_filename, "🤖 <b>AI Writing Report</b>"):
-                reports_sent += 1
-                log(f"[{worker_name}] AI Writing Report sent successfully to Telegram")
+            documents.append((ai_filename, "🤖 <b>AI Writing Report</b>"))
         
-        # Send summary message
-        if reports_sent > 0:
-            summary_message = "✅ <b>Reports Ready!</b>\n\n"
-            
-            if original_filename:
-                summary_message += f"📁 <b>File:</b> {original_filename}\n\n"
-            
-            summary_message += f"📊 <b>Reports Sent:</b> {reports_sent}\n\n"
-            summary_message += "📄 Similarity Report\n"
-            summary_message += "🤖 AI Writing Report\n\n"
-            summary_message += "💾 All reports are ready in Telegram!"
+        if not documents:
+            log(f"[{worker_name}] No report files to send")
+            if progress:
+                progress.finish("⚠️ <b>No reports could be delivered.</b>\n\nPlease try again or contact support.")
+            return 0
+        
+        # Scores ride along in the caption of the last document
+        caption = build_report_caption(original_filename, scores)
+        last_path, last_label = documents[-1]
+        documents[-1] = (last_path, f"{last_label}\n\n{caption}")
+        
+        reports_sent = 0
+        group_pending = False
+        if len(documents) > 1:
+            log(f"[{worker_name}] Queueing {len(documents)} reports as one media group")
+            group_future = bot.send_document_group_async(chat_id, documents, parse_mode='HTML', timeout=120)
+            if not bot.flush_outbound(chat_id, timeout=flush_timeout):
+                log(f"[{worker_name}] Report upload still pending after {flush_timeout}s")
+            if not group_future.done():
+                # Still uploading (slow connection): sending the files again would deliver them twice
+                group_pending = True
+            elif group_future.exception() is None:
+                reports_sent = len(documents)
+            else:
+                log(f"[{worker_name}] Media group upload failed, sending reports one by one")
+        
+        if group_pending:
+            log(f"[{worker_name}] Media group upload still in flight, not re-sending")
+            if progress:
+                progress.finish("⏳ <b>Reports are still uploading</b> - they will appear below shortly.")
+            return len(documents)
+        
+        if reports_sent == 0:
+            uploads = []
+            for file_path, file_caption in documents:
+                log(f"[{worker_name}] Queueing {os.path.basename(file_path)} for Telegram")
+                uploads.append((file_path, bot.send_document_async(
+                    chat_id, file_path, caption=file_caption, parse_mode='HTML', timeout=120
+                )))
+            if not bot.flush_outbound(chat_id, timeout=flush_timeout):
+                log(f"[{worker_name}] Report upload still pending after {flush_timeout}s")
             
-            bot.send_message(chat_id, summary_message)
+            failed = []
+            for file_path, future in uploads:
+                if future.done() and future.exception() is None:
+                    reports_sent += 1
+                else:
+                    failed.append(os.path.basename(file_path))
+            if failed:
+                bot.send_message_async(chat_id, f"❗ Unable to send file(s): {html.escape(', '.join(failed))}")
+        
+        log(f"[{worker_name}] Sent {reports_sent} report(s) to Telegram")
+        
+        if progress:
+            if reports_sent > 0:
+                progress.finish(f"✅ <b>Reports Ready!</b> {reports_sent} report(s) sent below.")
+            else:
+                progress.finish("⚠️ <b>No reports could be delivered.</b>\n\nPlease try again or contact support.")
             
         return reports_sent
     except Exception as e:
         log(f"[{worker_name}] Error in report delivery: {e}")
-        bot.send_message(chat_id, f"⚠️ Error delivering reports: {e}")
+        bot.send_message_async(chat_id, f"⚠️ Error delivering reports: {e}")
         return 0
 
 
-def send_document_with_retry(bot, chat_id, file_path, caption, parse_mode='HTML', attempts=3, base_delay=2):
-    """Send a document to Telegram with retries.
-    Returns True if sent successfully, False otherwise.
-    Direct Telegram upload only; no fallback to external hosting.
-    """
-    import threading
-    worker_name = threading.current_thread().name
-    
-    for attempt in range(1, attempts + 1):
-        try:
-            with open(file_path, 'rb') as f:
-                bot.send_document(
-                    chat_id,
-                    f,
-                    caption=caption,
-                    parse_mode=parse_mode,
-                    timeout=120
-                )
-            return True
-        except Exception as e:
-            log(f"[{worker_name}] send_document_with_retry attempt {attempt} failed: {e}")
-            if attempt < attempts:
-                # exponential backoff with small jitter
-                delay = base_delay * (2 ** (attempt - 1))
-                try:
-                    time.sleep(delay)
-                except Exception:
-                    pass
-            else:
-                # Final failure: log and return False
-                try:
-                    bot.send_message(chat_id, f"❗ Unable to send file after {attempts} attempts: {os.path.basename(file_path)}")
-                except Exception as e2:
-                    log(f"[{worker_name}] Failed to send failure notification: {e2}")
-                return False
-
-
-def download_reports_with_retry(page, chat_id, bot, original_filename=None, retries=3, retry_delay=5):
+def download_reports_with_retry(page, chat_id, bot, original_filename=None, retries=3, retry_delay=5, progress=None):
     """Compatibility wrapper expected by older code.
 
     Calls `download_reports` and will retry up to `retries` times if it raises an exception.
@@ -963,7 +993,7 @@ def download_reports_with_retry(page, chat_id, bot, original_filename=None, retr
     last_exc = None
     for attempt in range(1, retries + 1):
         try:
-            return download_reports(page, chat_id, bot, original_filename=original_filename)
+            return download_reports(page, chat_id, bot, original_filename=original_filename, progress=progress)
         except Exception as e:
             last_exc = e
             log(f"[{worker_name}] download_reports_with_retry: attempt {attempt} failed: {e}")
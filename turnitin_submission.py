@@ -15,12 +15,50 @@ def random_wait(min_seconds=2, max_seconds=4):
     time.sleep(wait_time)
 
 from turnitin_auth import navigate_to_quick_submit, get_session_page
+from page_recorder import record_step
+from job_metrics import start_stage as start_metric_stage, defer_interrupts
 
 from turnitin_auth import navigate_to_quick_submit
 
-def submit_document(page, file_path, chat_id, timestamp, bot, processing_messages):
+# Quick Submit "Submit" button, most reliable first
+SUBMIT_BUTTON_SELECTORS = [
+    'a.matte_button.submit_paper_button',    # Current working selector
+    'a.submit_paper_button',                 # Class-based fallback
+    'a:has-text("Submit")',                  # Text-based selector
+    '[href*="t_custom_search"]',             # Href-based selector
+    '.matte_button:has-text("Submit")'       # Combined selector
+]
+
+# Upload button on the submission details form
+UPLOAD_BUTTON_SELECTORS = [
+    '#upload-btn',                          # ID selector from HTML
+    'button[name="submit_button"]',         # Name selector from HTML
+    'button:has-text("Upload")',           # Text-based selector
+    '.btn-primary:has-text("Upload")',     # Class + text selector
+    'button[type="submit"]'                # Type fallback
+]
+
+def click_first_selector(page, selectors, timeout=15000, worker_name="", label="Button"):
+    """Wait for and click the first selector that appears, in list order.
+
+    Returns the selector that was clicked, or None when none of them worked.
+    """
+    for selector in selectors:
+        try:
+            log(f"[{worker_name}] Trying {label} selector: {selector}")
+            page.wait_for_selector(selector, timeout=timeout)
+            page.click(selector)
+            log(f"[{worker_name}] {label} clicked successfully with selector: {selector}")
+            return selector
+        except Exception as selector_error:
+            log(f"[{worker_name}] {label} selector {selector} failed: {selector_error}")
+            continue
+    return None
+
+def submit_document(page, file_path, chat_id, timestamp, bot, processing_messages, progress=None):
     """Handle document submission process - Optimized version"""
     worker_name = threading.current_thread().name
+    start_metric_stage('navigate_quick_submit')
     
     # Ensure we have a live session page (recover if previous viewer popup was closed)
     try:
@@ -67,27 +105,7 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
     
     # Click Submit button with multiple selectors
     log(f"[{worker_name}] [{worker_name}] Clicking Submit button...")
-
-    submit_selectors = [
-        'a.matte_button.submit_paper_button',    # Current working selector
-        'a.submit_paper_button',                 # Class-based fallback
-        'a:has-text("Submit")',                  # Text-based selector
-        '[href*="t_custom_search"]',             # Href-based selector
-        '.matte_button:has-text("Submit")'       # Combined selector
-    ]
-
-    submit_clicked = False
-    for selector in submit_selectors:
-        try:
-            log(f"[{worker_name}] Trying Submit button selector: {selector}")
-            page.wait_for_selector(selector, timeout=15000)
-            page.click(selector)
-            log(f"[{worker_name}] Submit button clicked successfully with selector: {selector}")
-            submit_clicked = True
-            break
-        except Exception as selector_error:
-            log(f"[{worker_name}] Submit selector {selector} failed: {selector_error}")
-            continue
+    submit_clicked = click_first_selector(page, SUBMIT_BUTTON_SELECTORS, 15000, worker_name, "Submit button")
 
     if not submit_clicked:
         raise Exception("Could not find Submit button with any selector")
@@ -95,6 +113,7 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
     random_wait(2, 3)
 
     # Configure submission settings (simplified)
+    start_metric_stage('form_fill')
     log(f"[{worker_name}] Configuring submission settings...")
     try:
         page.wait_for_load_state('domcontentloaded', timeout=30000)  # Wait for DOM only
@@ -102,6 +121,8 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
         log(f"[{worker_name}] Wait for load state timeout (continuing anyway): {wait_error}")
     random_wait(2, 3)
     
+    record_step(page, 'quick_submit_settings')
+
     # Configure search options and repository settings
     try:
         # Check all search options EXCEPT Army Institute
@@ -239,6 +260,7 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
     # Fill submission details
     log(f"[{worker_name}] Filling submission details...")
     page.wait_for_selector('#author_first', timeout=15000)
+    record_step(page, 'submission_details')
 
     # Fill names as requested: "Bot" and "Checker"
     page.fill('#author_first', "Bot")
@@ -258,9 +280,12 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
     log(f"[{worker_name}] Form filled - Author: Bot Checker, Title: {submission_title}")
 
     # Upload file with improved error handling
+    start_metric_stage('file_upload')
     log(f"[{worker_name}] Uploading file from path: {file_path}")
-    msg = bot.send_message(chat_id, "📎 Uploading document...")
-    processing_messages.append(msg.message_id)
+    if progress:
+        progress.set_stage('uploading')
+    else:
+        bot.send_message_async(chat_id, "📎 Uploading document...", on_sent=lambda m: processing_messages.append(m.message_id))
 
     # Click file chooser button or directly upload
     try:
@@ -282,35 +307,20 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
 
     # Click Upload button with multiple selectors
     log(f"[{worker_name}] Clicking Upload button...")
-
-    upload_selectors = [
-        '#upload-btn',                          # ID selector from HTML
-        'button[name="submit_button"]',         # Name selector from HTML
-        'button:has-text("Upload")',           # Text-based selector
-        '.btn-primary:has-text("Upload")',     # Class + text selector
-        'button[type="submit"]'                # Type fallback
-    ]
-
-    upload_clicked = False
-    for selector in upload_selectors:
-        try:
-            log(f"[{worker_name}] Trying Upload button selector: {selector}")
-            page.wait_for_selector(selector, timeout=15000)
-            page.click(selector)
-            log(f"[{worker_name}] Upload button clicked successfully with selector: {selector}")
-            upload_clicked = True
-            break
-        except Exception as selector_error:
-            log(f"[{worker_name}] Upload selector {selector} failed: {selector_error}")
-            continue
+    upload_clicked = click_first_selector(page, UPLOAD_BUTTON_SELECTORS, 15000, worker_name, "Upload button")
 
     if not upload_clicked:
         raise Exception("Could not find Upload button with any selector")
+    # From here a restart would submit the document a second time
+    defer_interrupts(submission_title)
     
     # Wait for processing and metadata extraction
+    start_metric_stage('processing_confirm')
     log(f"[{worker_name}] Waiting for processing and confirmation banner...")
-    msg = bot.send_message(chat_id, "📊 Processing document...")
-    processing_messages.append(msg.message_id)
+    if progress:
+        progress.set_stage('processing')
+    else:
+        bot.send_message_async(chat_id, "📊 Processing document...", on_sent=lambda m: processing_messages.append(m.message_id))
 
     # Wait for "Please confirm that this is the file you would like to submit..." banner
     # For large files (>30MB), we need to wait for processing states instead of fixed timeout
@@ -390,6 +400,7 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
     # Extract metadata with comprehensive error handling
     # Wait a bit longer for metadata to populate after confirm button appears
     time.sleep(2)
+    record_step(page, 'upload_confirm')
     
     try:
         # Get submission title
@@ -492,8 +503,14 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
 
 🚀 Submitting to Turnitin..."""
 
-        verify_msg = bot.send_message(chat_id, verification_msg)
-        processing_messages.append(verify_msg.message_id)
+        if progress:
+            progress.add_detail(
+                f"📋 <b>Title:</b> {title_safe}\n"
+                f"📃 <b>Pages:</b> {page_count_safe} | 📝 <b>Words:</b> {word_count_safe}\n"
+                f"🆔 <b>Submission ID:</b> {submission_id_safe}"
+            )
+        else:
+            bot.send_message_async(chat_id, verification_msg, on_sent=lambda m: processing_messages.append(m.message_id))
 
         # Store submission details for potential future use
         submission_details = {
@@ -510,9 +527,13 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
     except Exception as metadata_error:
         log(f"[{worker_name}] Could not extract metadata: {metadata_error}")
         actual_submission_title = submission_title
-        # Send generic verification message
-        verify_msg = bot.send_message(chat_id, "✅ <b>Document Verified</b>\n\n🚀 Submitting to Turnitin...")
-        processing_messages.append(verify_msg.message_id)
+        # Send generic verification message (the live status already shows the stage)
+        if not progress:
+            bot.send_message_async(
+                chat_id,
+                "✅ <b>Document Verified</b>\n\n🚀 Submitting to Turnitin...",
+                on_sent=lambda m: processing_messages.append(m.message_id)
+            )
 
     # Click Confirm button with multiple selectors
     log(f"[{worker_name}] Clicking Confirm button...")
@@ -579,8 +600,14 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
 
     # Wait for digital receipt confirmation message
     log(f"[{worker_name}] Waiting for submission confirmation message...")
-    msg = bot.send_message(chat_id, "⏳ Document submitted, waiting for confirmation...")
-    processing_messages.append(msg.message_id)
+    if progress:
+        progress.set_stage('submitted')
+    else:
+        bot.send_message_async(
+            chat_id,
+            "⏳ Document submitted, waiting for confirmation...",
+            on_sent=lambda m: processing_messages.append(m.message_id)
+        )
     
     # Check for "Congratulations - your submission is complete!" message
     confirmation_found = False
@@ -607,8 +634,10 @@ def submit_document(page, file_path, chat_id, timestamp, bot, processing_message
     
     if not confirmation_found:
         log(f"[{worker_name}] ⚠️ Warning: Could not find confirmation message, but continuing...")
+    record_step(page, 'submission_complete')
     
     # Navigate to Quick Submit page immediately after confirmation
+    start_metric_stage('navigate_quick_submit')
     log(f"[{worker_name}] Navigating to Quick Submit page...")
     try:
         navigate_to_quick_submit()